@@ -2,20 +2,45 @@
 Routes pour la gestion des paiements avec sécurité renforcée
 """
 
-from flask import Blueprint, jsonify, request, render_template
-from scripts.payment_manager import PaymentManager, PaymentMethod, PaymentStatus
+from flask import Blueprint, Response, jsonify, make_response, request, render_template, stream_with_context
+from scripts.payment_manager import PaymentManager, PaymentMethod, PaymentStatus, PaymentConfig
+from scripts.payment_events import TERMINAL_STATUSES
+from scripts.webhook_queue import WebhookQueue, WebhookWorker
+from scripts.idempotency import IdempotencyStore, IdempotencyOutcome
 from scripts.subscription_manager import SubscriptionManager
 from scripts.fraud_detection import FraudDetector
 from marshmallow import Schema, fields, validate
 from functools import wraps
 import jwt
 import os
+import json
+import hashlib
 import logging
 
 payment_bp = Blueprint('payment', __name__)
 payment_manager = PaymentManager()
 subscription_manager = SubscriptionManager()
 fraud_detector = FraudDetector()
+webhook_queue = WebhookQueue(PaymentConfig.WEBHOOK_DB_PATH)
+idempotency_store = IdempotencyStore(PaymentConfig.IDEMPOTENCY_DB_PATH, ttl=PaymentConfig.IDEMPOTENCY_TTL)
+
+def apply_webhook_batch(batch):
+    """Applique un lot de webhooks puis active les abonnements payés."""
+    completed = payment_manager.apply_webhook_events([event['payload'] for event in batch])
+    
+    # Une activation par paiement, même s'il est confirmé par plusieurs événements ou flux
+    activations = {
+        payment['payment_id']: (payment['metadata'].get('subscription_id'), payment['user_id'])
+        for payment in completed
+        if payment['metadata'].get('subscription_id')
+    }
+    for payment_id, (subscription_id, user_id) in activations.items():
+        payment_manager.activate_subscription_once(
+            payment_id, subscription_id, user_id, subscription_manager.activate_subscription
+        )
+
+webhook_worker = WebhookWorker(webhook_queue, apply_webhook_batch)
+webhook_worker.start()
 
 # Schémas de validation
 class PaymentSessionSchema(Schema):
@@ -57,6 +82,49 @@ def require_auth(f):
             
     return decorated
 
+def idempotent(f):
+    """Décorateur rejouant la première réponse associée à un en-tête Idempotency-Key."""
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return f(*args, **kwargs)
+        
+        # Clé propre à l'utilisateur et à la route
+        scoped_key = f"{request.user['id']}:{request.path}:{key}"
+        fingerprint = hashlib.sha256(request.query_string + b'?' + request.get_data()).hexdigest()
+        
+        outcome, stored = idempotency_store.begin(scoped_key, fingerprint)
+        
+        if outcome == IdempotencyOutcome.REPLAY:
+            response = make_response(jsonify(stored['body']), stored['status_code'])
+            response.headers['Idempotent-Replayed'] = 'true'
+            return response
+        
+        if outcome == IdempotencyOutcome.CONFLICT:
+            return jsonify({'error': 'Clé d\'idempotence déjà utilisée pour une autre requête'}), 422
+        
+        if outcome == IdempotencyOutcome.IN_PROGRESS:
+            return jsonify({'error': 'Requête identique en cours de traitement'}), 409
+        
+        # Bail prolongé tant que la requête est traitée (appels Stripe lents)
+        lease_token = stored['lease_token']
+        try:
+            with idempotency_store.hold(scoped_key, lease_token):
+                response = make_response(f(*args, **kwargs))
+        except Exception:
+            idempotency_store.release(scoped_key, lease_token)
+            raise
+        
+        # Les erreurs serveur ne sont pas mémorisées pour permettre un nouvel essai
+        if response.status_code >= 500 or not response.is_json:
+            idempotency_store.release(scoped_key, lease_token)
+        elif not idempotency_store.complete(scoped_key, lease_token, response.status_code, response.get_json()):
+            logging.warning(f"Réservation de la clé d'idempotence perdue: {scoped_key}")
+        return response
+            
+    return decorated
+
 @payment_bp.route('/payment', methods=['GET'])
 @require_auth
 def payment_page():
@@ -82,6 +150,7 @@ def payment_page():
 
 @payment_bp.route('/api/payment/create-session', methods=['POST'])
 @require_auth
+@idempotent
 def create_payment_session():
     """Crée une session de paiement sécurisée."""
     try:
@@ -106,7 +175,8 @@ def create_payment_session():
             amount=data['amount'],
             currency=data['currency'],
             payment_method=PaymentMethod(data['payment_method']),
-            ip_address=request.remote_addr
+            ip_address=request.remote_addr,
+            subscription_id=request.args.get('subscription')
         )
         
         if not session:
@@ -123,6 +193,7 @@ def create_payment_session():
 
 @payment_bp.route('/api/payment/process', methods=['POST'])
 @require_auth
+@idempotent
 def process_payment():
     """Traite un paiement."""
     try:
@@ -144,9 +215,11 @@ def process_payment():
             # Mettre à jour l'abonnement
             subscription_id = request.args.get('subscription')
             if subscription_id:
-                subscription_manager.activate_subscription(
+                payment_manager.activate_subscription_once(
+                    data['session_id'],
                     subscription_id,
-                    request.user['id']
+                    request.user['id'],
+                    subscription_manager.activate_subscription
                 )
             
             return jsonify({
@@ -197,6 +270,11 @@ def refund_payment():
         if 'payment_id' not in data:
             return jsonify({'error': 'ID de paiement manquant'}), 400
             
+        # Vérifier les permissions
+        payment = payment_manager.get_payment_info(data['payment_id'])
+        if not payment or payment['user_id'] != str(request.user['id']):
+            return jsonify({'error': 'Paiement non trouvé'}), 404
+            
         # Effectuer le remboursement
         success, message = payment_manager.refund_payment(
             data['payment_id'],
@@ -228,7 +306,7 @@ def payment_status(payment_id):
     try:
         # Vérifier les permissions
         payment = payment_manager.get_payment_info(payment_id)
-        if not payment or payment['user_id'] != request.user['id']:
+        if not payment or payment['user_id'] != str(request.user['id']):
             return jsonify({'error': 'Paiement non trouvé'}), 404
             
         return jsonify(payment)
@@ -236,6 +314,91 @@ def payment_status(payment_id):
     except Exception as e:
         return jsonify({'error': 'Erreur serveur'}), 500
 
+@payment_bp.route('/api/payment/events/<payment_id>', methods=['GET'])
+@require_auth
+def payment_events(payment_id):
+    """Diffuse les changements de statut d'un paiement (Server-Sent Events)."""
+    # Une seule vérification des permissions pour toute la durée du flux
+    payment = payment_manager.get_payment_info(payment_id)
+    if not payment or payment['user_id'] != str(request.user['id']):
+        return jsonify({'error': 'Paiement non trouvé'}), 404
+    
+    def format_event(event):
+        return f"event: status\ndata: {json.dumps(event)}\n\n"
+    
+    def generate():
+        yield "retry: 3000\n\n"
+        
+        # Statut courant, puis transitions à venir
+        yield format_event({'payment_id': payment_id, 'status': payment['status']})
+        if payment['status'] in TERMINAL_STATUSES:
+            return
+        
+        for event in payment_manager.events.listen(
+            payment_id,
+            timeout=PaymentConfig.EVENT_STREAM_TIMEOUT,
+            keepalive=PaymentConfig.EVENT_KEEPALIVE
+        ):
+            if event is None:
+                yield ": keepalive\n\n"
+            else:
+                yield format_event(event)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@payment_bp.route('/api/payment/history', methods=['GET'])
+@require_auth
+def payment_history():
+    """Récupère l'historique des paiements (pagination par curseur)."""
+    try:
+        limit = request.args.get('limit', 20)
+        try:
+            limit = int(limit)
+        except (TypeError, ValueError):
+            limit = 0
+        if not 1 <= limit <= 100:
+            return jsonify({'error': 'Le paramètre limit doit être compris entre 1 et 100'}), 400
+
+        payments, next_cursor = payment_manager.get_payment_history(
+            request.user['id'],
+            limit=limit,
+            cursor=request.args.get('cursor')
+        )
+        
+        return jsonify({
+            'payments': payments,
+            'next_cursor': next_cursor
+        })
+        
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': 'Erreur serveur'}), 500
+
+@payment_bp.route('/api/payment/webhook/<provider>', methods=['POST'])
+def payment_webhook(provider):
+    """Reçoit un webhook de passerelle et l'acquitte immédiatement."""
+    try:
+        event = payment_manager.parse_webhook(provider, request.get_data(), request.headers)
+    except ValueError as e:
+        logging.warning(f"Webhook invalide - Provider: {provider}, Error: {e}")
+        return jsonify({'error': 'Événement invalide'}), 400
+    
+    if not event:
+        logging.warning(f"Webhook rejeté - Provider: {provider}, IP: {request.remote_addr}")
+        return jsonify({'error': 'Signature invalide'}), 400
+    
+    # Le traitement est différé au worker ; les doublons sont ignorés
+    webhook_queue.enqueue(provider, event['event_id'], event['type'], event)
+    return jsonify({'received': True})
+
 @payment_bp.route('/api/payment/methods', methods=['GET'])
 @require_auth
 def get_payment_methods():
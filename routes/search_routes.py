@@ -6,17 +6,19 @@ from flask import Blueprint, jsonify, request, current_app
 from flask_caching import Cache
 from scripts.data_sources.reviews_collector import ReviewsCollector
 from scripts.subscription_manager import SubscriptionManager
-from scripts.payment_manager import PaymentManager
 from scripts.search_optimizer import SearchOptimizer
+from routes.payment_routes import payment_manager
 from marshmallow import Schema, fields, validate
 from functools import wraps
+import atexit
 import jwt
 import logging
 
 search_bp = Blueprint('search', __name__)
+# Un seul collecteur (et un seul thread de vérification de licence) pour le module
 reviews_collector = ReviewsCollector()
+atexit.register(reviews_collector.close)
 subscription_manager = SubscriptionManager()
-payment_manager = PaymentManager()
 search_optimizer = SearchOptimizer()
 cache = Cache()
 
@@ -0,0 +1,2 @@
+# Package benchmarks
+# Mesures de performance reproductibles des traitements de collecte
@@ -0,0 +1,136 @@
+"""
+Mesure de l'extraction des sentiments face à l'implémentation d'origine
+
+Chaque avis du corpus de référence est traité par l'extraction d'origine
+(regex recompilées à chaque appel, copie figée ci-dessous) puis par
+`data_sources.sentiment.extract_sentiment` : les résultats doivent être
+identiques, et le rapport des durées est affiché.
+
+Usage (depuis la racine du projet) :
+
+    python -m scripts.benchmarks.sentiment --size 200 --repeat 5
+"""
+
+import re
+import time
+import argparse
+from typing import Callable, Dict, List
+
+from ..data_sources.sentiment import extract_sentiment
+from .sentiment_fixture import build_corpus
+
+def _legacy_clean_text(text: str) -> str:
+    """Nettoyage d'origine (ReviewsCollector._clean_text)."""
+    if not isinstance(text, str):
+        return ""
+    text = ''.join(char for char in text if char.isprintable())
+    text = re.sub(r'\s+', ' ', text)
+    text = text.strip()
+    return text[:1000]
+
+def legacy_extract_sentiment(text: str) -> Dict[str, List[str]]:
+    """Extraction d'origine (ReviewsCollector._extract_sentiment), sans la gestion d'erreurs."""
+    if not text or not isinstance(text, str):
+        return {'positives': [], 'negatives': []}
+
+    positives = []
+    negatives = []
+
+    pos_patterns = [
+        r'(?:avantages?|points? fort|qualités?|points? positifs?).*?[:]\s*(.*?)(?=\.|$)',
+        r'(?:nous (?:avons )?aimé|on aime|j\'aime).*?[:]\s*(.*?)(?=\.|$)',
+        r'(?:excellent|remarquable|parfait).*?[:]\s*(.*?)(?=\.|$)',
+        r'(?:points? fort|forces?).*?[:]\s*(.*?)(?=\.|$)',
+        r'(?:atouts?|succès).*?[:]\s*(.*?)(?=\.|$)'
+    ]
+
+    neg_patterns = [
+        r'(?:inconvénients?|points? faible|défauts?|points? négatifs?).*?[:]\s*(.*?)(?=\.|$)',
+        r'(?:nous (?:n\'avons )?pas aimé|on (?:n\')?aime pas|je (?:n\')?aime pas).*?[:]\s*(.*?)(?=\.|$)',
+        r'(?:décevant|regrettable|dommage).*?[:]\s*(.*?)(?=\.|$)',
+        r'(?:points? faible|faiblesses?).*?[:]\s*(.*?)(?=\.|$)',
+        r'(?:limites?|problèmes?).*?[:]\s*(.*?)(?=\.|$)'
+    ]
+
+    for pattern in pos_patterns:
+        for match in re.finditer(pattern, text, re.IGNORECASE):
+            point = _legacy_clean_text(match.group(1))
+            if point and len(point) > 10:
+                positives.append(point)
+
+    for pattern in neg_patterns:
+        for match in re.finditer(pattern, text, re.IGNORECASE):
+            point = _legacy_clean_text(match.group(1))
+            if point and len(point) > 10:
+                negatives.append(point)
+
+    if not positives and not negatives:
+        for sentence in re.split(r'[.!?]+', text):
+            sentence = _legacy_clean_text(sentence)
+            if len(sentence) > 20:
+                if any(word in sentence.lower() for word in [
+                    'excellent', 'remarquable', 'confortable',
+                    'agréable', 'qualité', 'réussi'
+                ]):
+                    positives.append(sentence)
+                elif any(word in sentence.lower() for word in [
+                    'décevant', 'problème', 'défaut',
+                    'manque', 'regrettable'
+                ]):
+                    negatives.append(sentence)
+
+    return {
+        'positives': list(set(positives))[:5],
+        'negatives': list(set(negatives))[:5]
+    }
+
+def _best_time(extract: Callable[[str], Dict[str, List[str]]], corpus: List[str], repeat: int) -> float:
+    """Meilleure durée (secondes) de traitement du corpus sur `repeat` passes."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in corpus:
+            extract(text)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def run(size: int = 200, repeat: int = 5, seed: int = 7) -> float:
+    """
+    Vérifie l'équivalence des deux extractions puis mesure le gain.
+
+    Args:
+        size: Nombre d'avis du corpus
+        repeat: Nombre de passes chronométrées (la meilleure est retenue)
+        seed: Graine du corpus
+
+    Returns:
+        float: Rapport durée d'origine / durée actuelle
+    """
+    corpus = build_corpus(size, seed)
+
+    for index, text in enumerate(corpus):
+        expected, actual = legacy_extract_sentiment(text), extract_sentiment(text)
+        for key in ('positives', 'negatives'):
+            if sorted(expected[key]) != sorted(actual[key]):
+                raise AssertionError(f"Résultat différent pour l'avis {index} ({key})")
+
+    legacy = _best_time(legacy_extract_sentiment, corpus, repeat)
+    current = _best_time(extract_sentiment, corpus, repeat)
+    speedup = legacy / current
+
+    print(f"Corpus : {size} avis, {sum(map(len, corpus))} caractères (graine {seed})")
+    print(f"Extraction d'origine : {legacy:.3f} s")
+    print(f"Extraction actuelle  : {current:.3f} s")
+    print(f"Gain : x{speedup:.1f}")
+    return speedup
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesure de l'extraction des sentiments")
+    parser.add_argument('--size', type=int, default=200, help="Nombre d'avis du corpus")
+    parser.add_argument('--repeat', type=int, default=5, help="Nombre de passes chronométrées")
+    parser.add_argument('--seed', type=int, default=7, help="Graine du corpus")
+    args = parser.parse_args()
+    run(args.size, args.repeat, args.seed)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Corpus d'avis de référence pour la mesure de l'extraction des sentiments
+
+Le corpus est généré de façon déterministe (graine fixe) : deux exécutions
+produisent exactement les mêmes textes.
+"""
+
+import random
+from typing import List
+
+# Vocabulaire des paragraphes courants d'un essai
+PROSE = (
+    "La nouvelle version reprend la plateforme de la génération précédente avec une caisse rigidifiée et "
+    "une insonorisation revue, le moteur essence se montre discret à vitesse stabilisée mais la boîte "
+    "automatique manque parfois de réactivité en ville, la consommation relevée sur notre parcours mixte "
+    "reste raisonnable pour la catégorie et le coffre offre un volume correct malgré un seuil de chargement élevé"
+).split()
+
+# Mots-clés glissés dans la prose, avec ou sans ':' à leur suite
+KEYWORDS = [
+    'excellent', 'dommage', 'on aime', 'problème', 'qualité', 'limites',
+    'succès', 'prix :', 'décevant', 'forces'
+]
+
+# Encadrés de fin d'essai, présents dans une partie des avis
+SUMMARIES = [
+    "\n\tPoints forts : un confort de suspension remarquable et une finition soignée. "
+    "Points faibles : une visibilité arrière réduite et un tarif élevé.\n",
+    "Nous avons aimé : l'agrément de conduite sur autoroute. "
+    "On n'aime pas : la dureté de l'amortissement."
+]
+
+def _paragraph(rng: random.Random) -> str:
+    words = [rng.choice(PROSE) for _ in range(rng.randint(40, 160))]
+    for _ in range(rng.randint(0, 3)):
+        words[rng.randrange(len(words))] = rng.choice(KEYWORDS)
+    return ' '.join(words) + '. '
+
+def _review(rng: random.Random) -> str:
+    paragraphs = [_paragraph(rng) for _ in range(rng.randint(5, 25))]
+    if rng.random() < 0.5:
+        paragraphs.append(SUMMARIES[0])
+    if rng.random() < 0.3:
+        paragraphs.append(SUMMARIES[1])
+    return '\n\n      '.join(paragraphs) + '\n'
+
+def build_corpus(size: int = 200, seed: int = 7) -> List[str]:
+    """
+    Génère le corpus de référence.
+
+    Args:
+        size: Nombre d'avis
+        seed: Graine du générateur
+
+    Returns:
+        List[str]: Textes des avis
+    """
+    rng = random.Random(seed)
+    return [_review(rng) for _ in range(size)]
@@ -2,193 +2,348 @@
 Script principal de collecte de données
 """
 
-import json
+import os
 import sqlite3
 from pathlib import Path
-from data_sources.french_collector import FrenchCollector
-from data_sources.global_collector import GlobalCollector
+from typing import Any, Dict, List, Optional, Tuple
+from data_sources.catalog_export import CatalogExporter
+from data_sources.engine_catalog import EngineCatalog
+from data_sources.parallel_catalog import ParallelCatalogBuilder
+from data_sources.review_crawler import ReviewCrawler
 from data_sources.reviews_collector import ReviewsCollector
+from data_sources.records import Record, record
+from data_sources.run_journal import RunJournal
+from data_sources.simhash import ReviewSignatureIndex, simhash
 
-def collect_and_save_data(start_year: int = 2015, end_year: int = 2024):
-    """Collecte et sauvegarde toutes les données des véhicules."""
-    
-    # Créer les collecteurs
-    french_collector = FrenchCollector()
-    global_collector = GlobalCollector()
-    reviews_collector = ReviewsCollector()
-    
-    # Collecter les données
-    print("Collecte des données des marques françaises...")
-    french_data = french_collector.collect_full_data(start_year, end_year)
-    
-    print("\nCollecte des données des marques mondiales...")
-    global_data = global_collector.collect_full_data(start_year, end_year)
+class CatalogWriter:
+    """Écrit en base, par lots, les enregistrements produits par les collecteurs."""
+
+    def __init__(self, db_path: Path, batch_size: int = 500):
+        """
+        Initialise la base du catalogue.
+
+        Args:
+            db_path: Chemin vers la base de données SQLite
+            batch_size: Nombre d'enregistrements écrits par transaction
+        """
+        self.conn = sqlite3.connect(db_path)
+        self.batch_size = batch_size
+        self._batch: List[Record] = []
+        self._make_ids: Dict[str, int] = {}
+        # Gammes de motorisations déjà écrites : (IDs des motorisations) -> ID de gamme
+        self._lineup_ids: Dict[Tuple[int, ...], int] = {}
+        # Seul le dernier modèle écrit est gardé : ses finitions et avis le suivent
+        self._current_model: Optional[Tuple[Tuple[str, int, str], int]] = None
+        self._create_tables()
+        # Signatures SimHash des avis écrits, pour écarter les avis quasi identiques
+        self._signatures = ReviewSignatureIndex(self.conn)
+
+    def _create_tables(self) -> None:
+        """Recrée les tables du catalogue."""
+        # Créer les tables avec des contraintes
+        self.conn.execute('''DROP TABLE IF EXISTS makes''')
+        self.conn.execute('''DROP TABLE IF EXISTS models''')
+        self.conn.execute('''DROP TABLE IF EXISTS engine_types''')
+        self.conn.execute('''DROP TABLE IF EXISTS engine_lineups''')
+        self.conn.execute('''DROP TABLE IF EXISTS engine_variants''')
+        self.conn.execute('''DROP TABLE IF EXISTS trim_levels''')
+        self.conn.execute('''DROP TABLE IF EXISTS reviews''')
+        self.conn.execute('''DROP TABLE IF EXISTS review_signatures''')
+        
+        self.conn.execute('''
+        CREATE TABLE makes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL UNIQUE,
+            country TEXT NOT NULL,
+            logo_url TEXT
+        )
+        ''')
+
+        self.conn.execute('''
+        CREATE TABLE models (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            make_id INTEGER,
+            name TEXT NOT NULL,
+            year INTEGER NOT NULL,
+            body_type TEXT,
+            engine_lineup_id INTEGER,
+            FOREIGN KEY (make_id) REFERENCES makes (id),
+            UNIQUE(make_id, name, year)
+        )
+        ''')
+
+        # Motorisations distinctes, regroupées en gammes partagées par les modèles-années
+        self.conn.execute('''
+        CREATE TABLE engine_variants (
+            id INTEGER PRIMARY KEY,
+            type TEXT NOT NULL,
+            power INTEGER,
+            displacement INTEGER,
+            hybrid_type TEXT,
+            battery_capacity INTEGER
+        )
+        ''')
+
+        self.conn.execute('''
+        CREATE TABLE engine_lineups (
+            lineup_id INTEGER NOT NULL,
+            position INTEGER NOT NULL,
+            engine_id INTEGER NOT NULL,
+            FOREIGN KEY (engine_id) REFERENCES engine_variants (id),
+            PRIMARY KEY (lineup_id, position)
+        ) WITHOUT ROWID
+        ''')
+
+        self.conn.execute('''
+        CREATE TABLE trim_levels (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            model_id INTEGER,
+            category TEXT NOT NULL,
+            name TEXT NOT NULL,
+            FOREIGN KEY (model_id) REFERENCES models (id),
+            UNIQUE(model_id, category, name)
+        )
+        ''')
+
+        self.conn.execute('''
+        CREATE TABLE reviews (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            model_id INTEGER,
+            source TEXT NOT NULL,
+            url TEXT NOT NULL,
+            positive_point TEXT,
+            negative_point TEXT,
+            hash TEXT UNIQUE NOT NULL,
+            FOREIGN KEY (model_id) REFERENCES models (id)
+        )
+        ''')
+        ReviewSignatureIndex.create_schema(self.conn)
+        self.conn.commit()
+
+    def add(self, item: Record) -> None:
+        """Ajoute un enregistrement au lot en cours."""
+        self._batch.append(item)
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Écrit le lot en cours dans une seule transaction."""
+        engines, lineups, trims, reviews = [], [], [], []
+
+        with self.conn:
+            # Le lot reste une seule transaction, même s'il ne contient que des avis
+            if not self.conn.in_transaction:
+                self.conn.execute('BEGIN')
+
+            for item in self._batch:
+                make, year, model, data = item['make'], item['year'], item['model'], item['data']
+                try:
+                    if item['kind'] == 'make':
+                        self._write_make(make, data)
+                    elif item['kind'] == 'engine_variant':
+                        engines.append((
+                            data['id'],
+                            data['type'],
+                            data.get('power'),
+                            data.get('displacement'),
+                            data.get('hybrid_type'),
+                            data.get('battery')
+                        ))
+                    elif item['kind'] == 'model':
+                        self._write_model(make, year, model, data, self._lineup_id(data, lineups))
+                    elif item['kind'] == 'trim':
+                        trims.append((self._model_id(make, year, model), data['category'], data['name']))
+                    elif item['kind'] == 'review':
+                        reviews.append((self._model_id(make, year, model), data))
+                except sqlite3.Error as e:
+                    print(f"Erreur lors de l'ajout de {item['kind']} pour {make} {model or ''} {year or ''}: {e}")
+
+            # Ajouter les motorisations et finitions du lot
+            self.conn.executemany(
+                '''INSERT OR IGNORE INTO engine_variants 
+                (id, type, power, displacement, hybrid_type, battery_capacity)
+                VALUES (?, ?, ?, ?, ?, ?)''',
+                engines
+            )
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO engine_lineups (lineup_id, position, engine_id) VALUES (?, ?, ?)',
+                lineups
+            )
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO trim_levels (model_id, category, name) VALUES (?, ?, ?)',
+                trims
+            )
+
+            # Puis les avis, chacun dans son propre point de sauvegarde
+            for model_id, review in reviews:
+                self._write_review(model_id, review)
+
+        self._batch.clear()
+
+    def _write_review(self, model_id: int, review: Dict[str, Any]) -> None:
+        """
+        Écrit les points d'un avis, un point par ligne, comme dans la base du collecteur d'avis.
+
+        L'avis est écrit dans son propre point de sauvegarde : en cas d'erreur,
+        ses points et sa signature sont annulés sans perdre le reste du lot.
+        Chaque point porte son propre hash : les points déjà écrits sont ignorés.
+        """
+        self.conn.execute('SAVEPOINT review')
+        try:
+            if not self._is_near_duplicate(model_id, review):
+                source, url, year = review['source'], review['url'], review['year']
+                points = [(positive, None) for positive in review['positives']]
+                points += [(None, negative) for negative in review['negatives']]
+                self.conn.executemany(
+                    '''INSERT OR IGNORE INTO reviews (model_id, source, url, positive_point, negative_point, hash)
+                    VALUES (?, ?, ?, ?, ?, ?)''',
+                    [
+                        (model_id, source, url, pos, neg, ReviewsCollector.row_hash(source, url, year, pos, neg))
+                        for pos, neg in points
+                    ]
+                )
+        except sqlite3.Error as e:
+            print(f"Erreur lors de l'ajout de l'avis {review['url']}: {e}")
+            self.conn.execute('ROLLBACK TO review')
+        self.conn.execute('RELEASE review')
+
+    def _is_near_duplicate(self, model_id: int, review: Dict[str, Any]) -> bool:
+        """Écarte un avis repris d'une autre source avec de légères retouches (signature enregistrée sinon)."""
+        signature = simhash(review['positives'] + review['negatives'])
+        if signature is None:
+            return False
+
+        duplicate = self._signatures.find_near_duplicate(model_id, signature)
+        if duplicate:
+            print(f"Avis quasi identique à {duplicate} ignoré: {review['url']}")
+            return True
+
+        self._signatures.add(review['hash'], model_id, signature)
+        return False
+
+    def _write_make(self, make: str, data: Dict[str, Any]) -> None:
+        cursor = self.conn.execute(
+            'INSERT OR IGNORE INTO makes (name, country, logo_url) VALUES (?, ?, ?)',
+            (make, data['country'], data['logo_url'])
+        )
+        self._make_ids[make] = cursor.lastrowid if cursor.rowcount else self.conn.execute(
+            'SELECT id FROM makes WHERE name = ?', (make,)
+        ).fetchone()[0]
+
+    def _lineup_id(self, data: Dict[str, Any], lineups: List[Tuple[int, int, int]]) -> Optional[int]:
+        """ID de la gamme de motorisations d'un modèle, ajoutée au lot si elle est nouvelle."""
+        engine_ids = tuple(data.get('engine_ids', ()))
+        if not engine_ids:
+            return None
+
+        lineup_id = self._lineup_ids.get(engine_ids)
+        if lineup_id is None:
+            lineup_id = self._lineup_ids[engine_ids] = len(self._lineup_ids) + 1
+            lineups.extend(
+                (lineup_id, position, engine_id) for position, engine_id in enumerate(engine_ids)
+            )
+        return lineup_id
+
+    def _write_model(self, make: str, year: int, model: str, data: Dict[str, Any],
+                     lineup_id: Optional[int] = None) -> None:
+        make_id = self._make_ids[make]
+        cursor = self.conn.execute(
+            '''INSERT OR IGNORE INTO models (make_id, name, year, body_type, engine_lineup_id)
+            VALUES (?, ?, ?, ?, ?)''',
+            (make_id, model, year, data['body_type'], lineup_id)
+        )
+        model_id = cursor.lastrowid if cursor.rowcount else self.conn.execute(
+            'SELECT id FROM models WHERE make_id = ? AND name = ? AND year = ?',
+            (make_id, model, year)
+        ).fetchone()[0]
+        self._current_model = ((make, year, model), model_id)
+
+    def _model_id(self, make: str, year: int, model: str) -> int:
+        key = (make, year, model)
+        if self._current_model and self._current_model[0] == key:
+            return self._current_model[1]
+
+        model_id = self.conn.execute(
+            'SELECT id FROM models WHERE make_id = ? AND name = ? AND year = ?',
+            (self._make_ids[make], model, year)
+        ).fetchone()[0]
+        self._current_model = (key, model_id)
+        return model_id
+
+    def close(self) -> None:
+        """Écrit le dernier lot, crée les index et ferme la base."""
+        self.flush()
+        
+        # Créer des index pour améliorer les performances
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_models_make ON models(make_id)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_models_lineup ON models(engine_lineup_id)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_trim_model ON trim_levels(model_id)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_reviews_model ON reviews(model_id)')
+        
+        self.conn.commit()
+        self.conn.close()
+
+def collect_and_save_data(start_year: int = 2015, end_year: int = 2024, compact: bool = False,
+                          workers: Optional[int] = None, license_key: Optional[str] = None):
+    """
+    Collecte et sauvegarde toutes les données des véhicules.
+
+    Args:
+        start_year: Première année collectée
+        end_year: Dernière année collectée
+        compact: Écrire l'export JSON sans espaces et compressé (vehicle_data.json.gz)
+        workers: Nombre de processus générant le catalogue (nombre de cœurs par défaut)
+        license_key: Clé de licence du collecteur d'avis (CARFAST_LICENSE_KEY par défaut) ;
+            sans clé, les avis ne sont pas collectés
+    """
     
-    # Fusionner les données
-    all_data = {
-        'makes': {**french_data['makes'], **global_data['makes']},
-        'models': {**french_data['models'], **global_data['models']},
-        'types': {**french_data.get('types', {}), **global_data.get('types', {})},
-        'specs': {**french_data['specs'], **global_data['specs']}
-    }
+    # Créer les collecteurs (marques françaises et mondiales réparties sur un pool de processus)
+    catalog_builder = ParallelCatalogBuilder(max_workers=workers, engine_catalog=EngineCatalog())
     
     # Créer le dossier de sortie s'il n'existe pas
     output_dir = Path(__file__).parent / 'output'
     output_dir.mkdir(exist_ok=True)
     
-    # Sauvegarder en JSON
-    json_path = output_dir / 'vehicle_data.json'
-    with open(json_path, 'w', encoding='utf-8') as f:
-        json.dump(all_data, f, ensure_ascii=False, indent=2)
-    print(f"\nDonnées sauvegardées dans {json_path}")
-    
-    # Sauvegarder en SQLite
-    db_path = output_dir / 'vehicle_data.db'
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-    
-    # Créer les tables avec des contraintes
-    cursor.execute('''DROP TABLE IF EXISTS makes''')
-    cursor.execute('''DROP TABLE IF EXISTS models''')
-    cursor.execute('''DROP TABLE IF EXISTS engine_types''')
-    cursor.execute('''DROP TABLE IF EXISTS trim_levels''')
-    cursor.execute('''DROP TABLE IF EXISTS reviews''')
-    
-    cursor.execute('''
-    CREATE TABLE makes (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        name TEXT NOT NULL UNIQUE,
-        country TEXT NOT NULL,
-        logo_url TEXT
-    )
-    ''')
-    
-    cursor.execute('''
-    CREATE TABLE models (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        make_id INTEGER,
-        name TEXT NOT NULL,
-        year INTEGER NOT NULL,
-        body_type TEXT,
-        FOREIGN KEY (make_id) REFERENCES makes (id),
-        UNIQUE(make_id, name, year)
-    )
-    ''')
+    # Avis : collectés en parallèle par source une fois le catalogue écrit
+    license_key = license_key or os.getenv('CARFAST_LICENSE_KEY')
+    review_crawler = None
+    if license_key:
+        review_crawler = ReviewCrawler(ReviewsCollector(str(output_dir / 'reviews.db'), license_key))
+    else:
+        print("Aucune clé de licence (CARFAST_LICENSE_KEY) : les avis ne seront pas collectés")
     
-    cursor.execute('''
-    CREATE TABLE engine_types (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        model_id INTEGER,
-        type TEXT NOT NULL,
-        power INTEGER,
-        displacement INTEGER,
-        hybrid_type TEXT,
-        battery_capacity INTEGER,
-        FOREIGN KEY (model_id) REFERENCES models (id),
-        UNIQUE(model_id, type, power, displacement, hybrid_type, battery_capacity)
-    )
-    ''')
+    # Journal de reprise : une collecte interrompue repart de la dernière unité terminée
+    journal = RunJournal(output_dir / 'collect_journal.db')
     
-    cursor.execute('''
-    CREATE TABLE trim_levels (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        model_id INTEGER,
-        category TEXT NOT NULL,
-        name TEXT NOT NULL,
-        FOREIGN KEY (model_id) REFERENCES models (id),
-        UNIQUE(model_id, category, name)
-    )
-    ''')
+    # Les enregistrements sont consommés au fil de la collecte, sans catalogue complet en mémoire
+    records = catalog_builder.iter_records(start_year, end_year, journal=journal)
     
-    cursor.execute('''
-    CREATE TABLE reviews (
-        id INTEGER PRIMARY KEY AUTOINCREMENT,
-        model_id INTEGER,
-        rating REAL,
-        review TEXT,
-        FOREIGN KEY (model_id) REFERENCES models (id)
-    )
-    ''')
+    json_path = output_dir / ('vehicle_data.json.gz' if compact else 'vehicle_data.json')
+    db_path = output_dir / 'vehicle_data.db'
+    writer = CatalogWriter(db_path)
     
-    # Insérer les données avec gestion des doublons
-    for brand, brand_data in all_data['makes'].items():
-        try:
-            cursor.execute(
-                'INSERT OR IGNORE INTO makes (name, country, logo_url) VALUES (?, ?, ?)',
-                (brand, brand_data['country'], brand_data['logo_url'])
-            )
-            make_id = cursor.lastrowid or cursor.execute(
-                'SELECT id FROM makes WHERE name = ?', (brand,)
-            ).fetchone()[0]
+    with CatalogExporter(json_path, compact=compact) as exporter:
+        for item in records:
+            # Sauvegarder en JSON (tables partagées, modèles écrits au fil de l'eau)
+            exporter.add(item)
+            writer.add(item)
             
-            for year, year_data in all_data['models'][brand].items():
-                for model, model_data in year_data.items():
-                    try:
-                        cursor.execute(
-                            'INSERT OR IGNORE INTO models (make_id, name, year, body_type) VALUES (?, ?, ?, ?)',
-                            (make_id, model, year, model_data['body_type'])
-                        )
-                        model_id = cursor.lastrowid or cursor.execute(
-                            'SELECT id FROM models WHERE make_id = ? AND name = ? AND year = ?',
-                            (make_id, model, year)
-                        ).fetchone()[0]
-                        
-                        # Ajouter les motorisations
-                        for engine in model_data['engine_types']:
-                            try:
-                                cursor.execute(
-                                    '''INSERT OR IGNORE INTO engine_types 
-                                    (model_id, type, power, displacement, hybrid_type, battery_capacity)
-                                    VALUES (?, ?, ?, ?, ?, ?)''',
-                                    (
-                                        model_id,
-                                        engine['type'],
-                                        engine.get('power'),
-                                        engine.get('displacement'),
-                                        engine.get('hybrid_type'),
-                                        engine.get('battery')
-                                    )
-                                )
-                            except sqlite3.Error as e:
-                                print(f"Erreur lors de l'ajout de la motorisation pour {brand} {model} {year}: {e}")
-                        
-                        # Ajouter les niveaux de finition
-                        for trim in model_data['trim_levels']:
-                            try:
-                                cursor.execute(
-                                    'INSERT OR IGNORE INTO trim_levels (model_id, category, name) VALUES (?, ?, ?)',
-                                    (model_id, trim['category'], trim['name'])
-                                )
-                            except sqlite3.Error as e:
-                                print(f"Erreur lors de l'ajout de la finition pour {brand} {model} {year}: {e}")
-                        
-                        # Collecter et sauvegarder les avis
-                        print(f"\nCollecte des avis pour {brand} {model} {year}...")
-                        reviews = reviews_collector.collect_reviews(brand, model, year)
-                        if reviews:
-                            for review in reviews:
-                                try:
-                                    cursor.execute(
-                                        'INSERT INTO reviews (model_id, rating, review) VALUES (?, ?, ?)',
-                                        (model_id, review['rating'], review['review'])
-                                    )
-                                except sqlite3.Error as e:
-                                    print(f"Erreur lors de l'ajout de l'avis pour {brand} {model} {year}: {e}")
-                                
-                    except sqlite3.Error as e:
-                        print(f"Erreur lors de l'ajout du modèle {brand} {model} {year}: {e}")
-                        
-        except sqlite3.Error as e:
-            print(f"Erreur lors de l'ajout de la marque {brand}: {e}")
+            # Modèles à passer au crawler d'avis, dans l'ordre du catalogue
+            if review_crawler and item['kind'] == 'model':
+                review_crawler.submit(item['make'], item['model'], item['year'])
     
-    # Créer des index pour améliorer les performances
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_models_make ON models(make_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_engine_model ON engine_types(model_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_trim_model ON trim_levels(model_id)')
-    cursor.execute('CREATE INDEX IF NOT EXISTS idx_reviews_model ON reviews(model_id)')
+    # Collecter et sauvegarder les avis, modèle par modèle dès que toutes ses sources ont répondu
+    if review_crawler:
+        print("\nCollecte des avis...")
+        try:
+            for (brand, model, year), reviews in review_crawler.crawl():
+                for review in reviews:
+                    writer.add(record('review', brand, year, model, review))
+        finally:
+            review_crawler.collector.close()
     
-    conn.commit()
-    conn.close()
+    writer.close()
+    print(f"\nDonnées sauvegardées dans {json_path}")
     print(f"Données sauvegardées dans {db_path}")
 
 if __name__ == '__main__':
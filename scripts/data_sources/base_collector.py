@@ -2,10 +2,14 @@
 Classe de base pour les collecteurs de données
 """
 
-from typing import Dict, Any, List
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Set, Tuple
+from .engine_catalog import EngineCatalog
+from .records import Record, record, iter_model_records, fold_records
+from .run_journal import RunJournal
 from .data import (
     ALL_BRANDS,
     BODY_TYPES,
+    BODY_TYPE_BY_MODEL,
     ENGINE_TYPES,
     TRIM_LEVELS,
     AVAILABLE_OPTIONS,
@@ -13,135 +17,192 @@ from .data import (
 )
 
 class BaseCollector:
-    def __init__(self):
+    # Nom de la source dans le journal de reprise (défini par chaque collecteur)
+    SOURCE = ''
+
+    def __init__(self, engine_catalog: Optional[EngineCatalog] = None):
         self.brands_data = ALL_BRANDS
         self.body_types = BODY_TYPES
+        self.body_type_index = BODY_TYPE_BY_MODEL
         self.engine_types = ENGINE_TYPES
         self.trim_levels = TRIM_LEVELS
         self.available_options = AVAILABLE_OPTIONS
         self.available_colors = AVAILABLE_COLORS
+        # Catalogue de motorisations, éventuellement partagé avec d'autres collecteurs
+        self.engine_catalog = engine_catalog if engine_catalog is not None else EngineCatalog()
 
-    def _get_available_engines(self, brand: str, model: str) -> List[Dict[str, Any]]:
-        """Génère la liste des motorisations disponibles pour une marque et un modèle spécifiques."""
-        engines = []
-        model_lower = model.lower()
+    def collect_full_data(self, start_year: int, end_year: int,
+                          journal: Optional[RunJournal] = None) -> Dict[str, Any]:
+        """Collecte toutes les données des marques du collecteur."""
+        full_data = {
+            'makes': {},
+            'models': {},
+            'types': {},
+            'specs': {},
+            'engines': {}
+        }
+        return fold_records(self.iter_records(start_year, end_year, journal), full_data)
+
+    def iter_records(self, start_year: int, end_year: int,
+                     journal: Optional[RunJournal] = None) -> Iterator[Record]:
+        """Produit en flux les enregistrements (marque, modèle, motorisation, finition) des marques du collecteur."""
+        # Reprendre une exécution interrompue : les années déjà collectées sont relues du journal
+        run_id = journal.start_run(self.SOURCE, start_year, end_year) if journal else None
+        done = journal.load(run_id) if journal else {}
+        published: Set[int] = set()
+
+        for brand in self.brand_names():
+            yield from self.iter_brand_records(brand, start_year, end_year, journal, run_id, done, published)
+
+        if journal:
+            journal.finish_run(run_id)
+
+    def iter_brand_records(self, brand: str, start_year: int, end_year: int,
+                           journal: Optional[RunJournal] = None, run_id: Optional[str] = None,
+                           done: Optional[Dict] = None, published: Optional[Set[int]] = None,
+                           years: Optional[Iterable[Tuple[int, Dict[str, Any]]]] = None) -> Iterator[Record]:
+        """
+        Produit en flux les enregistrements d'une marque.
+
+        Args:
+            brand: Marque
+            start_year: Année de début
+            end_year: Année de fin
+            journal: Journal de reprise (les années terminées y sont enregistrées)
+            run_id: ID de l'exécution dans le journal
+            done: Unités déjà terminées de l'exécution
+            published: IDs des motorisations déjà publiées dans le flux (mis à jour)
+            years: Spécifications déjà construites (voir iter_brand_years), IDs de ce catalogue
+        """
+        brand_data = self.brands_data[brand]
+        published = published if published is not None else set()
+        if years is None:
+            years = self.iter_brand_years(brand, start_year, end_year, journal, run_id, done)
+
+        print(f"Collecte des données pour {brand}...")
+
+        # Informations de la marque
+        yield record('make', brand, data={
+            'name': brand,
+            'country': brand_data['country'],
+            'logo_url': f"https://www.carlogos.org/car-logos/{brand.lower()}-logo.png"
+        })
+
+        for year, year_specs in years:
+            # Motorisations encore jamais publiées, avant les modèles qui les référencent
+            for engine_id, engine in self.engine_catalog.publish(year_specs, published):
+                yield record('engine_variant', brand, data={'id': engine_id, **engine})
+
+            for model, model_specs in year_specs.items():
+                yield from iter_model_records(brand, year, model, model_specs)
+
+    def iter_brand_years(self, brand: str, start_year: int, end_year: int,
+                         journal: Optional[RunJournal] = None, run_id: Optional[str] = None,
+                         done: Optional[Dict] = None) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        """Produit les spécifications des modèles d'une marque, année par année (journal de reprise compris)."""
+        brand_data = self.brands_data[brand]
+        done = done if done is not None else {}
+
+        # Pour chaque année
+        for year in range(start_year, end_year + 1):
+            if year in brand_data['models_by_year']:
+                if (brand, year, '') in done:
+                    year_specs = self.engine_catalog.unpack(done[(brand, year, '')])
+                else:
+                    year_specs = self._collect_year(brand, year, brand_data['models_by_year'][year])
+                    if journal:
+                        payload = self.engine_catalog.pack(year_specs)
+                        units = journal.record(run_id, self.SOURCE, brand, year, payload=payload)
+                        print(f"  [{units}] {brand} {year} : {len(year_specs)} modèles")
+
+                yield year, year_specs
+
+    def _collect_year(self, brand: str, year: int, model_names: List[str]) -> Dict[str, Any]:
+        """Construit les spécifications des modèles d'une marque pour une année."""
+        year_specs = {}
+        # Les finitions ne dépendent que de la marque : une seule liste, partagée par les modèles
+        trim_levels = self._get_trim_levels(brand)
         
-        # Déterminer la gamme du véhicule
-        if any(lux in model_lower for lux in ['série 7', 's-class', 'a8', 'ls']):
-            vehicle_class = 'luxury'
-        elif any(mid in model_lower for mid in ['série 5', 'e-class', 'a6', 'camry']):
-            vehicle_class = 'mid'
-        else:
-            vehicle_class = 'compact'
+        # Pour chaque modèle
+        for model in model_names:
+            # Trouver le type de carrosserie (index inverse construit une seule fois)
+            body_type = self.body_type_index.get(f"{brand} {model}")
             
-        # Déterminer le type de véhicule
-        if any(suv in model_lower for suv in ['suv', 'crossover', 'x', 'q', 'glc', 'rav']):
-            vehicle_type = 'suv'
-        else:
-            vehicle_type = 'car'
-            
-        # Déterminer les types de moteurs disponibles
-        if 'e-' in model_lower or 'ë-' in model_lower or brand == 'Tesla':
-            engine_types = ['Électrique']
-        elif brand in ['BMW', 'Mercedes', 'Audi'] and vehicle_class in ['luxury', 'mid']:
-            engine_types = ['Essence', 'Diesel', 'Hybride Rechargeable']
-        elif brand in ['Toyota', 'Honda']:
-            engine_types = ['Essence', 'Hybride']
-        else:
-            engine_types = ['Essence', 'Diesel']
+            # Créer les spécifications du modèle
+            model_specs = {
+                'name': model,
+                'brand': brand,
+                'year': year,
+                'body_type': body_type,
+                'engine_ids': self._get_engine_ids(brand, model),
+                'trim_levels': trim_levels,
+                'options': self._get_available_options(),
+                'colors': self._get_available_colors()
+            }
             
-        # Générer les motorisations appropriées
+            year_specs[model] = model_specs
+
+        return year_specs
+
+    def _get_engine_ids(self, brand: str, model: str) -> Tuple[int, ...]:
+        """Retourne les IDs des motorisations d'un modèle (gamme internée dans le catalogue)."""
+        engine_types = self._get_engine_types(brand, model)
+        return self.engine_catalog.lineup(
+            tuple(engine_types), lambda: self._build_engines(engine_types)
+        )
+
+    def _get_available_engines(self, brand: str, model: str) -> List[Dict[str, Any]]:
+        """Génère la liste des motorisations disponibles pour une marque et un modèle spécifiques."""
+        return self.engine_catalog.resolve(self._get_engine_ids(brand, model))
+
+    def _build_engines(self, engine_types: List[str]) -> List[Dict[str, Any]]:
+        """Construit les motorisations de chaque type (produit puissances × variantes)."""
+        engines = []
+
         for engine_type in engine_types:
             if engine_type == 'Essence':
-                # Sélectionner une seule cylindrée appropriée
-                if vehicle_class == 'luxury':
-                    displacement = 2998
-                    powers = [300, 350]
-                elif vehicle_class == 'mid':
-                    displacement = 1984
-                    powers = [180, 250]
-                else:
-                    displacement = 1332
-                    powers = [110, 130]
-                    
-                for power in powers:
-                    engines.append({
-                        'type': engine_type,
-                        'power': power,
-                        'displacement': displacement
-                    })
-                    
+                for power in self.engine_types[engine_type]['puissances']:
+                    for displacement in self.engine_types[engine_type]['cylindrees']:
+                        engines.append({
+                            'type': engine_type,
+                            'power': power,
+                            'displacement': displacement
+                        })
             elif engine_type == 'Diesel':
-                # Sélectionner une seule cylindrée appropriée
-                if vehicle_class == 'luxury':
-                    displacement = 2993
-                    powers = [300, 350]
-                elif vehicle_class == 'mid':
-                    displacement = 1995
-                    powers = [180, 250]
-                else:
-                    displacement = 1461
-                    powers = [90, 110]
-                    
-                for power in powers:
-                    engines.append({
-                        'type': engine_type,
-                        'power': power,
-                        'displacement': displacement
-                    })
-                    
-            elif engine_type == 'Hybride':
-                # Une seule version hybride par modèle
-                if vehicle_class == 'luxury':
-                    power = 180
-                else:
-                    power = 140
-                    
-                engines.append({
-                    'type': engine_type,
-                    'power': power,
-                    'hybrid_type': 'HEV'
-                })
-                
-            elif engine_type == 'Hybride Rechargeable':
-                # Une seule version PHEV par modèle
-                if vehicle_class == 'luxury':
-                    power = 300
-                else:
-                    power = 225
-                    
-                engines.append({
-                    'type': engine_type,
-                    'power': power,
-                    'hybrid_type': 'PHEV'
-                })
-                
+                for power in self.engine_types[engine_type]['puissances']:
+                    for displacement in self.engine_types[engine_type]['cylindrees']:
+                        engines.append({
+                            'type': engine_type,
+                            'power': power,
+                            'displacement': displacement
+                        })
+            elif engine_type in ['Hybride', 'Hybride Rechargeable']:
+                for power in self.engine_types[engine_type]['puissances']:
+                    for hybrid_type in self.engine_types[engine_type]['types']:
+                        engines.append({
+                            'type': engine_type,
+                            'power': power,
+                            'hybrid_type': hybrid_type
+                        })
             elif engine_type == 'Électrique':
-                # Une ou deux versions selon le type
-                if vehicle_type == 'suv':
-                    if vehicle_class == 'luxury':
-                        powers = [400, 500]
-                        battery = 100
-                    else:
-                        powers = [300, 400]
-                        battery = 77
-                else:
-                    if vehicle_class == 'luxury':
-                        powers = [400]
-                        battery = 100
-                    else:
-                        powers = [170]
-                        battery = 60
-                        
-                for power in powers:
-                    engines.append({
-                        'type': engine_type,
-                        'power': power,
-                        'battery': battery
-                    })
+                for power in self.engine_types[engine_type]['puissances']:
+                    for battery in self.engine_types[engine_type]['batteries']:
+                        engines.append({
+                            'type': engine_type,
+                            'power': power,
+                            'battery': battery
+                        })
         
         return engines
 
+    def brand_names(self) -> List[str]:
+        """Marques couvertes par le collecteur, dans l'ordre de collecte."""
+        raise NotImplementedError
+
+    def _get_engine_types(self, brand: str, model: str) -> List[str]:
+        """Détermine les types de moteurs disponibles en fonction du modèle."""
+        raise NotImplementedError
+
     def _get_trim_levels(self, brand: str) -> List[Dict[str, Any]]:
         """Génère la liste des niveaux de finition pour une marque spécifique."""
         trims = []
@@ -169,18 +230,8 @@ class BaseCollector:
 
     def _get_available_options(self) -> Dict[str, List[str]]:
         """Retourne la liste des options disponibles."""
-        # Limiter à 3 options par catégorie
-        limited_options = {}
-        for category, options in self.available_options.items():
-            limited_options[category] = options[:3]
-        return limited_options
+        return self.available_options
 
     def _get_available_colors(self) -> Dict[str, Dict[str, str]]:
         """Retourne la liste des couleurs disponibles."""
-        # Limiter à 5 couleurs par modèle
-        standard_colors = ['Blanc Nacré', 'Noir Étoilé', 'Gris Titanium', 'Bleu Iron', 'Rouge Flamme']
-        limited_colors = {}
-        for color in standard_colors:
-            if color in self.available_colors:
-                limited_colors[color] = self.available_colors[color]
-        return limited_colors
+        return self.available_colors
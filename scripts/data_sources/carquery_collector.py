@@ -1,13 +1,19 @@
 import requests
 import time
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
 from .config import APIS
+from .records import Record, record, fold_records
+from .response_cache import ResponseCache
+from .run_journal import RunJournal
 
 class CarQueryCollector:
-    def __init__(self):
+    def __init__(self, cache: Optional[ResponseCache] = None, batched: bool = True):
         self.base_url = APIS['CARQUERY']['base_url']
         self.session = requests.Session()
         self.rate_limit_delay = 1
+        self.cache = cache
+        # Une requête getTrims par marque et par année au lieu de deux par modèle
+        self.batched = batched
 
     def get_all_makes(self, year: int = None) -> List[Dict[str, Any]]:
         """Récupère toutes les marques disponibles."""
@@ -48,11 +54,56 @@ class CarQueryCollector:
         
         return self._make_request(params)
 
+    def get_make_trims(self, make: str, year: int) -> List[Dict[str, Any]]:
+        """Récupère en une requête toutes les versions d'une marque pour une année."""
+        params = {
+            'cmd': 'getTrims',
+            'make': make,
+            'year': year
+        }
+        
+        return self._results(self._make_request(params), 'Trims')
+
+    @staticmethod
+    def _results(response: Any, key: str) -> List[Dict[str, Any]]:
+        """Extrait la liste de résultats de l'enveloppe renvoyée par l'API."""
+        if isinstance(response, dict):
+            return response.get(key, [])
+        return response or []
+
+    @staticmethod
+    def _group_trims(trims: List[Dict[str, Any]]) -> Dict[str, List[Dict[str, Any]]]:
+        """Regroupe les versions par modèle en conservant l'ordre de l'API."""
+        by_model: Dict[str, List[Dict[str, Any]]] = {}
+        for trim in trims:
+            model_name = trim.get('model_name')
+            if model_name:
+                by_model.setdefault(model_name, []).append(trim)
+        return by_model
+
+    @staticmethod
+    def _model_details_from_trims(trims: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Déduit les détails d'un modèle : les champs communs à toutes ses versions."""
+        first, others = trims[0], trims[1:]
+        return {
+            field: value
+            for field, value in first.items()
+            if all(trim.get(field) == value for trim in others)
+        }
+
     def _make_request(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """Effectue une requête HTTP avec gestion des erreurs et rate limiting."""
         try:
-            time.sleep(self.rate_limit_delay)
-            response = self.session.get(self.base_url, params=params)
+            if self.cache:
+                # Le délai ne s'applique qu'aux accès réseau
+                response = self.cache.fetch(
+                    self.session, self.base_url, params=params,
+                    throttle=lambda: time.sleep(self.rate_limit_delay),
+                    ttl=APIS['CARQUERY'].get('cache_ttl')
+                )
+            else:
+                time.sleep(self.rate_limit_delay)
+                response = self.session.get(self.base_url, params=params)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
@@ -62,13 +113,69 @@ class CarQueryCollector:
             print(f"Erreur lors du parsing de la réponse CarQuery: {str(e)}")
             return {}
 
-    def collect_full_data(self, start_year: int, end_year: int) -> Dict[str, Any]:
+    def collect_full_data(self, start_year: int, end_year: int,
+                          journal: Optional[RunJournal] = None) -> Dict[str, Any]:
         """Collecte toutes les données disponibles pour une période donnée."""
         full_data = {
             'makes': {},
             'models': {},
             'trims': {}
         }
+        return fold_records(self.iter_records(start_year, end_year, journal), full_data)
+
+    def iter_records(self, start_year: int, end_year: int,
+                     journal: Optional[RunJournal] = None) -> Iterator[Record]:
+        """Produit en flux les enregistrements (marque, modèle, version) d'une période donnée."""
+        # Reprendre une exécution interrompue : les modèles déjà collectés sont relus du journal
+        run_id = journal.start_run('carquery', start_year, end_year) if journal else None
+        done = journal.load(run_id) if journal else {}
+
+        if self.batched:
+            yield from self._iter_batched(start_year, end_year, journal, run_id, done)
+        else:
+            yield from self._iter_per_model(start_year, end_year, journal, run_id, done)
+
+        if journal:
+            journal.finish_run(run_id)
+
+    def _iter_batched(self, start_year: int, end_year: int, journal: Optional[RunJournal],
+                      run_id: Optional[str], done: Dict) -> Iterator[Record]:
+        """Collecte une marque/année en une seule requête getTrims."""
+        seen_makes = set()
+
+        for year in range(start_year, end_year + 1):
+            print(f"Collecte des données CarQuery pour {year}...")
+            
+            # Récupérer toutes les marques
+            makes = self._results(self.get_all_makes(year), 'Makes')
+            for make in makes:
+                make_name = make.get('make_display')
+                if not make_name:
+                    continue
+
+                # Informations de la marque
+                if make_name not in seen_makes:
+                    seen_makes.add(make_name)
+                    yield record('make', make_name, data=make)
+
+                # Toutes les versions de la marque pour l'année
+                trims = done.get((make_name, year, ''))
+                if trims is None:
+                    trims = self.get_make_trims(make.get('make_id', make_name), year)
+                    if journal and trims:
+                        units = journal.record(run_id, 'carquery', make_name, year, payload=trims)
+                        print(f"    [{units}] {make_name} {year} : {len(trims)} versions")
+
+                # Regroupement local par modèle
+                for model_name, model_trims in self._group_trims(trims).items():
+                    yield record('model', make_name, year, model_name, self._model_details_from_trims(model_trims))
+                    for trim in model_trims:
+                        yield record('trim', make_name, year, model_name, trim)
+
+    def _iter_per_model(self, start_year: int, end_year: int, journal: Optional[RunJournal],
+                        run_id: Optional[str], done: Dict) -> Iterator[Record]:
+        """Collecte les détails et versions de chaque modèle séparément."""
+        seen_makes = set()
 
         for year in range(start_year, end_year + 1):
             print(f"Collecte des données CarQuery pour {year}...")
@@ -80,34 +187,35 @@ class CarQueryCollector:
                 if not make_name:
                     continue
 
-                # Stocker les informations de la marque
-                if make_name not in full_data['makes']:
-                    full_data['makes'][make_name] = make
+                # Informations de la marque
+                if make_name not in seen_makes:
+                    seen_makes.add(make_name)
+                    yield record('make', make_name, data=make)
 
                 # Récupérer les modèles
                 models = self.get_models(make_name, year)
-                if make_name not in full_data['models']:
-                    full_data['models'][make_name] = {}
                 
                 for model in models:
                     model_name = model.get('model_name')
                     if not model_name:
                         continue
 
-                    # Récupérer les détails du modèle
-                    model_details = self.get_model_details(model.get('model_id'))
-                    
-                    if year not in full_data['models'][make_name]:
-                        full_data['models'][make_name][year] = {}
-                    
-                    full_data['models'][make_name][year][model_name] = model_details
-
-                    # Récupérer les versions
-                    trims = self.get_model_trims(make_name, model_name, year)
-                    if make_name not in full_data['trims']:
-                        full_data['trims'][make_name] = {}
-                    if year not in full_data['trims'][make_name]:
-                        full_data['trims'][make_name][year] = {}
-                    full_data['trims'][make_name][year][model_name] = trims
-
-        return full_data
+                    unit = done.get((make_name, year, model_name))
+                    if unit is None:
+                        # Récupérer les détails du modèle et ses versions
+                        unit = {
+                            'details': self.get_model_details(model.get('model_id')),
+                            'trims': self.get_model_trims(make_name, model_name, year)
+                        }
+                        if journal:
+                            units = journal.record(run_id, 'carquery', make_name, year, model_name, unit)
+                            print(f"    [{units}] {make_name} {year} {model_name}")
+
+                    yield record('model', make_name, year, model_name, unit['details'])
+
+                    # Versions du modèle (l'API les renvoie sous la clé 'Trims')
+                    trims = unit['trims']
+                    if isinstance(trims, dict):
+                        trims = trims.get('Trims', [])
+                    for trim in trims:
+                        yield record('trim', make_name, year, model_name, trim)
@@ -0,0 +1,209 @@
+"""
+Export JSON normalisé du catalogue (tables partagées et références)
+"""
+
+import gzip
+import json
+from pathlib import Path
+from typing import IO, Any, Dict, Iterator, List, Optional, Tuple, Union
+from .records import Record
+
+FORMAT_VERSION = 2
+
+# Champs des spécifications d'un modèle remplacés par une référence vers une
+# table partagée : champ -> (clé de la référence dans le modèle, table)
+SHARED_FIELDS = {
+    'options': ('options', 'options'),
+    'colors': ('colors', 'colors'),
+    'engine_ids': ('engine_lineup', 'engine_lineups'),
+    'trim_levels': ('trims', 'trims')
+}
+
+# Champs redondants avec la clé (marque, année, modèle) ou toujours vides dans les enregistrements
+_DROPPED_FIELDS = ('name', 'brand', 'year', 'engine_types')
+
+class _SharedTable:
+    """Valeurs distinctes d'un champ partagé, numérotées à partir de 1."""
+
+    def __init__(self):
+        self.values: List[Any] = []
+        self._refs: Dict[str, int] = {}
+        # Les collecteurs réutilisent les mêmes objets : l'identité évite de resérialiser
+        self._by_identity: Dict[int, Tuple[Any, int]] = {}
+
+    def ref(self, value: Any, by_identity: bool = True) -> int:
+        if by_identity:
+            cached = self._by_identity.get(id(value))
+            if cached is not None and cached[0] is value:
+                return cached[1]
+
+        key = json.dumps(value, sort_keys=True, ensure_ascii=False)
+        ref = self._refs.get(key)
+        if ref is None:
+            self.values.append(value)
+            ref = self._refs[key] = len(self.values)
+        if by_identity:
+            self._by_identity[id(value)] = (value, ref)
+        return ref
+
+class CatalogExporter:
+    """
+    Écrit en flux le catalogue au format normalisé.
+
+    Les options, couleurs, finitions et gammes de motorisations (listes d'IDs
+    de la table `engines`) identiques d'un modèle à l'autre sont écrites une
+    seule fois dans des tables partagées : chaque modèle ne porte que leurs
+    numéros. Les modèles sont écrits au fil des enregistrements, les tables
+    (de petite taille) à la fermeture :
+
+        {"format": 2, "models": [...], "engines": {...}, "options": {...},
+         "colors": {...}, "engine_lineups": {...}, "trims": {...},
+         "makes": {...}, "types": {...}}
+
+    En mode compact, le document est écrit sans espaces et compressé (gzip).
+    """
+
+    def __init__(self, path: Union[str, Path], compact: bool = False):
+        """
+        Ouvre le fichier d'export.
+
+        Args:
+            path: Chemin du fichier JSON (suffixe .gz conseillé en mode compact)
+            compact: Écrire sans espaces et compresser avec gzip
+        """
+        self.path = Path(path)
+        self.compact = compact
+        self._separators = (',', ':') if compact else (', ', ': ')
+        self._newline = '' if compact else '\n'
+        self._file: IO[str] = (
+            gzip.open(self.path, 'wt', encoding='utf-8') if compact
+            else open(self.path, 'w', encoding='utf-8')
+        )
+
+        self._tables = {table: _SharedTable() for _, table in SHARED_FIELDS.values()}
+        self._engines: Dict[int, Dict[str, Any]] = {}
+        self._makes: Dict[str, Any] = {}
+        self._types: Dict[str, Any] = {}
+        self._model_count = 0
+        # Modèle en cours : ses finitions le suivent dans le flux
+        self._current: Optional[Dict[str, Any]] = None
+        self._trims: List[Dict[str, Any]] = []
+
+        self._file.write(f'{{"format":{FORMAT_VERSION},"models":[')
+
+    def _dumps(self, value: Any) -> str:
+        return json.dumps(value, ensure_ascii=False, separators=self._separators)
+
+    def add(self, item: Record) -> None:
+        """Ajoute un enregistrement produit par un collecteur."""
+        kind, make, data = item['kind'], item['make'], item['data']
+
+        if kind == 'model':
+            self._write_current()
+            entry = {'make': make, 'year': item['year'], 'model': item['model']}
+            for field, value in (data or {}).items():
+                if field in SHARED_FIELDS:
+                    # Les finitions suivent le modèle en enregistrements séparés
+                    if field != 'trim_levels' or value:
+                        key, table = SHARED_FIELDS[field]
+                        entry[key] = self._tables[table].ref(value)
+                elif field not in _DROPPED_FIELDS:
+                    entry[field] = value
+            self._current = entry
+
+        elif kind == 'trim':
+            self._trims.append(data)
+
+        elif kind == 'engine_variant':
+            self._engines[data['id']] = {key: value for key, value in data.items() if key != 'id'}
+
+        elif kind == 'make':
+            if data:
+                self._makes[make] = data
+
+        elif kind == 'vehicle_types':
+            self._types[make] = data
+
+    def _write_current(self) -> None:
+        if self._current is None:
+            return
+
+        if self._trims:
+            # Liste propre au modèle : pas de cache par identité
+            self._current['trims'] = self._tables['trims'].ref(self._trims, by_identity=False)
+            self._trims = []
+
+        prefix = ',' if self._model_count else ''
+        self._file.write(f'{prefix}{self._newline}{self._dumps(self._current)}')
+        self._model_count += 1
+        self._current = None
+
+    def _write_table(self, name: str, values: Dict[Any, Any]) -> None:
+        self._file.write(f',{self._newline}"{name}":{{')
+        for position, (key, value) in enumerate(values.items()):
+            prefix = ',' if position else ''
+            self._file.write(
+                f'{prefix}{self._newline}{self._dumps(str(key))}{self._separators[1]}{self._dumps(value)}'
+            )
+        self._file.write(f'{self._newline}}}')
+
+    def close(self) -> None:
+        """Écrit le dernier modèle et les tables partagées, puis ferme le fichier."""
+        self._write_current()
+        self._file.write(f'{self._newline}]')
+
+        self._write_table('engines', dict(sorted(self._engines.items())))
+        for name, table in self._tables.items():
+            self._write_table(name, dict(enumerate(table.values, start=1)))
+        self._write_table('makes', self._makes)
+        self._write_table('types', self._types)
+
+        self._file.write(f'}}{self._newline}')
+        self._file.close()
+
+    def __enter__(self) -> 'CatalogExporter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+def load_catalog(path: Union[str, Path]) -> Dict[str, Any]:
+    """
+    Charge un export normalisé (compressé ou non).
+
+    Args:
+        path: Chemin du fichier JSON
+
+    Returns:
+        Dict[str, Any]: Document tel qu'écrit par CatalogExporter
+    """
+    with open(path, 'rb') as f:
+        compressed = f.read(2) == b'\x1f\x8b'
+    opener = gzip.open if compressed else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        return json.load(f)
+
+def iter_models(catalog: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """
+    Parcourt les modèles d'un export en résolvant leurs références.
+
+    Les objets des tables partagées ne sont pas copiés : plusieurs modèles
+    peuvent renvoyer le même dictionnaire d'options ou de couleurs.
+
+    Args:
+        catalog: Document chargé par load_catalog
+
+    Returns:
+        Iterator[Dict[str, Any]]: Spécifications complètes de chaque modèle
+    """
+    engines = catalog.get('engines', {})
+    tables = {table: catalog.get(table, {}) for _, table in SHARED_FIELDS.values()}
+
+    for entry in catalog['models']:
+        specs = dict(entry)
+        for field, (key, table) in SHARED_FIELDS.items():
+            if key in specs:
+                specs[field] = tables[table][str(specs.pop(key))]
+        specs.setdefault('trim_levels', [])
+        specs['engine_types'] = [engines[str(engine_id)] for engine_id in specs.get('engine_ids', ())]
+        yield specs
@@ -193,6 +193,12 @@ APIS = {
     'NHTSA': {
         'base_url': 'https://vpic.nhtsa.dot.gov/api/vehicles',
         'requires_key': False
+    },
+    'CARQUERY': {
+        'base_url': 'https://www.carqueryapi.com/api/0.3/',
+        'requires_key': False,
+        # Pas d'ETag ni de Last-Modified : durée de validité forcée
+        'cache_ttl': 7 * 24 * 3600
     }
 }
 
@@ -0,0 +1,280 @@
+"""
+Frontière de crawl persistante des pages d'avis
+"""
+
+import json
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+class CrawlFrontier:
+    """
+    Suivi des URLs téléchargées dans la table `request_history`.
+
+    Chaque URL (identifiée par l'empreinte de sa forme normalisée) garde sa
+    dernière date de téléchargement, son statut, l'empreinte de son contenu,
+    ce qui en a été extrait et la date à laquelle elle doit être revisitée.
+    L'intervalle de revisite double tant que le contenu ne change pas et
+    revient à sa valeur initiale dès qu'il change : une recollecte ne
+    télécharge que les pages périmées et relit l'extraction des autres.
+    """
+
+    # Nombre maximal de paramètres liés dans une requête SQLite
+    SQL_VARIABLES_PER_QUERY = 900
+
+    def __init__(
+        self,
+        db_path: str,
+        revisit_after: timedelta = timedelta(days=7),
+        max_revisit_after: timedelta = timedelta(days=90),
+        retry_after: timedelta = timedelta(hours=1)
+    ):
+        """
+        Initialise la frontière.
+
+        Args:
+            db_path: Chemin vers la base de données SQLite des avis
+            revisit_after: Intervalle de revisite initial
+            max_revisit_after: Intervalle de revisite maximal (contenu stable)
+            retry_after: Délai avant de retenter une URL en échec
+        """
+        self.db_path = str(db_path)
+        self.revisit_after = revisit_after
+        self.max_revisit_after = max_revisit_after
+        self.retry_after = retry_after
+        self._lock = threading.Lock()
+
+        with sqlite3.connect(self.db_path) as conn:
+            self.create_schema(conn)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    @staticmethod
+    def create_schema(conn: sqlite3.Connection) -> None:
+        """Crée la table de la frontière et migre l'ancien journal des requêtes."""
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(request_history)')]
+        if columns and 'fingerprint' not in columns:
+            # L'ancien journal (une ligne par requête) n'était pas alimenté :
+            # il n'est conservé sous un autre nom que s'il contient des lignes
+            if conn.execute('SELECT COUNT(*) FROM request_history').fetchone()[0]:
+                conn.execute('ALTER TABLE request_history RENAME TO request_history_legacy')
+            else:
+                conn.execute('DROP TABLE request_history')
+
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS request_history (
+            fingerprint TEXT PRIMARY KEY,
+            url TEXT NOT NULL,
+            status TEXT NOT NULL,
+            content_digest TEXT,
+            last_fetch TEXT NOT NULL,
+            next_due TEXT NOT NULL,
+            revisit_seconds REAL NOT NULL,
+            fetch_count INTEGER NOT NULL DEFAULT 0,
+            error_message TEXT,
+            extraction TEXT
+        )
+        ''')
+
+        # Frontières créées avant la conservation des extractions
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(request_history)')]
+        if 'extraction' not in columns:
+            conn.execute('ALTER TABLE request_history ADD COLUMN extraction TEXT')
+
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_request_history_due ON request_history(next_due)')
+
+    @staticmethod
+    def fingerprint(url: str) -> str:
+        """
+        Empreinte d'une URL normalisée (casse du domaine, fragment, ordre des paramètres).
+
+        Args:
+            url: URL à identifier
+
+        Returns:
+            str: Empreinte SHA-256 de l'URL
+        """
+        parsed = urlparse(url.strip())
+        normalized = urlunparse((
+            parsed.scheme.lower(),
+            parsed.netloc.lower(),
+            parsed.path or '/',
+            parsed.params,
+            urlencode(sorted(parse_qsl(parsed.query, keep_blank_values=True))),
+            ''
+        ))
+        return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+    def due_dates(self, urls: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Dates de revisite de plusieurs URLs.
+
+        Args:
+            urls: URLs à consulter
+
+        Returns:
+            Dict[str, Optional[str]]: Date ISO de revisite par URL (None si jamais téléchargée)
+        """
+        fingerprints = {url: self.fingerprint(url) for url in urls}
+        known = {}
+        unique = list(set(fingerprints.values()))
+
+        with self._connect() as conn:
+            for offset in range(0, len(unique), self.SQL_VARIABLES_PER_QUERY):
+                chunk = unique[offset:offset + self.SQL_VARIABLES_PER_QUERY]
+                placeholders = ', '.join('?' for _ in chunk)
+                known.update(conn.execute(
+                    f'SELECT fingerprint, next_due FROM request_history WHERE fingerprint IN ({placeholders})',
+                    chunk
+                ).fetchall())
+
+        return {url: known.get(fingerprint) for url, fingerprint in fingerprints.items()}
+
+    def is_due(self, url: str, now: Optional[datetime] = None) -> bool:
+        """Indique si une URL doit être (re)téléchargée."""
+        next_due = self.due_dates([url])[url]
+        return next_due is None or next_due <= (now or datetime.now()).isoformat()
+
+    def prioritize(self, urls: Iterable[str], now: Optional[datetime] = None) -> List[str]:
+        """
+        Filtre les URLs à télécharger et les ordonne de la plus périmée à la moins périmée.
+
+        Les URLs jamais téléchargées passent en premier ; les URLs encore
+        fraîches sont écartées.
+
+        Args:
+            urls: URLs candidates
+            now: Date de référence (maintenant par défaut)
+
+        Returns:
+            List[str]: URLs à télécharger, sans doublons
+        """
+        by_fingerprint = {}
+        for url in urls:
+            by_fingerprint.setdefault(self.fingerprint(url), url)
+
+        due_dates = self.due_dates(by_fingerprint.values())
+        now_iso = (now or datetime.now()).isoformat()
+
+        due = [
+            (due_dates[url] or '', url)
+            for url in by_fingerprint.values()
+            if due_dates[url] is None or due_dates[url] <= now_iso
+        ]
+        return [url for _, url in sorted(due, key=lambda item: item[0])]
+
+    def due(self, limit: int = 100, now: Optional[datetime] = None) -> List[str]:
+        """
+        URLs connues arrivées à échéance, les plus périmées d'abord.
+
+        Args:
+            limit: Nombre maximal d'URLs
+            now: Date de référence (maintenant par défaut)
+
+        Returns:
+            List[str]: URLs à revisiter
+        """
+        with self._connect() as conn:
+            rows = conn.execute('''
+            SELECT url FROM request_history
+            WHERE next_due <= ?
+            ORDER BY next_due
+            LIMIT ?
+            ''', ((now or datetime.now()).isoformat(), limit)).fetchall()
+        return [row[0] for row in rows]
+
+    def stored_extraction(self, url: str, content: Optional[bytes] = None) -> Optional[Any]:
+        """
+        Extraction enregistrée avec le dernier téléchargement d'une URL.
+
+        Args:
+            url: URL à consulter
+            content: Contenu reçu ; l'extraction n'est alors rendue que si ce
+                contenu est celui dont elle a été tirée
+
+        Returns:
+            Optional[Any]: Extraction (décodée du JSON), None si aucune ne correspond
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT content_digest, extraction FROM request_history WHERE fingerprint = ?',
+                (self.fingerprint(url),)
+            ).fetchone()
+
+        if not row or row[1] is None:
+            return None
+        if content is not None and hashlib.sha256(content).hexdigest() != row[0]:
+            return None
+        return json.loads(row[1])
+
+    def record_fetch(self, url: str, content: Optional[bytes] = None,
+                     error: Optional[str] = None, extraction: Optional[Any] = None) -> bool:
+        """
+        Enregistre le résultat d'un téléchargement et planifie la prochaine visite.
+
+        L'extraction est écrite avec l'empreinte du contenu : une page n'est
+        jamais marquée comme visitée sans ce qui en a été tiré.
+
+        Args:
+            url: URL téléchargée
+            content: Contenu reçu (None en cas d'échec)
+            error: Message d'erreur en cas d'échec
+            extraction: Données tirées du contenu (sérialisables en JSON) ; sans
+                extraction, celle d'un contenu inchangé ou d'un échec est conservée
+
+        Returns:
+            bool: True si le contenu est nouveau ou a changé depuis la dernière visite
+        """
+        fingerprint = self.fingerprint(url)
+        now = datetime.now()
+
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                'SELECT content_digest, revisit_seconds, extraction FROM request_history WHERE fingerprint = ?',
+                (fingerprint,)
+            ).fetchone()
+            previous_digest, interval, stored = row if row else (None, self.revisit_after.total_seconds(), None)
+
+            if content is None:
+                status, digest, changed = 'error', previous_digest, False
+                delay = self.retry_after.total_seconds()
+            else:
+                digest = hashlib.sha256(content).hexdigest()
+                changed = digest != previous_digest
+                if changed:
+                    status, interval = 'changed', self.revisit_after.total_seconds()
+                    stored = None
+                else:
+                    status = 'unchanged'
+                    interval = min(interval * 2, self.max_revisit_after.total_seconds())
+                delay = interval
+
+            if extraction is not None:
+                stored = json.dumps(extraction, ensure_ascii=False)
+
+            conn.execute('''
+            INSERT INTO request_history
+                (fingerprint, url, status, content_digest, last_fetch, next_due,
+                 revisit_seconds, fetch_count, error_message, extraction)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 1, ?, ?)
+            ON CONFLICT(fingerprint) DO UPDATE SET
+                url = excluded.url,
+                status = excluded.status,
+                content_digest = excluded.content_digest,
+                last_fetch = excluded.last_fetch,
+                next_due = excluded.next_due,
+                revisit_seconds = excluded.revisit_seconds,
+                fetch_count = request_history.fetch_count + 1,
+                error_message = excluded.error_message,
+                extraction = excluded.extraction
+            ''', (
+                fingerprint, url, status, digest,
+                now.isoformat(), (now + timedelta(seconds=delay)).isoformat(),
+                interval, error, stored
+            ))
+
+        return changed
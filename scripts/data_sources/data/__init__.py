@@ -8,6 +8,7 @@ from .asian_brands import ASIAN_BRANDS
 from .american_brands import AMERICAN_BRANDS
 from .specs import (
     BODY_TYPES,
+    BODY_TYPE_BY_MODEL,
     ENGINE_TYPES,
     TRIM_LEVELS,
     AVAILABLE_OPTIONS,
@@ -13,6 +13,13 @@ BODY_TYPES = {
     'Cabriolet': ['BMW Série 4 Cabriolet', 'Mercedes Classe C Cabriolet', 'Audi A5 Cabriolet']
 }
 
+# Index inverse : modèle complet -> type de carrosserie (le premier type listé l'emporte)
+BODY_TYPE_BY_MODEL = {
+    model: type_name
+    for type_name, models in reversed(BODY_TYPES.items())
+    for model in models
+}
+
 # Types de motorisation
 ENGINE_TYPES = {
     'Essence': {
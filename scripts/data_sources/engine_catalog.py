@@ -0,0 +1,148 @@
+"""
+Catalogue partagé des motorisations (variantes internées)
+"""
+
+from typing import Any, Callable, Dict, Hashable, Iterable, Iterator, List, Sequence, Set, Tuple
+
+EngineVariant = Dict[str, Any]
+
+# Champs identifiant une motorisation, dans l'ordre des dictionnaires produits
+VARIANT_FIELDS = ('type', 'power', 'displacement', 'hybrid_type', 'battery')
+
+class EngineCatalog:
+    """
+    Dictionnaire des motorisations distinctes, référencées par ID.
+
+    Chaque variante n'est construite qu'une fois : les modèles-années ne
+    portent que la liste des IDs de leurs motorisations (`engine_ids`). Les
+    gammes (listes d'IDs) sont elles aussi mémorisées par clé, ce qui évite de
+    refaire le produit puissances × cylindrées pour chaque modèle et chaque
+    année. Les IDs commencent à 1 et suivent l'ordre d'internement.
+    """
+
+    def __init__(self):
+        """Initialise un catalogue vide."""
+        self._variants: List[EngineVariant] = []
+        self._ids: Dict[Tuple, int] = {}
+        self._lineups: Dict[Hashable, Tuple[int, ...]] = {}
+
+    @staticmethod
+    def variant_key(engine: EngineVariant) -> Tuple:
+        """Clé d'une motorisation (valeurs de VARIANT_FIELDS)."""
+        return tuple(engine.get(field) for field in VARIANT_FIELDS)
+
+    def intern(self, engine: EngineVariant) -> int:
+        """
+        Enregistre une motorisation si elle est nouvelle.
+
+        Args:
+            engine: Motorisation ('type', 'power', puis cylindrée, type d'hybride ou batterie)
+
+        Returns:
+            int: ID de la motorisation
+        """
+        key = self.variant_key(engine)
+        engine_id = self._ids.get(key)
+        if engine_id is None:
+            self._variants.append({
+                field: value for field, value in zip(VARIANT_FIELDS, key) if value is not None
+            })
+            engine_id = self._ids[key] = len(self._variants)
+        return engine_id
+
+    def lineup(self, key: Hashable, build: Callable[[], Iterable[EngineVariant]]) -> Tuple[int, ...]:
+        """
+        IDs d'une gamme de motorisations, construite au premier appel seulement.
+
+        Args:
+            key: Clé décrivant entièrement la gamme (ex. types de moteurs proposés)
+            build: Fonction produisant les motorisations de la gamme
+
+        Returns:
+            Tuple[int, ...]: IDs des motorisations, dans l'ordre de construction
+        """
+        ids = self._lineups.get(key)
+        if ids is None:
+            ids = self._lineups[key] = tuple(self.intern(engine) for engine in build())
+        return ids
+
+    def get(self, engine_id: int) -> EngineVariant:
+        """Motorisation d'un ID (dictionnaire partagé, à ne pas modifier)."""
+        return self._variants[engine_id - 1]
+
+    def resolve(self, engine_ids: Iterable[int]) -> List[EngineVariant]:
+        """Motorisations d'une liste d'IDs."""
+        return [self._variants[engine_id - 1] for engine_id in engine_ids]
+
+    def items(self) -> Iterator[Tuple[int, EngineVariant]]:
+        """Parcourt les motorisations (ID, motorisation) dans l'ordre des IDs."""
+        return enumerate(self._variants, start=1)
+
+    def publish(self, year_specs: Dict[str, Any], published: Set[int]) -> List[Tuple[int, EngineVariant]]:
+        """
+        Motorisations référencées par des spécifications et pas encore publiées.
+
+        Permet de produire chaque variante une seule fois dans un flux
+        d'enregistrements, avant le premier modèle qui la référence.
+
+        Args:
+            year_specs: Spécifications des modèles d'une marque pour une année
+            published: IDs déjà publiés dans le flux (mis à jour)
+
+        Returns:
+            List[Tuple[int, EngineVariant]]: Motorisations à publier, par ID croissant
+        """
+        fresh = sorted({
+            engine_id for specs in year_specs.values() for engine_id in specs['engine_ids']
+        } - published)
+        published.update(fresh)
+        return [(engine_id, self.get(engine_id)) for engine_id in fresh]
+
+    def __len__(self) -> int:
+        return len(self._variants)
+
+    def pack(self, year_specs: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Prépare les spécifications d'une année pour le journal de reprise.
+
+        Les IDs ne valent que pour ce catalogue : les motorisations référencées
+        sont jointes pour pouvoir les réinterner lors d'une reprise.
+
+        Args:
+            year_specs: Spécifications des modèles d'une marque pour une année
+
+        Returns:
+            Dict[str, Any]: Données sérialisables en JSON
+        """
+        used = sorted({engine_id for specs in year_specs.values() for engine_id in specs['engine_ids']})
+        return {
+            'models': year_specs,
+            'engines': {str(engine_id): self.get(engine_id) for engine_id in used}
+        }
+
+    def unpack(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Relit des spécifications écrites par `pack` en réinternant leurs motorisations.
+
+        Args:
+            payload: Données relues du journal
+
+        Returns:
+            Dict[str, Any]: Spécifications des modèles, IDs de ce catalogue
+        """
+        if 'engines' not in payload:
+            # Journal antérieur au catalogue : motorisations complètes par modèle
+            return {
+                model: self._reference(specs, specs.pop('engine_types', []))
+                for model, specs in payload.items()
+            }
+
+        ids = {int(engine_id): self.intern(engine) for engine_id, engine in payload['engines'].items()}
+        return {
+            model: {**specs, 'engine_ids': tuple(ids[engine_id] for engine_id in specs['engine_ids'])}
+            for model, specs in payload['models'].items()
+        }
+
+    def _reference(self, specs: Dict[str, Any], engines: Sequence[EngineVariant]) -> Dict[str, Any]:
+        specs['engine_ids'] = tuple(self.intern(engine) for engine in engines)
+        return specs
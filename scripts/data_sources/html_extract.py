@@ -0,0 +1,173 @@
+"""
+Extraction ciblée des liens et des articles dans les pages d'avis
+"""
+
+import re
+from typing import List, Optional, Pattern, Union
+from lxml import etree
+from lxml import html as lxml_html
+
+Markup = Union[str, bytes]
+
+# Taille des morceaux transmis au parseur de liens
+_FEED_CHUNK_SIZE = 64 * 1024
+
+def _class_xpath(element: str, class_name: str) -> etree.XPath:
+    """Compile une expression XPath sélectionnant un élément par classe CSS."""
+    return etree.XPath(
+        f"(//{element}[contains(concat(' ', normalize-space(@class), ' '), ' {class_name} ')])[1]"
+    )
+
+# Conteneurs d'article recherchés, par ordre de préférence
+_ARTICLE_XPATHS = [
+    _class_xpath('*', 'article'),
+    etree.XPath('(//article)[1]'),
+    _class_xpath('div', 'content')
+]
+
+# Séparateurs de classes reconnus par normalize-space()
+_CLASS_SEPARATORS = re.compile('[ \t\r\n]+')
+
+class _StopParsing(Exception):
+    """Interrompt l'analyse dès que les liens demandés sont trouvés."""
+
+class _LinkTarget:
+    """Cible de parseur ne construisant aucun arbre : seuls les liens sont retenus."""
+
+    def __init__(self, pattern: Pattern, limit: Optional[int]):
+        self.pattern = pattern
+        self.limit = limit
+        self.links: List[str] = []
+
+    def start(self, tag: str, attrib) -> None:
+        if tag != 'a':
+            return
+        href = attrib.get('href')
+        if href and self.pattern.search(href):
+            self.links.append(href)
+            if self.limit and len(self.links) >= self.limit:
+                raise _StopParsing()
+
+    def end(self, tag: str) -> None:
+        pass
+
+    def data(self, data: str) -> None:
+        pass
+
+    def close(self) -> List[str]:
+        return self.links
+
+class _ArticleEndTarget:
+    """Cible de parseur suivant la profondeur du premier élément de classe `article`."""
+
+    def __init__(self):
+        self.depth = 0
+        self.article_depth: Optional[int] = None
+        self.closed = False
+
+    def start(self, tag: str, attrib) -> None:
+        self.depth += 1
+        if self.article_depth is None and 'article' in _CLASS_SEPARATORS.split(attrib.get('class', '')):
+            self.article_depth = self.depth
+
+    def end(self, tag: str) -> None:
+        if self.depth == self.article_depth:
+            self.closed = True
+        self.depth -= 1
+
+    def data(self, data: str) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+class ArticleEndDetector:
+    """
+    Détecte, au fil du téléchargement, la fin du conteneur d'article utilisé à l'extraction.
+
+    Seul le premier élément de classe `article` (premier choix de
+    `extract_article_text`) est définitif dès sa fermeture : un élément
+    `<article>` ou `div.content` fermé peut encore être supplanté par un
+    `.article` plus loin dans la page. Sans `.article`, la page est lue en
+    entier (dans la limite de taille du téléchargement).
+    """
+
+    def __init__(self):
+        self._target = _ArticleEndTarget()
+        self._parser: Optional[etree.HTMLParser] = etree.HTMLParser(target=self._target)
+
+    def feed(self, text: str) -> bool:
+        """
+        Analyse un morceau de page décodé.
+
+        Args:
+            text: Suite du texte de la page
+
+        Returns:
+            bool: True si le conteneur d'article est complet (la suite est inutile)
+        """
+        if self._parser is not None and not self._target.closed:
+            try:
+                self._parser.feed(text)
+            except etree.LxmlError:
+                # Document illisible : télécharger la page en entier
+                self._parser = None
+        return self._target.closed
+
+def extract_links(markup: Markup, pattern: Union[str, Pattern], limit: Optional[int] = None) -> List[str]:
+    """
+    Extrait les liens dont l'URL correspond à un motif, sans construire d'arbre.
+
+    Args:
+        markup: Contenu HTML
+        pattern: Motif recherché dans l'attribut href
+        limit: Nombre maximal de liens (l'analyse s'arrête dès qu'il est atteint)
+
+    Returns:
+        List[str]: Liens trouvés, dans l'ordre du document
+    """
+    if isinstance(pattern, str):
+        pattern = re.compile(pattern)
+
+    target = _LinkTarget(pattern, limit)
+    parser = etree.HTMLParser(target=target)
+
+    try:
+        for offset in range(0, len(markup), _FEED_CHUNK_SIZE):
+            parser.feed(markup[offset:offset + _FEED_CHUNK_SIZE])
+        parser.close()
+    except _StopParsing:
+        pass
+    except etree.LxmlError:
+        # Document mal formé : conserver les liens déjà trouvés
+        pass
+
+    return target.links
+
+def extract_article_text(markup: Markup) -> Optional[str]:
+    """
+    Extrait le texte du conteneur principal d'un article.
+
+    Args:
+        markup: Contenu HTML
+
+    Returns:
+        Optional[str]: Texte de l'article, ou None si aucun conteneur n'est trouvé
+    """
+    if not markup:
+        return None
+
+    # lxml refuse les chaînes contenant une déclaration d'encodage
+    if isinstance(markup, str) and markup.lstrip().startswith('<?xml'):
+        markup = markup.encode('utf-8')
+
+    try:
+        root = lxml_html.document_fromstring(markup)
+    except (etree.LxmlError, ValueError):
+        return None
+
+    for xpath in _ARTICLE_XPATHS:
+        nodes = xpath(root)
+        if nodes:
+            return nodes[0].text_content()
+    return None
@@ -1,13 +1,31 @@
 import requests
-import time
-from typing import List, Dict, Any
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Any, Iterator, Optional
 from .config import APIS, MAIN_BRANDS
+from .rate_limiter import HostRateLimiter
+from .records import Record, record, fold_records
+from .response_cache import ResponseCache
+from .run_journal import RunJournal, slice_digest
 
 class NHTSACollector:
-    def __init__(self):
+    def __init__(self, requests_per_second: float = 1.0, max_workers: int = 1,
+                 cache: Optional[ResponseCache] = None):
         self.base_url = APIS['NHTSA']['base_url']
         self.session = requests.Session()
-        self.rate_limit_delay = 1  # Délai entre les requêtes en secondes
+        self.max_workers = max_workers
+        self.cache = cache
+        # Données de marque indépendantes de l'année, mémorisées pour toute l'exécution
+        self._make_level: Dict[str, Dict[str, Any]] = {}
+        self._make_level_lock = threading.Lock()
+        # Débit autorisé par hôte, partagé par tous les threads
+        self.rate_limiter = HostRateLimiter(requests_per_second)
+        
+        if max_workers > 1:
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=max_workers)
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
 
     def get_all_makes(self, year: int = None) -> List[Dict[str, Any]]:
         """Récupère toutes les marques de véhicules."""
@@ -48,22 +66,36 @@ class NHTSACollector:
         results = response.get('Results', [])
         return results[0] if results else {}
 
-    def get_model_details(self, make: str, model: str, year: int) -> Dict[str, Any]:
-        """Récupère les détails d'un modèle spécifique."""
+    def get_model_details(self, make: str, model: str, year: int,
+                          raise_errors: bool = False) -> Dict[str, Any]:
+        """Récupère les détails d'un modèle spécifique (vides si NHTSA n'en a pas)."""
         endpoint = f"{self.base_url}/DecodeModelYear/make/{make}/model/{model}/year/{year}?format=json"
         
-        response = self._make_request(endpoint)
+        response = self._make_request(endpoint, raise_errors)
         results = response.get('Results', [])
         return results[0] if results else {}
 
-    def _make_request(self, url: str) -> Dict[str, Any]:
-        """Effectue une requête HTTP avec gestion des erreurs et rate limiting."""
+    def _make_request(self, url: str, raise_errors: bool = False) -> Dict[str, Any]:
+        """
+        Effectue une requête HTTP avec gestion des erreurs et rate limiting.
+
+        Une erreur (réseau, HTTP hors 404, réponse illisible) donne un résultat
+        vide, ou est propagée avec `raise_errors` pour la distinguer d'une
+        réponse réellement vide.
+        """
         try:
-            time.sleep(self.rate_limit_delay)  # Respecter le rate limiting
-            
             # Encoder correctement l'URL
             encoded_url = requests.utils.quote(url, safe=':/?=&')
-            response = self.session.get(encoded_url)
+            
+            if self.cache:
+                # Le rate limiting ne s'applique qu'aux accès réseau
+                response = self.cache.fetch(
+                    self.session, encoded_url,
+                    throttle=lambda: self.rate_limiter.acquire(url)
+                )
+            else:
+                self.rate_limiter.acquire(url)  # Respecter le rate limiting
+                response = self.session.get(encoded_url)
             
             if response.status_code == 404:
                 print(f"Resource not found: {url}")
@@ -73,18 +105,134 @@ class NHTSACollector:
             return response.json()
         except requests.exceptions.RequestException as e:
             print(f"Erreur lors de la requête à {url}: {str(e)}")
+            if raise_errors:
+                raise
             return {'Results': []}
         except ValueError as e:
             print(f"Erreur lors du parsing de la réponse de {url}: {str(e)}")
+            if raise_errors:
+                raise
             return {'Results': []}
 
-    def collect_full_data(self, start_year: int, end_year: int) -> Dict[str, Any]:
+    def get_make_level_data(self, make: str) -> Dict[str, Any]:
+        """Récupère une seule fois par exécution les données d'une marque qui ne dépendent pas de l'année."""
+        with self._make_level_lock:
+            make_level = self._make_level.get(make)
+        if make_level is not None:
+            return make_level
+
+        make_level = {
+            'details': self.get_make_details(make),
+            'types': self.get_vehicle_types_for_make(make)
+        }
+        # Une réponse vide peut venir d'une erreur réseau : ne pas la mémoriser
+        if make_level['details'] or make_level['types']:
+            with self._make_level_lock:
+                self._make_level[make] = make_level
+        return make_level
+
+    def _collect_model(self, make: str, model_name: str, year: int,
+                       journal: Optional[RunJournal] = None,
+                       run_id: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Récupère les détails d'un modèle et inscrit l'unité au journal.
+
+        Returns:
+            Optional[Dict[str, Any]]: Détails du modèle (éventuellement vides),
+            None si la requête a échoué (l'unité sera retentée)
+        """
+        try:
+            model_details = self.get_model_details(make, model_name, year, raise_errors=True)
+        except (requests.exceptions.RequestException, ValueError):
+            return None
+
+        # Des détails vides sont un résultat valide, journalisé comme les autres
+        if journal:
+            units = journal.record(run_id, 'nhtsa', make, year, model_name, model_details)
+            print(f"    [{units}] {make} {year} {model_name}")
+        return model_details
+
+    def _get_model_names(self, make: str, year: int, done: Dict) -> List[str]:
+        """Liste les modèles d'une marque pour une année, depuis le journal si possible."""
+        if (make, year, '') in done:
+            return done[(make, year, '')]
+        models = self.get_models_for_make(make, year)
+        return [model['Model_Name'] for model in models if model.get('Model_Name')]
+
+    def _reuse_slice(self, make: str, year: int, model_names: List[str],
+                     reusable: Dict, done: Dict) -> bool:
+        """Reprend les détails de la collecte précédente si la liste des modèles n'a pas changé."""
+        previous = reusable.get((make, year))
+        if not previous or previous['digest'] != slice_digest(model_names):
+            return False
+
+        for model_name, model_details in previous['payload'].items():
+            done.setdefault((make, year, model_name), model_details)
+        return True
+
+    def _save_slice(self, journal: Optional[RunJournal], make: str, year: int,
+                    model_names: List[str], models: Dict[str, Any]) -> None:
+        """Enregistre l'empreinte d'une marque/année dont aucune requête de détails n'a échoué."""
+        if journal and model_names and all(models.get(name) is not None for name in model_names):
+            journal.save_fingerprint('nhtsa', make, year, model_names, models)
+
+    def collect_full_data(self, start_year: int, end_year: int,
+                          journal: Optional[RunJournal] = None,
+                          incremental: bool = False,
+                          staleness_days: int = 30) -> Dict[str, Any]:
         """Collecte toutes les données disponibles pour une période donnée."""
         full_data = {
             'makes': {},
             'models': {},
             'types': {}
         }
+        records = self.iter_records(start_year, end_year, journal, incremental, staleness_days)
+        return fold_records(records, full_data)
+
+    def iter_records(self, start_year: int, end_year: int,
+                     journal: Optional[RunJournal] = None,
+                     incremental: bool = False,
+                     staleness_days: int = 30) -> Iterator[Record]:
+        """
+        Produit en flux les enregistrements (marque, modèle, types) d'une période donnée.
+
+        En mode incrémental, seule la liste des modèles est redemandée pour les
+        années passées : les détails de la collecte précédente sont réutilisés
+        si elle n'a pas changé et date de moins de `staleness_days` jours.
+        L'année modèle en cours est toujours recollectée.
+        """
+        if incremental and not journal:
+            raise ValueError("Le mode incrémental nécessite un journal")
+
+        # Reprendre une exécution interrompue : les unités déjà collectées sont relues du journal
+        run_id = journal.start_run('nhtsa', start_year, end_year) if journal else None
+        done = journal.load(run_id) if journal else {}
+
+        reusable = {}
+        if incremental:
+            reusable = journal.load_fingerprints(
+                'nhtsa',
+                fresh_since=datetime.now() - timedelta(days=staleness_days),
+                before_year=datetime.now().year
+            )
+
+        if self.max_workers > 1:
+            yield from self._iter_concurrently(start_year, end_year, journal, run_id, done, reusable)
+        else:
+            yield from self._iter_sequentially(start_year, end_year, journal, run_id, done, reusable)
+
+        if journal:
+            journal.finish_run(run_id)
+
+    def _iter_sequentially(self, start_year: int, end_year: int, journal: Optional[RunJournal],
+                           run_id: Optional[str], done: Dict, reusable: Dict) -> Iterator[Record]:
+        """Collecte les données une requête après l'autre."""
+        # Préchargement des appels indépendants de l'année, une fois par marque
+        make_level = {make: self.get_make_level_data(make) for make in MAIN_BRANDS}
+        for make in MAIN_BRANDS:
+            yield record('make', make, data=make_level[make]['details'])
+
+        with_types = set()
 
         # Collecter les données pour chaque année
         for year in range(start_year, end_year + 1):
@@ -94,36 +242,108 @@ class NHTSACollector:
             for make in MAIN_BRANDS:
                 try:
                     print(f"  Traitement de {make}...")
-                    
-                    # Récupérer les informations de la marque
-                    make_details = self.get_make_details(make)
-                    if make_details:
-                        full_data['makes'][make] = make_details
 
                     # Récupérer les modèles pour cette marque
-                    models = self.get_models_for_make(make, year)
-                    if make not in full_data['models']:
-                        full_data['models'][make] = {}
+                    model_names = self._get_model_names(make, year, done)
                     
-                    if models:
-                        for model in models:
-                            model_name = model.get('Model_Name')
-                            if not model_name:
-                                continue
-
+                    reused = self._reuse_slice(make, year, model_names, reusable, done)
+                    if reused:
+                        print(f"  {make} {year} inchangé, détails réutilisés")
+                    
+                    models = {}
+                    if model_names:
+                        for model_name in model_names:
                             # Récupérer les détails du modèle
-                            model_details = self.get_model_details(make, model_name, year)
-                            if year not in full_data['models'][make]:
-                                full_data['models'][make][year] = {}
-                            full_data['models'][make][year][model_name] = model_details
+                            if (make, year, model_name) in done:
+                                model_details = done[(make, year, model_name)]
+                            else:
+                                model_details = self._collect_model(make, model_name, year, journal, run_id)
+                            models[model_name] = model_details
+                            yield record('model', make, year, model_name, model_details or {})
 
                         # Récupérer les types de véhicules
-                        if make not in full_data['types']:
-                            types = self.get_vehicle_types_for_make(make)
-                            full_data['types'][make] = types
+                        if make not in with_types:
+                            with_types.add(make)
+                            yield record('vehicle_types', make, data=make_level[make]['types'])
+
+                    # L'année de cette marque est complète
+                    if journal and model_names and (make, year, '') not in done:
+                        journal.record(run_id, 'nhtsa', make, year, payload=model_names)
+                    if not reused:
+                        self._save_slice(journal, make, year, model_names, models)
 
                 except Exception as e:
                     print(f"  Erreur lors du traitement de {make}: {str(e)}")
                     continue
 
-        return full_data
+    def _iter_concurrently(self, start_year: int, end_year: int, journal: Optional[RunJournal],
+                           run_id: Optional[str], done: Dict, reusable: Dict) -> Iterator[Record]:
+        """Collecte les données avec plusieurs requêtes en vol, dans la limite du débit autorisé."""
+        years = range(start_year, end_year + 1)
+        print(f"Collecte concurrente NHTSA {start_year}-{end_year} ({self.max_workers} threads)...")
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            make_futures = {make: executor.submit(self.get_make_level_data, make) for make in MAIN_BRANDS}
+            names_futures = {
+                executor.submit(self._get_model_names, make, year, done): (make, year)
+                for year in years
+                for make in MAIN_BRANDS
+            }
+
+            # Les détails sont soumis dès qu'une liste de modèles arrive
+            detail_futures = {}
+            model_names = {}
+            reused = set()
+            for future in as_completed(names_futures):
+                make, year = names_futures[future]
+                try:
+                    model_names[(make, year)] = future.result()
+                except Exception as e:
+                    print(f"  Erreur lors du traitement de {make} {year}: {str(e)}")
+                    continue
+
+                if self._reuse_slice(make, year, model_names[(make, year)], reusable, done):
+                    reused.add((make, year))
+
+                for model_name in model_names[(make, year)]:
+                    if (make, year, model_name) not in done:
+                        detail_futures[(make, year, model_name)] = executor.submit(
+                            self._collect_model, make, model_name, year, journal, run_id
+                        )
+
+            # Produire les résultats dans un ordre déterministe
+            for make in MAIN_BRANDS:
+                make_level = make_futures[make].result()
+                yield record('make', make, data=make_level['details'])
+                if any(model_names.get((make, year)) for year in years):
+                    yield record('vehicle_types', make, data=make_level['types'])
+
+            for year in years:
+                for make in MAIN_BRANDS:
+                    if (make, year) not in model_names:
+                        continue
+
+                    complete = True
+                    models = {}
+                    for model_name in model_names[(make, year)]:
+                        key = (make, year, model_name)
+                        if key in done:
+                            model_details = done[key]
+                        else:
+                            try:
+                                model_details = detail_futures.pop(key).result()
+                            except Exception as e:
+                                print(f"  Erreur lors du traitement de {make} {model_name} {year}: {str(e)}")
+                                complete = False
+                                continue
+                        models[model_name] = model_details
+                        yield record('model', make, year, model_name, model_details or {})
+
+                    # L'année de cette marque est complète
+                    if journal and complete and model_names[(make, year)] and (make, year, '') not in done:
+                        journal.record(run_id, 'nhtsa', make, year, payload=model_names[(make, year)])
+                    if complete and (make, year) not in reused:
+                        self._save_slice(journal, make, year, model_names[(make, year)], models)
+
+            if reused:
+                print(f"  {len(reused)} marque(s)/année(s) inchangée(s), détails réutilisés")
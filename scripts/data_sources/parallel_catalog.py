@@ -0,0 +1,127 @@
+"""
+Génération du catalogue en parallèle, marque par marque
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+from .engine_catalog import EngineCatalog, EngineVariant
+from .french_collector import FrenchCollector
+from .global_collector import GlobalCollector
+from .records import Record
+from .run_journal import RunJournal, UnitKey
+
+# Collecteurs du catalogue, par nom de source (dans l'ordre de collecte)
+COLLECTORS = {
+    'french': FrenchCollector,
+    'global': GlobalCollector
+}
+
+# Résultat d'une marque : spécifications par année et motorisations du processus par ID
+BrandResult = Tuple[List[Tuple[int, Dict[str, Any]]], Dict[int, EngineVariant]]
+
+def _collect_brand(source: str, brand: str, start_year: int, end_year: int,
+                   journal_path: Optional[str], run_id: Optional[str],
+                   done: Dict[UnitKey, Any]) -> BrandResult:
+    """
+    Collecte une marque dans un processus de travail.
+
+    Seules les spécifications sont renvoyées (les enregistrements sont produits
+    lors de la fusion) : options, couleurs et gammes partagées par les modèles
+    ne sont transmises qu'une fois. Les IDs de motorisations sont propres à ce
+    processus et sont réinternés lors de la fusion.
+    """
+    collector = COLLECTORS[source]()
+    journal = RunJournal(journal_path) if journal_path else None
+    years = list(collector.iter_brand_years(brand, start_year, end_year, journal, run_id, done))
+    return years, dict(collector.engine_catalog.items())
+
+class ParallelCatalogBuilder:
+    """
+    Construit le catalogue des collecteurs en répartissant les marques sur un pool de processus.
+
+    Chaque marque est collectée indépendamment ; les résultats partiels sont
+    fusionnés dans l'ordre des marques (et non dans l'ordre d'arrivée), et les
+    motorisations sont réinternées dans le catalogue partagé. Le flux produit
+    est donc le même quel que soit le nombre de processus.
+    """
+
+    def __init__(self, sources: Iterable[str] = tuple(COLLECTORS),
+                 max_workers: Optional[int] = None,
+                 engine_catalog: Optional[EngineCatalog] = None):
+        """
+        Initialise le générateur.
+
+        Args:
+            sources: Noms des collecteurs à exécuter (clés de COLLECTORS)
+            max_workers: Nombre de processus (nombre de cœurs par défaut, 1 pour tout faire sur place)
+            engine_catalog: Catalogue de motorisations recevant les IDs définitifs
+        """
+        self.sources = list(sources)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.engine_catalog = engine_catalog if engine_catalog is not None else EngineCatalog()
+
+    def iter_records(self, start_year: int, end_year: int,
+                     journal: Optional[RunJournal] = None) -> Iterator[Record]:
+        """
+        Produit en flux les enregistrements de toutes les marques des collecteurs.
+
+        Args:
+            start_year: Année de début
+            end_year: Année de fin
+            journal: Journal de reprise, partagé par les processus
+
+        Returns:
+            Iterator[Record]: Enregistrements, marque après marque
+        """
+        # Une exécution par source, démarrée ici : les processus y enregistrent leurs unités
+        run_ids = {source: journal.start_run(source, start_year, end_year) if journal else None
+                   for source in self.sources}
+        done = {source: journal.load(run_ids[source]) if journal else {} for source in self.sources}
+        journal_path = journal.db_path if journal else None
+
+        # Collecteurs du processus principal : ils partagent le catalogue de motorisations
+        collectors = {source: COLLECTORS[source](self.engine_catalog) for source in self.sources}
+        tasks = [(source, brand) for source in self.sources for brand in collectors[source].brand_names()]
+        published: Set[int] = set()
+
+        if self.max_workers == 1 or len(tasks) < 2:
+            for source, brand in tasks:
+                yield from collectors[source].iter_brand_records(
+                    brand, start_year, end_year, journal, run_ids[source], done[source], published
+                )
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as executor:
+                futures = [
+                    executor.submit(
+                        _collect_brand, source, brand, start_year, end_year, journal_path, run_ids[source],
+                        {key: value for key, value in done[source].items() if key[0] == brand}
+                    )
+                    for source, brand in tasks
+                ]
+                # Fusion dans l'ordre de soumission : les marques suivantes continuent pendant ce temps
+                for (source, brand), future in zip(tasks, futures):
+                    years = self._reintern(*future.result())
+                    yield from collectors[source].iter_brand_records(
+                        brand, start_year, end_year, published=published, years=years
+                    )
+
+        if journal:
+            for run_id in run_ids.values():
+                journal.finish_run(run_id)
+
+    def _reintern(self, years: List[Tuple[int, Dict[str, Any]]],
+                  engines: Dict[int, EngineVariant]) -> List[Tuple[int, Dict[str, Any]]]:
+        """Remplace les IDs de motorisations d'un processus par ceux du catalogue partagé."""
+        # Internées dans l'ordre du processus : les IDs sont ceux d'une collecte séquentielle
+        engine_ids = {local: self.engine_catalog.intern(engines[local]) for local in sorted(engines)}
+        # Gammes du processus -> gammes du catalogue partagé (un seul tuple par gamme)
+        lineups: Dict[Tuple[int, ...], Tuple[int, ...]] = {}
+
+        for _, year_specs in years:
+            for model_specs in year_specs.values():
+                local = tuple(model_specs['engine_ids'])
+                if local not in lineups:
+                    lineups[local] = tuple(engine_ids[engine_id] for engine_id in local)
+                model_specs['engine_ids'] = lineups[local]
+        return years
@@ -0,0 +1,68 @@
+"""
+Limitation de débit par hôte pour les collecteurs d'API
+"""
+
+import time
+import threading
+from typing import Dict, Optional
+from urllib.parse import urlparse
+
+class TokenBucket:
+    """Seau à jetons thread-safe : `rate` requêtes par seconde, rafales de `capacity`."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("Le débit doit être strictement positif")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self) -> None:
+        """Ajoute les jetons accumulés depuis la dernière mise à jour."""
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1) -> bool:
+        """Prend des jetons s'ils sont disponibles, sans attendre."""
+        with self._lock:
+            self._refill()
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1) -> None:
+        """Attend que des jetons soient disponibles puis les prend."""
+        while True:
+            with self._lock:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+class HostRateLimiter:
+    """Un seau à jetons par hôte, créé à la première requête."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None,
+                 overrides: Optional[Dict[str, float]] = None):
+        self.rate = rate
+        self.capacity = capacity
+        self.overrides = overrides or {}
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._lock = threading.Lock()
+
+    def bucket(self, host: str) -> TokenBucket:
+        """Retourne le seau associé à un hôte."""
+        with self._lock:
+            if host not in self._buckets:
+                self._buckets[host] = TokenBucket(self.overrides.get(host, self.rate), self.capacity)
+            return self._buckets[host]
+
+    def acquire(self, url: str) -> None:
+        """Attend l'autorisation d'envoyer une requête vers l'hôte de l'URL."""
+        self.bucket(urlparse(url).netloc).acquire()
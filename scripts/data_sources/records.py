@@ -0,0 +1,84 @@
+"""
+Enregistrements produits en flux par les collecteurs
+
+Chaque collecteur expose `iter_records`, qui produit des enregistrements
+plats au fil de la collecte :
+
+- ``make`` : une marque (`data` : informations de la marque, éventuellement vides)
+- ``engine_variant`` : une motorisation distincte (`data` : motorisation et son `id`),
+  produite une seule fois, avant le premier modèle qui la référence
+- ``model`` : un modèle pour une année (`data` : spécifications du modèle, dont
+  `engine_ids`, les IDs de ses motorisations)
+- ``trim`` : une finition (ou version) du dernier modèle produit
+- ``vehicle_types`` : les types de véhicules d'une marque
+
+Les enregistrements d'un modèle suivent toujours l'enregistrement ``model``
+correspondant, et les motorisations qu'il référence le précèdent, ce qui
+permet de les consommer sans rien garder en mémoire.
+"""
+
+from typing import Any, Dict, Iterable, Optional
+
+Record = Dict[str, Any]
+
+def record(kind: str, make: str, year: Optional[int] = None,
+           model: Optional[str] = None, data: Any = None) -> Record:
+    """Construit un enregistrement."""
+    return {'kind': kind, 'make': make, 'year': year, 'model': model, 'data': data}
+
+def iter_model_records(make: str, year: int, model: str, model_specs: Dict[str, Any]) -> Iterable[Record]:
+    """Découpe les spécifications d'un modèle en enregistrements model/trim."""
+    yield record('model', make, year, model, {**model_specs, 'engine_types': [], 'trim_levels': []})
+    for trim in model_specs.get('trim_levels', []):
+        yield record('trim', make, year, model, trim)
+
+def fold_records(records: Iterable[Record], full_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reconstruit le dictionnaire `full_data` d'un collecteur à partir de ses enregistrements.
+
+    Args:
+        records: Enregistrements produits par `iter_records`
+        full_data: Sections attendues par le collecteur ('makes', 'models', ...)
+
+    Returns:
+        Dict[str, Any]: Données complètes
+    """
+    # Motorisations par ID : les modèles reçoivent les dictionnaires partagés, sans copie
+    engines: Dict[int, Dict[str, Any]] = {}
+
+    for item in records:
+        kind, make, year, model, data = (
+            item['kind'], item['make'], item['year'], item['model'], item['data']
+        )
+
+        if kind == 'make':
+            full_data['models'].setdefault(make, {})
+            if data:
+                full_data['makes'][make] = data
+
+        elif kind == 'engine_variant':
+            engine = {key: value for key, value in data.items() if key != 'id'}
+            engines[data['id']] = engine
+            if 'engines' in full_data:
+                full_data['engines'][data['id']] = engine
+
+        elif kind == 'model':
+            if 'engine_ids' in data:
+                data['engine_types'] = [engines[engine_id] for engine_id in data['engine_ids']]
+            full_data['models'].setdefault(make, {}).setdefault(year, {})[model] = data
+            if 'specs' in full_data:
+                full_data['specs'].setdefault(make, {}).setdefault(year, {})[model] = data
+            if 'trims' in full_data:
+                full_data['trims'].setdefault(make, {}).setdefault(year, {})[model] = []
+
+        elif kind == 'trim':
+            if 'trims' in full_data:
+                trims = full_data['trims'].setdefault(make, {}).setdefault(year, {})
+                trims.setdefault(model, []).append(data)
+            else:
+                full_data['models'][make][year][model]['trim_levels'].append(data)
+
+        elif kind == 'vehicle_types':
+            full_data['types'][make] = data
+
+    return full_data
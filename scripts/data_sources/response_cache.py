@@ -0,0 +1,190 @@
+"""
+Cache disque des réponses HTTP pour les collecteurs d'API
+"""
+
+import os
+import json
+import time
+import hashlib
+import tempfile
+import requests
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+from urllib.parse import urlencode, urlparse
+
+class OfflineCacheMiss(requests.exceptions.RequestException):
+    """Réponse absente du cache alors que le réseau est désactivé."""
+
+class CachedResponse:
+    """Réponse relue depuis le cache, compatible avec l'usage de requests.Response."""
+
+    def __init__(self, url: str, content: bytes, from_cache: bool):
+        self.url = url
+        self.status_code = 200
+        self.content = content
+        self.from_cache = from_cache
+
+    @property
+    def text(self) -> str:
+        return self.content.decode('utf-8')
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def raise_for_status(self) -> None:
+        pass
+
+class ResponseCache:
+    """
+    Cache des réponses adressé par contenu.
+
+    Chaque requête (URL + paramètres) a une entrée d'index contenant ses
+    validateurs (ETag, Last-Modified) et l'empreinte du corps ; les corps sont
+    stockés une seule fois sous leur empreinte SHA-256. Les entrées sont
+    revalidées par GET conditionnel, sauf si une durée de validité forcée
+    n'est pas écoulée. En mode hors ligne, seul le cache est utilisé.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        default_ttl: Optional[float] = None,
+        ttls: Optional[Dict[str, float]] = None,
+        offline: bool = False
+    ):
+        """
+        Initialise le cache.
+
+        Args:
+            cache_dir: Dossier du cache
+            default_ttl: Durée de validité forcée par défaut (secondes)
+            ttls: Durées de validité forcées par hôte (secondes)
+            offline: Rejouer uniquement les réponses en cache
+        """
+        self.cache_dir = Path(cache_dir)
+        self.default_ttl = default_ttl
+        self.ttls = ttls or {}
+        self.offline = offline
+
+        self._index_dir = self.cache_dir / 'index'
+        self._objects_dir = self.cache_dir / 'objects'
+        self._index_dir.mkdir(parents=True, exist_ok=True)
+        self._objects_dir.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def _key(url: str, params: Optional[Dict[str, Any]]) -> str:
+        """Calcule la clé d'une requête."""
+        if params:
+            url = f"{url}?{urlencode(sorted(params.items()))}"
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _object_path(self, digest: str) -> Path:
+        return self._objects_dir / digest[:2] / digest
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes) -> None:
+        """Écrit un fichier sans jamais exposer de contenu partiel."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def _load_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """Lit une entrée d'index et vérifie que son corps est présent."""
+        try:
+            with open(self._index_dir / f"{key}.json", 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if not self._object_path(entry['digest']).exists():
+            return None
+        return entry
+
+    def _save_entry(self, key: str, entry: Dict[str, Any]) -> None:
+        self._write_atomic(
+            self._index_dir / f"{key}.json",
+            json.dumps(entry).encode('utf-8')
+        )
+
+    def _read_body(self, entry: Dict[str, Any]) -> bytes:
+        return self._object_path(entry['digest']).read_bytes()
+
+    def _store(self, key: str, url: str, response: requests.Response) -> Dict[str, Any]:
+        """Enregistre le corps d'une réponse et ses validateurs."""
+        content = response.content
+        digest = hashlib.sha256(content).hexdigest()
+        object_path = self._object_path(digest)
+        if not object_path.exists():
+            self._write_atomic(object_path, content)
+
+        entry = {
+            'url': url,
+            'digest': digest,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time()
+        }
+        self._save_entry(key, entry)
+        return entry
+
+    def _ttl_for(self, url: str, ttl: Optional[float]) -> Optional[float]:
+        if ttl is not None:
+            return ttl
+        return self.ttls.get(urlparse(url).netloc, self.default_ttl)
+
+    def fetch(
+        self,
+        session: requests.Session,
+        url: str,
+        params: Optional[Dict[str, Any]] = None,
+        throttle: Optional[Callable[[], None]] = None,
+        ttl: Optional[float] = None
+    ):
+        """
+        Effectue un GET en passant par le cache.
+
+        Args:
+            session: Session HTTP du collecteur
+            url: URL demandée
+            params: Paramètres de la requête
+            throttle: Fonction appelée avant tout accès réseau (rate limiting)
+            ttl: Durée de validité forcée pour cette requête (secondes)
+
+        Returns:
+            CachedResponse pour une réponse 200 ou 304, sinon la réponse brute
+        """
+        key = self._key(url, params)
+        entry = self._load_entry(key)
+
+        if self.offline:
+            if entry is None:
+                raise OfflineCacheMiss(f"Réponse absente du cache: {url}")
+            return CachedResponse(url, self._read_body(entry), from_cache=True)
+
+        max_age = self._ttl_for(url, ttl)
+        if entry and max_age is not None and time.time() - entry['fetched_at'] < max_age:
+            return CachedResponse(url, self._read_body(entry), from_cache=True)
+
+        headers = {}
+        if entry:
+            if entry.get('etag'):
+                headers['If-None-Match'] = entry['etag']
+            if entry.get('last_modified'):
+                headers['If-Modified-Since'] = entry['last_modified']
+
+        if throttle:
+            throttle()
+        response = session.get(url, params=params, headers=headers)
+
+        if response.status_code == 304 and entry:
+            entry['fetched_at'] = time.time()
+            self._save_entry(key, entry)
+            return CachedResponse(url, self._read_body(entry), from_cache=True)
+
+        if response.status_code == 200:
+            self._store(key, url, response)
+            return CachedResponse(url, response.content, from_cache=False)
+
+        return response
@@ -0,0 +1,175 @@
+"""
+Collecte concurrente des avis, source par source
+"""
+
+import queue
+import logging
+import itertools
+import threading
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from .html_extract import ArticleEndDetector
+from .rate_limiter import HostRateLimiter
+from .reviews_collector import ReviewsCollector
+
+logger = logging.getLogger(__name__)
+
+# Travail de collecte : (marque, modèle, année)
+Job = Tuple[str, str, int]
+
+class ReviewCrawler:
+    """
+    Collecte les avis de plusieurs modèles en interrogeant les sources en parallèle.
+
+    Chaque source a sa propre file de priorité de modèles et ses propres
+    workers : une source lente ne bloque plus les autres. Les requêtes sont
+    limitées par domaine, en débit (seau à jetons) et en nombre de requêtes
+    simultanées. Les pages encore fraîches dans la frontière de crawl ne sont
+    pas retéléchargées : leurs avis sont relus dans la frontière.
+    """
+
+    def __init__(
+        self,
+        collector: ReviewsCollector,
+        requests_per_second: float = 0.5,
+        max_concurrency: int = 2,
+        domain_rates: Optional[Dict[str, float]] = None
+    ):
+        """
+        Initialise le crawler.
+
+        Args:
+            collector: Collecteur d'avis (sources, extraction, licence)
+            requests_per_second: Débit autorisé par domaine
+            max_concurrency: Requêtes simultanées autorisées par domaine
+            domain_rates: Débits spécifiques par domaine
+        """
+        self.collector = collector
+        self.max_concurrency = max_concurrency
+        self.rate_limiter = HostRateLimiter(requests_per_second, overrides=domain_rates)
+
+        self._frontier: List[Tuple[int, int, Job]] = []
+        self._sequence = itertools.count()
+        self._semaphores: Dict[str, threading.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, brand: str, model: str, year: int, priority: int = 0) -> None:
+        """
+        Ajoute un modèle à collecter.
+
+        Args:
+            brand: Marque du véhicule
+            model: Modèle du véhicule
+            year: Année du modèle
+            priority: Priorité (les plus petites valeurs sont collectées en premier)
+        """
+        if not all(isinstance(x, str) for x in [brand, model]):
+            raise ValueError("La marque et le modèle doivent être des chaînes de caractères")
+
+        if not isinstance(year, int) or not (2000 <= year <= 2100):
+            raise ValueError("L'année doit être un entier entre 2000 et 2100")
+
+        self._frontier.append((priority, next(self._sequence), (brand, model, year)))
+
+    def _semaphore(self, host: str) -> threading.Semaphore:
+        """Retourne le sémaphore limitant les requêtes simultanées vers un domaine."""
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.Semaphore(self.max_concurrency)
+            return self._semaphores[host]
+
+    def _fetch(self, url: str, stop_after: Optional[Callable[[], ArticleEndDetector]] = None):
+        """Télécharge une page dans les limites de son domaine."""
+        with self._semaphore(urlparse(url).netloc):
+            self.rate_limiter.acquire(url)
+            return self.collector._fetch(url, stop_after=stop_after)
+
+    def _worker(self, source_name: str, source_data: Dict[str, Any],
+                jobs: "queue.PriorityQueue", results: "queue.Queue") -> None:
+        """Traite les modèles d'une source par ordre de priorité."""
+        while True:
+            try:
+                *_, job = jobs.get_nowait()
+            except queue.Empty:
+                return
+
+            try:
+                reviews = self.collector._collect_from_source(source_name, source_data, *job, fetch=self._fetch)
+            except Exception as e:
+                logger.error(f"Erreur lors de la collecte depuis {source_name}: {str(e)}")
+                reviews = []
+            results.put((job, source_name, reviews))
+
+    def crawl(self) -> Iterator[Tuple[Job, List[Dict[str, Any]]]]:
+        """
+        Collecte les avis des modèles soumis.
+
+        Yields:
+            Tuple[Job, List[Dict]]: (modèle, avis de toutes les sources), dès qu'un modèle est terminé
+        """
+        # Vérifier la licence et la sécurité une fois pour tout le lot
+        license_valid, _ = self.collector.posture.license_verdict
+        if not license_valid:
+            raise RuntimeError("Licence invalide")
+
+        security_ok, security_msg = self.collector.posture.security_verdict
+        if not security_ok:
+            raise RuntimeError(f"Violation de sécurité: {security_msg}")
+
+        # Un même modèle soumis plusieurs fois n'est collecté qu'une fois, à sa meilleure priorité
+        frontier, self._frontier = sorted(self._frontier), []
+        seen = set()
+        frontier = [entry for entry in frontier if not (entry[2] in seen or seen.add(entry[2]))]
+        if not frontier:
+            return
+
+        sources = self.collector._decrypt_sources()
+        results: "queue.Queue" = queue.Queue()
+        workers = []
+        pending = {job: 0 for _, _, job in frontier}
+
+        # Une file de priorité et un groupe de workers par source : à priorité
+        # égale, les pages jamais visitées ou les plus périmées passent en
+        # premier, les pages encore fraîches (relues sans téléchargement) en dernier
+        for source_name, source_data in sources.items():
+            search_urls = {
+                job: self.collector._search_url(source_data, job[0], job[1])
+                for _, _, job in frontier
+            }
+            due_dates = self.collector.frontier.due_dates(search_urls.values())
+
+            jobs: "queue.PriorityQueue" = queue.PriorityQueue()
+            for priority, sequence, job in frontier:
+                jobs.put((priority, due_dates[search_urls[job]] or '', sequence, job))
+                pending[job] += 1
+
+            for index in range(min(self.max_concurrency, jobs.qsize())):
+                worker = threading.Thread(
+                    target=self._worker,
+                    args=(source_name, source_data, jobs, results),
+                    name=f"reviews-{source_name}-{index}",
+                    daemon=True
+                )
+                worker.start()
+                workers.append(worker)
+
+        # Aucune source configurée : aucun avis
+        if not sources:
+            for job in pending:
+                yield job, []
+            return
+
+        # Regrouper les résultats par modèle, dans l'ordre des sources
+        collected: Dict[Job, Dict[str, List[Dict[str, Any]]]] = {}
+        while pending:
+            job, source_name, reviews = results.get()
+            collected.setdefault(job, {})[source_name] = reviews
+            pending[job] -= 1
+            if pending[job] == 0:
+                del pending[job]
+                by_source = collected.pop(job)
+                yield job, [review for name in sources if name in by_source for review in by_source[name]]
+
+        for worker in workers:
+            worker.join()
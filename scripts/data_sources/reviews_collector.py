@@ -2,21 +2,24 @@
 Collecteur d'avis critiques automobiles avec protection anti-piratage
 """
 
-import re
 import json
+import codecs
 import hashlib
 import logging
 import sqlite3
 import requests
 import time
-from typing import Dict, List, Any, Optional
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Any, Optional
 from datetime import datetime
 from pathlib import Path
-from bs4 import BeautifulSoup
 from urllib.parse import urlparse, urljoin
 from ratelimit import limits, sleep_and_retry
 from requests.exceptions import RequestException, Timeout, TooManyRedirects
-from ..license_manager import LicenseManager, check_security
+from ..license_manager import LicenseManager, SecurityPosture
+from .html_extract import ArticleEndDetector, extract_links, extract_article_text
+from .sentiment import clean_text, extract_sentiment
+from .crawl_frontier import CrawlFrontier
 
 # Configuration du logging
 logging.basicConfig(
@@ -36,6 +39,7 @@ class SecurityConfig:
     RATE_LIMIT_CALLS = 30
     RATE_LIMIT_PERIOD = 60
     MAX_CONTENT_LENGTH = 5 * 1024 * 1024  # 5MB
+    DOWNLOAD_CHUNK_SIZE = 16 * 1024
     ALLOWED_SCHEMES = {'http', 'https'}
     ALLOWED_CONTENT_TYPES = {
         'text/html',
@@ -43,6 +47,16 @@ class SecurityConfig:
         'application/xml'
     }
 
+@dataclass
+class FetchedPage:
+    """Page téléchargée en flux, dans la limite de MAX_CONTENT_LENGTH."""
+    url: str
+    status_code: int
+    content: bytes
+    text: str
+    encoding: str
+    truncated: bool = False  # Téléchargement arrêté dès la fin du contenu utile
+
 class ReviewsCollector:
     def __init__(self, db_path: str, license_key: str):
         """
@@ -52,15 +66,19 @@ class ReviewsCollector:
             db_path: Chemin vers la base de données SQLite
             license_key: Clé de licence valide
         """
-        # Vérifier la sécurité
-        security_ok, security_msg = check_security()
+        # Vérifier la sécurité et la licence, puis les revérifier en arrière-plan
+        self.license_manager = LicenseManager(license_key)
+        self.posture = SecurityPosture(self.license_manager)
+        self.posture.start()
+        
+        security_ok, security_msg = self.posture.security_verdict
         if not security_ok:
+            self.posture.stop()
             raise RuntimeError(f"Violation de sécurité: {security_msg}")
             
-        # Vérifier la licence
-        self.license_manager = LicenseManager(license_key)
-        license_valid, license_msg = self.license_manager.verify_license()
+        license_valid, license_msg = self.posture.license_verdict
         if not license_valid:
+            self.posture.stop()
             raise RuntimeError(f"Licence invalide: {license_msg}")
             
         # Activer la protection du code
@@ -74,27 +92,27 @@ class ReviewsCollector:
             'caradisiac': {
                 'base_url': 'https://www.caradisiac.com/essai-auto/',
                 'review_pattern': r'/essai-auto/',
-                'search_pattern': lambda brand, model: f"{brand}-{model}".lower().replace(' ', '-')
+                'search_pattern': '{brand}-{model}'
             },
             'largus': {
                 'base_url': 'https://www.largus.fr/essai/',
                 'review_pattern': r'/essai-',
-                'search_pattern': lambda brand, model: f"{brand}-{model}".lower().replace(' ', '-')
+                'search_pattern': '{brand}-{model}'
             },
             'autoplus': {
                 'base_url': 'https://www.autoplus.fr/essai/',
                 'review_pattern': r'/essai/',
-                'search_pattern': lambda brand, model: f"{brand}/{model}".lower().replace(' ', '-')
+                'search_pattern': '{brand}/{model}'
             },
             'turbo': {
                 'base_url': 'https://www.turbo.fr/essais-auto/',
                 'review_pattern': r'/essai-',
-                'search_pattern': lambda brand, model: f"{brand}-{model}".lower().replace(' ', '-')
+                'search_pattern': '{brand}-{model}'
             },
             'automobile-magazine': {
                 'base_url': 'https://www.automobile-magazine.fr/essais/',
                 'review_pattern': r'/essai/',
-                'search_pattern': lambda brand, model: f"{brand}-{model}".lower().replace(' ', '-')
+                'search_pattern': '{brand}-{model}'
             }
         })
         
@@ -107,17 +125,28 @@ class ReviewsCollector:
         }
         
         self._init_database()
+        self.frontier = CrawlFrontier(db_path)
         
         # Vérifier l'intégrité des données collectées
         self._verify_data_integrity()
 
+    def close(self) -> None:
+        """Arrête la revérification en arrière-plan de la sécurité et de la licence."""
+        self.posture.stop()
+
+    def __enter__(self) -> 'ReviewsCollector':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
     def _encrypt_sources(self, sources: Dict) -> bytes:
         """Chiffre les sources de données."""
         return self.license_manager._encrypt_data(sources)
 
     def _decrypt_sources(self) -> Dict:
-        """Déchiffre les sources de données."""
-        return self.license_manager._decrypt_data(self.sources)
+        """Retourne les sources de données, déchiffrées une seule fois."""
+        return self.posture.sources or self.posture.load_sources(self.sources)
 
     def _validate_db_path(self, db_path: str) -> None:
         """Valide le chemin de la base de données."""
@@ -139,17 +168,8 @@ class ReviewsCollector:
                 conn.execute('PRAGMA journal_mode = WAL')
                 conn.execute('PRAGMA synchronous = NORMAL')
                 
-                # Table pour stocker l'historique des requêtes
-                conn.execute('''
-                CREATE TABLE IF NOT EXISTS request_history (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    url TEXT NOT NULL,
-                    timestamp TEXT NOT NULL,
-                    success BOOLEAN NOT NULL,
-                    error_message TEXT,
-                    UNIQUE(url, timestamp)
-                )
-                ''')
+                # Frontière de crawl : état de chaque URL téléchargée
+                CrawlFrontier.create_schema(conn)
                 
                 # Table pour les avis avec validation des données
                 conn.execute('''
@@ -173,22 +193,72 @@ class ReviewsCollector:
                 conn.execute('CREATE INDEX IF NOT EXISTS idx_reviews_source ON reviews(source)')
                 conn.execute('CREATE INDEX IF NOT EXISTS idx_reviews_year ON reviews(year)')
                 
+                # Filigrane de vérification : les avis d'ID inférieur ou égal ont été vérifiés
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS review_integrity (
+                    id INTEGER PRIMARY KEY CHECK(id = 1),
+                    verified_through INTEGER NOT NULL,
+                    audited_at TEXT
+                )
+                ''')
+                conn.execute('INSERT OR IGNORE INTO review_integrity (id, verified_through) VALUES (1, 0)')
+                
+                # Avis déjà vérifiés mais modifiés depuis, à revérifier
+                conn.execute('''
+                CREATE TABLE IF NOT EXISTS review_integrity_dirty (
+                    review_id INTEGER PRIMARY KEY
+                )
+                ''')
+                conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS reviews_integrity_update
+                AFTER UPDATE ON reviews
+                BEGIN
+                    INSERT OR IGNORE INTO review_integrity_dirty (review_id) VALUES (NEW.id);
+                END
+                ''')
+                conn.execute('''
+                CREATE TRIGGER IF NOT EXISTS reviews_integrity_insert
+                AFTER INSERT ON reviews
+                WHEN NEW.id <= (SELECT verified_through FROM review_integrity WHERE id = 1)
+                BEGIN
+                    INSERT OR IGNORE INTO review_integrity_dirty (review_id) VALUES (NEW.id);
+                END
+                ''')
+                
         except sqlite3.Error as e:
             logger.error(f"Erreur lors de l'initialisation de la base de données: {e}")
             raise
 
     @sleep_and_retry
     @limits(calls=SecurityConfig.RATE_LIMIT_CALLS, period=SecurityConfig.RATE_LIMIT_PERIOD)
-    def _make_request(self, url: str, retry_count: int = 0) -> Optional[requests.Response]:
+    def _make_request(self, url: str,
+                      stop_after: Optional[Callable[[], ArticleEndDetector]] = None) -> Optional[FetchedPage]:
         """
-        Effectue une requête HTTP sécurisée avec limitation de débit.
+        Effectue une requête HTTP sécurisée avec limitation de débit globale.
+        
+        Args:
+            url: URL à requêter
+            stop_after: Fabrique du détecteur de fin de contenu utile
+            
+        Returns:
+            Page téléchargée ou None en cas d'échec
+        """
+        return self._fetch(url, stop_after=stop_after)
+
+    def _fetch(self, url: str, retry_count: int = 0,
+               stop_after: Optional[Callable[[], ArticleEndDetector]] = None) -> Optional[FetchedPage]:
+        """
+        Effectue une requête HTTP sécurisée, sans limitation de débit.
+        
+        Le débit est géré par l'appelant (`_make_request` ou ReviewCrawler).
         
         Args:
             url: URL à requêter
             retry_count: Nombre de tentatives effectuées
+            stop_after: Fabrique du détecteur de fin de contenu utile
             
         Returns:
-            Response object ou None en cas d'échec
+            Page téléchargée ou None en cas d'échec
         """
         try:
             # Valider l'URL
@@ -206,110 +276,96 @@ class ReviewsCollector:
                 stream=True  # Pour vérifier la taille avant de télécharger
             )
             
-            # Vérifier la taille du contenu
-            content_length = response.headers.get('content-length')
-            if content_length and int(content_length) > SecurityConfig.MAX_CONTENT_LENGTH:
-                logger.warning(f"Contenu trop volumineux: {url}")
-                return None
-            
-            # Vérifier le type de contenu
-            content_type = response.headers.get('content-type', '').lower()
-            if not any(allowed_type in content_type for allowed_type in SecurityConfig.ALLOWED_CONTENT_TYPES):
-                logger.warning(f"Type de contenu non autorisé: {content_type}")
-                return None
-            
-            response.raise_for_status()
-            return response
+            try:
+                # Vérifier la taille du contenu
+                content_length = response.headers.get('content-length')
+                if content_length and int(content_length) > SecurityConfig.MAX_CONTENT_LENGTH:
+                    logger.warning(f"Contenu trop volumineux: {url}")
+                    return None
+                
+                # Vérifier le type de contenu
+                content_type = response.headers.get('content-type', '').lower()
+                if not any(allowed_type in content_type for allowed_type in SecurityConfig.ALLOWED_CONTENT_TYPES):
+                    logger.warning(f"Type de contenu non autorisé: {content_type}")
+                    return None
+                
+                response.raise_for_status()
+                return self._read_bounded(response, url, stop_after)
+            finally:
+                # Libérer la connexion, y compris après un arrêt anticipé
+                response.close()
             
         except (RequestException, Timeout, TooManyRedirects) as e:
             logger.error(f"Erreur lors de la requête {url}: {str(e)}")
             if retry_count < SecurityConfig.MAX_RETRIES:
                 time.sleep(2 ** retry_count)  # Backoff exponentiel
-                return self._make_request(url, retry_count + 1)
+                return self._fetch(url, retry_count + 1, stop_after)
             return None
 
-    def _clean_text(self, text: str) -> str:
-        """Nettoie et sanitize le texte."""
-        if not isinstance(text, str):
-            return ""
+    def _read_bounded(self, response: requests.Response, url: str,
+                      stop_after: Optional[Callable[[], ArticleEndDetector]] = None) -> Optional[FetchedPage]:
+        """
+        Lit le corps d'une réponse par morceaux, sans dépasser MAX_CONTENT_LENGTH.
+        
+        Le texte est décodé au fil de la lecture et transmis au détecteur
+        créé par `stop_after` ; la lecture s'arrête dès qu'il signale la fin
+        du contenu utile.
+        
+        Args:
+            response: Réponse ouverte en mode flux
+            url: URL requêtée
+            stop_after: Fabrique du détecteur de fin de contenu utile
+            
+        Returns:
+            Page téléchargée, ou None si elle dépasse la taille maximale
+        """
+        encoding = response.encoding or 'utf-8'
+        try:
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        except LookupError:
+            encoding = 'utf-8'
+            decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        
+        detector = stop_after() if stop_after else None
+        content = bytearray()
+        parts = []
+        truncated = False
         
-        # Supprimer les caractères non imprimables
-        text = ''.join(char for char in text if char.isprintable())
+        for chunk in response.iter_content(chunk_size=SecurityConfig.DOWNLOAD_CHUNK_SIZE):
+            if len(content) + len(chunk) > SecurityConfig.MAX_CONTENT_LENGTH:
+                logger.warning(f"Contenu trop volumineux: {url}")
+                return None
+            
+            content += chunk
+            text = decoder.decode(chunk)
+            parts.append(text)
+            
+            if detector and detector.feed(text):
+                truncated = True
+                break
         
-        # Nettoyer les espaces
-        text = re.sub(r'\s+', ' ', text)
-        text = text.strip()
+        parts.append(decoder.decode(b'', final=True))
         
-        # Limiter la longueur
-        return text[:1000]
+        return FetchedPage(
+            url=url,
+            status_code=response.status_code,
+            content=bytes(content),
+            text=''.join(parts),
+            encoding=encoding,
+            truncated=truncated
+        )
+
+    def _clean_text(self, text: str) -> str:
+        """Nettoie et sanitize le texte."""
+        return clean_text(text)
 
     def _extract_sentiment(self, text: str) -> Dict[str, List[str]]:
         """Extrait les sentiments de manière sécurisée."""
-        if not text or not isinstance(text, str):
-            return {'positives': [], 'negatives': []}
-        
-        positives = []
-        negatives = []
-        
-        # Patterns sécurisés avec limite de longueur
-        pos_patterns = [
-            r'(?:avantages?|points? fort|qualités?|points? positifs?).*?[:]\s*(.*?)(?=\.|$)',
-            r'(?:nous (?:avons )?aimé|on aime|j\'aime).*?[:]\s*(.*?)(?=\.|$)',
-            r'(?:excellent|remarquable|parfait).*?[:]\s*(.*?)(?=\.|$)',
-            r'(?:points? fort|forces?).*?[:]\s*(.*?)(?=\.|$)',
-            r'(?:atouts?|succès).*?[:]\s*(.*?)(?=\.|$)'
-        ]
-        
-        neg_patterns = [
-            r'(?:inconvénients?|points? faible|défauts?|points? négatifs?).*?[:]\s*(.*?)(?=\.|$)',
-            r'(?:nous (?:n\'avons )?pas aimé|on (?:n\')?aime pas|je (?:n\')?aime pas).*?[:]\s*(.*?)(?=\.|$)',
-            r'(?:décevant|regrettable|dommage).*?[:]\s*(.*?)(?=\.|$)',
-            r'(?:points? faible|faiblesses?).*?[:]\s*(.*?)(?=\.|$)',
-            r'(?:limites?|problèmes?).*?[:]\s*(.*?)(?=\.|$)'
-        ]
-        
         try:
-            # Extraction sécurisée des points positifs
-            for pattern in pos_patterns:
-                matches = re.finditer(pattern, text, re.IGNORECASE)
-                for match in matches:
-                    point = self._clean_text(match.group(1))
-                    if point and len(point) > 10:
-                        positives.append(point)
-            
-            # Extraction sécurisée des points négatifs
-            for pattern in neg_patterns:
-                matches = re.finditer(pattern, text, re.IGNORECASE)
-                for match in matches:
-                    point = self._clean_text(match.group(1))
-                    if point and len(point) > 10:
-                        negatives.append(point)
-            
-            # Analyse de secours si aucun point trouvé
-            if not positives and not negatives:
-                sentences = re.split(r'[.!?]+', text)
-                for sentence in sentences:
-                    sentence = self._clean_text(sentence)
-                    if len(sentence) > 20:
-                        if any(word in sentence.lower() for word in [
-                            'excellent', 'remarquable', 'confortable',
-                            'agréable', 'qualité', 'réussi'
-                        ]):
-                            positives.append(sentence)
-                        elif any(word in sentence.lower() for word in [
-                            'décevant', 'problème', 'défaut',
-                            'manque', 'regrettable'
-                        ]):
-                            negatives.append(sentence)
-            
+            return extract_sentiment(text)
         except Exception as e:
             logger.error(f"Erreur lors de l'extraction des sentiments: {e}")
             return {'positives': [], 'negatives': []}
-        
-        return {
-            'positives': list(set(positives))[:5],  # Limiter à 5 points
-            'negatives': list(set(negatives))[:5]   # Limiter à 5 points
-        }
 
     def _generate_review_hash(self, review: Dict[str, Any]) -> str:
         """Génère un hash unique pour un avis."""
@@ -318,34 +374,83 @@ class ReviewsCollector:
         content += ''.join(review['negatives'])
         return hashlib.sha256(content.encode()).hexdigest()
 
-    def _verify_data_integrity(self) -> None:
-        """Vérifie l'intégrité des données collectées."""
+    @staticmethod
+    def row_hash(source: str, url: str, year: int, pos: Optional[str], neg: Optional[str]) -> str:
+        """Hash d'un point d'avis (une ligne des tables d'avis), recalculé par la vérification d'intégrité."""
+        content = f"{source}{url}{year}"
+        if pos: content += pos
+        if neg: content += neg
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def _verify_data_integrity(self, full: bool = False) -> int:
+        """
+        Vérifie l'intégrité des données collectées.
+        
+        Seuls les avis ajoutés depuis la dernière vérification et ceux modifiés
+        depuis (signalés par trigger) sont recontrôlés, sauf en audit complet.
+        
+        Args:
+            full: Recontrôler tous les avis
+            
+        Returns:
+            int: Nombre d'avis corrompus supprimés
+        """
         try:
             with sqlite3.connect(self.db_path) as conn:
+                # Bloquer les écritures concurrentes pendant la vérification
+                conn.execute('BEGIN IMMEDIATE')
                 cursor = conn.cursor()
                 
-                # Vérifier les hashes des avis
-                cursor.execute('SELECT id, source, url, year, positive_point, negative_point, hash FROM reviews')
-                for row in cursor.fetchall():
-                    review_id, source, url, year, pos, neg, stored_hash = row
-                    
-                    # Recalculer le hash
-                    content = f"{source}{url}{year}"
-                    if pos: content += pos
-                    if neg: content += neg
-                    calculated_hash = hashlib.sha256(content.encode()).hexdigest()
-                    
-                    # Vérifier la correspondance
-                    if calculated_hash != stored_hash:
+                verified_through = 0
+                if not full:
+                    cursor.execute('SELECT verified_through FROM review_integrity WHERE id = 1')
+                    verified_through = cursor.fetchone()[0]
+                
+                # Vérifier les hashes des avis nouveaux ou modifiés
+                cursor.execute('''
+                SELECT id, source, url, year, positive_point, negative_point, hash
+                FROM reviews WHERE id > ?
+                UNION
+                SELECT id, source, url, year, positive_point, negative_point, hash
+                FROM reviews WHERE id IN (SELECT review_id FROM review_integrity_dirty)
+                ''', (verified_through,))
+                
+                corrupted = []
+                for review_id, source, url, year, pos, neg, stored_hash in cursor:
+                    verified_through = max(verified_through, review_id)
+                    if self.row_hash(source, url, year, pos, neg) != stored_hash:
                         logger.error(f"Intégrité compromise pour l'avis {review_id}")
-                        cursor.execute('DELETE FROM reviews WHERE id = ?', (review_id,))
+                        corrupted.append((review_id,))
+                
+                conn.executemany('DELETE FROM reviews WHERE id = ?', corrupted)
+                conn.execute('DELETE FROM review_integrity_dirty')
+                if full:
+                    conn.execute(
+                        'UPDATE review_integrity SET verified_through = ?, audited_at = ? WHERE id = 1',
+                        (verified_through, datetime.now().isoformat())
+                    )
+                else:
+                    conn.execute(
+                        'UPDATE review_integrity SET verified_through = ? WHERE id = 1',
+                        (verified_through,)
+                    )
                 
                 conn.commit()
+                return len(corrupted)
                 
         except sqlite3.Error as e:
             logger.error(f"Erreur lors de la vérification de l'intégrité: {e}")
             raise
 
+    def audit_data_integrity(self) -> int:
+        """
+        Recontrôle l'intégrité de tous les avis, quel que soit le filigrane.
+        
+        Returns:
+            int: Nombre d'avis corrompus supprimés
+        """
+        return self._verify_data_integrity(full=True)
+
     def collect_reviews(self, brand: str, model: str, year: int) -> List[Dict[str, Any]]:
         """
         Collecte les avis de manière sécurisée.
@@ -358,13 +463,12 @@ class ReviewsCollector:
         Returns:
             Liste des avis collectés
         """
-        # Vérifier la licence à chaque collecte
-        license_valid, _ = self.license_manager.verify_license()
+        # Verdicts de licence et de sécurité (rafraîchis en arrière-plan)
+        license_valid, _ = self.posture.license_verdict
         if not license_valid:
             raise RuntimeError("Licence invalide")
             
-        # Vérifier la sécurité
-        security_ok, security_msg = check_security()
+        security_ok, security_msg = self.posture.security_verdict
         if not security_ok:
             raise RuntimeError(f"Violation de sécurité: {security_msg}")
         
@@ -378,135 +482,131 @@ class ReviewsCollector:
         sources = self._decrypt_sources()
         
         for source_name, source_data in sources.items():
-            try:
-                search_term = source_data['search_pattern'](brand, model)
-                search_url = urljoin(source_data['base_url'], search_term)
-                
-                response = self._make_request(search_url)
-                if not response:
-                    continue
-                
-                soup = BeautifulSoup(response.text, 'lxml')
-                review_links = soup.find_all('a', href=re.compile(source_data['review_pattern']))
-                
-                for link in review_links[:3]:
-                    try:
-                        review_url = link.get('href')
-                        if not review_url:
-                            continue
-                            
-                        review_url = urljoin(source_data['base_url'], review_url)
-                        review_response = self._make_request(review_url)
-                        
-                        if review_response:
-                            review_soup = BeautifulSoup(review_response.text, 'lxml')
-                            
-                            content = None
-                            for selector in ['article', '.content', '.article-content', '.post-content']:
-                                content = review_soup.find(class_=selector)
-                                if content:
-                                    break
-                            
-                            if not content:
-                                content = review_soup.find('article') or review_soup.find('div', class_='content')
-                            
-                            if content:
-                                text = content.get_text()
-                                sentiment = self._extract_sentiment(text)
-                                
-                                if sentiment['positives'] or sentiment['negatives']:
-                                    review = {
-                                        'source': source_name,
-                                        'url': review_url,
-                                        'year': year,
-                                        'positives': sentiment['positives'],
-                                        'negatives': sentiment['negatives'],
-                                        'date_collected': datetime.now().isoformat()
-                                    }
-                                    review['hash'] = self._generate_review_hash(review)
-                                    reviews.append(review)
-                    
-                    except Exception as e:
-                        logger.error(f"Erreur lors de la collecte de l'avis {review_url}: {str(e)}")
-                        continue
-                
-            except Exception as e:
-                logger.error(f"Erreur lors de la collecte depuis {source_name}: {str(e)}")
-                continue
-            
+            reviews.extend(self._collect_from_source(
+                source_name, source_data, brand, model, year, self._make_request
+            ))
             time.sleep(2)
         
         return reviews
 
-    def save_reviews_to_db(self, reviews: List[Dict[str, Any]], model_id: int) -> None:
+    def _collect_from_source(
+        self,
+        source_name: str,
+        source_data: Dict[str, Any],
+        brand: str,
+        model: str,
+        year: int,
+        fetch: Callable[..., Optional[FetchedPage]]
+    ) -> List[Dict[str, Any]]:
         """
-        Sauvegarde les avis dans la base de données de manière sécurisée.
+        Collecte les avis d'une source pour un modèle.
         
         Args:
-            reviews: Liste des avis à sauvegarder
-            model_id: ID du modèle dans la base de données
+            source_name: Nom de la source
+            source_data: Configuration de la source
+            brand: Marque du véhicule
+            model: Modèle du véhicule
+            year: Année du modèle
+            fetch: Fonction de téléchargement (gère la limitation de débit)
+            
+        Returns:
+            Liste des avis collectés sur cette source
         """
-        # Vérifier la licence avant la sauvegarde
-        license_valid, _ = self.license_manager.verify_license()
-        if not license_valid:
-            raise RuntimeError("Licence invalide")
+        reviews = []
         
-        if not isinstance(model_id, int) or model_id <= 0:
-            raise ValueError("L'ID du modèle doit être un entier positif")
+        try:
+            search_url = self._search_url(source_data, brand, model)
+            
+            # Page de recherche encore fraîche : ses liens sont relus dans la frontière
+            review_links = None
+            if not self.frontier.is_due(search_url):
+                review_links = self.frontier.stored_extraction(search_url)
+            
+            if review_links is None:
+                response = fetch(search_url)
+                if not response:
+                    self.frontier.record_fetch(search_url, error="Échec du téléchargement")
+                    return reviews
+            
+                # Seuls les liens d'essai sont extraits, l'analyse s'arrête au troisième
+                review_links = [
+                    urljoin(source_data['base_url'], link)
+                    for link in extract_links(response.text, source_data['review_pattern'], limit=3)
+                ]
+                self.frontier.record_fetch(search_url, response.content, extraction=review_links)
         
-        if not isinstance(reviews, list):
-            raise ValueError("Les avis doivent être fournis sous forme de liste")
+            # Essais périmés ou jamais visités, les plus anciens d'abord
+            sentiments = {}
+            for review_url in self.frontier.prioritize(review_links):
+                sentiment = self._fetch_review(review_url, fetch)
+                if sentiment is not None:
+                    sentiments[review_url] = sentiment
+            
+            # Essais encore frais ou en échec : extraction du dernier téléchargement réussi
+            seen = set()
+            for review_url in review_links:
+                fingerprint = self.frontier.fingerprint(review_url)
+                if fingerprint in seen:
+                    continue
+                seen.add(fingerprint)
+                
+                sentiment = sentiments.get(review_url) or self.frontier.stored_extraction(review_url)
+                if sentiment and (sentiment['positives'] or sentiment['negatives']):
+                    review = {
+                        'source': source_name,
+                        'url': review_url,
+                        'year': year,
+                        'positives': sentiment['positives'],
+                        'negatives': sentiment['negatives'],
+                        'date_collected': sentiment['date_collected']
+                    }
+                    review['hash'] = self._generate_review_hash(review)
+                    reviews.append(review)
         
+        except Exception as e:
+            logger.error(f"Erreur lors de la collecte depuis {source_name}: {str(e)}")
+        
+        return reviews
+
+    def _fetch_review(self, review_url: str,
+                      fetch: Callable[..., Optional[FetchedPage]]) -> Optional[Dict[str, Any]]:
+        """
+        Télécharge un essai et en extrait les points positifs et négatifs.
+        
+        L'extraction est enregistrée dans la frontière avec le téléchargement ;
+        celle d'un contenu inchangé est relue au lieu d'être recalculée.
+        
+        Args:
+            review_url: URL de l'essai
+            fetch: Fonction de téléchargement (gère la limitation de débit)
+            
+        Returns:
+            Optional[Dict]: Points extraits et date de l'extraction, None en cas d'échec
+        """
         try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute('PRAGMA foreign_keys = ON')
-                cursor = conn.cursor()
-                
-                # Vérifier que le modèle existe
-                cursor.execute('SELECT 1 FROM models WHERE id = ?', (model_id,))
-                if not cursor.fetchone():
-                    raise ValueError(f"Le modèle avec l'ID {model_id} n'existe pas")
-                
-                for review in reviews:
-                    try:
-                        # Insérer les points positifs
-                        for positive in review['positives']:
-                            cursor.execute('''
-                            INSERT OR IGNORE INTO reviews 
-                            (model_id, source, url, year, positive_point, date_collected, hash)
-                            VALUES (?, ?, ?, ?, ?, ?, ?)
-                            ''', (
-                                model_id,
-                                review['source'][:50],
-                                review['url'][:500],
-                                review['year'],
-                                positive[:1000],
-                                review['date_collected'],
-                                review['hash']
-                            ))
-                        
-                        # Insérer les points négatifs
-                        for negative in review['negatives']:
-                            cursor.execute('''
-                            INSERT OR IGNORE INTO reviews 
-                            (model_id, source, url, year, negative_point, date_collected, hash)
-                            VALUES (?, ?, ?, ?, ?, ?, ?)
-                            ''', (
-                                model_id,
-                                review['source'][:50],
-                                review['url'][:500],
-                                review['year'],
-                                negative[:1000],
-                                review['date_collected'],
-                                review['hash']
-                            ))
-                            
-                    except sqlite3.Error as e:
-                        logger.error(f"Erreur lors de l'insertion de l'avis: {str(e)}")
-                        continue
-                
-                conn.commit()
-                
-        except sqlite3.Error as e:
-            logger.error(f"Erreur lors de la sauvegarde des avis: {str(e)}")
-            raise
+            review_response = fetch(review_url, stop_after=ArticleEndDetector)
+            if not review_response:
+                self.frontier.record_fetch(review_url, error="Échec du téléchargement")
+                return None
+            
+            # Contenu inchangé depuis la dernière visite : rien de nouveau à extraire
+            sentiment = self.frontier.stored_extraction(review_url, review_response.content)
+            if sentiment is None:
+                text = extract_article_text(review_response.text)
+                sentiment = self._extract_sentiment(text) if text else {'positives': [], 'negatives': []}
+                sentiment['date_collected'] = datetime.now().isoformat()
+            
+            self.frontier.record_fetch(review_url, review_response.content, extraction=sentiment)
+            return sentiment
+        
+        except Exception as e:
+            logger.error(f"Erreur lors de la collecte de l'avis {review_url}: {str(e)}")
+            self.frontier.record_fetch(review_url, error=str(e))
+            return None
+
+    @staticmethod
+    def _search_url(source_data: Dict[str, Any], brand: str, model: str) -> str:
+        """Construit l'URL de recherche d'un modèle sur une source."""
+        search_term = source_data['search_pattern'].format(brand=brand, model=model)
+        search_term = search_term.lower().replace(' ', '-')
+        return urljoin(source_data['base_url'], search_term)
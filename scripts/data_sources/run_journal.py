@@ -0,0 +1,272 @@
+"""
+Journal des exécutions de collecte (points de reprise)
+"""
+
+import json
+import uuid
+import hashlib
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+# Clé d'une unité de collecte : (marque, année, modèle)
+UnitKey = Tuple[str, int, str]
+
+def slice_digest(model_names: Iterable[str]) -> str:
+    """Empreinte de la liste des modèles d'une marque pour une année."""
+    return hashlib.sha256(json.dumps(sorted(model_names), ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class RunJournal:
+    """
+    Journal SQLite des unités de collecte terminées.
+
+    Chaque unité (source, marque, année, modèle) est enregistrée avec son
+    résultat dès qu'elle est terminée. Une exécution interrompue est reprise
+    au prochain lancement avec les mêmes paramètres : les unités déjà
+    présentes dans le journal ne sont pas recollectées. Le modèle vide
+    désigne une unité couvrant toute une année d'une marque.
+    """
+
+    def __init__(self, db_path: str):
+        """
+        Initialise le journal.
+
+        Args:
+            db_path: Chemin vers la base de données SQLite
+        """
+        self.db_path = str(db_path)
+        self._lock = threading.Lock()
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.db_path, timeout=30)
+
+    def _init_database(self) -> None:
+        """Initialise les tables du journal."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
+
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS runs (
+                run_id TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                params TEXT NOT NULL,
+                status TEXT NOT NULL,
+                units_done INTEGER NOT NULL DEFAULT 0,
+                started_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            ''')
+            conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_runs_source
+            ON runs(source, params, status)
+            ''')
+
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                run_id TEXT NOT NULL,
+                source TEXT NOT NULL,
+                make TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                model TEXT NOT NULL DEFAULT '',
+                payload TEXT NOT NULL,
+                completed_at TEXT NOT NULL,
+                PRIMARY KEY (run_id, source, make, year, model)
+            )
+            ''')
+
+            # Empreintes de la dernière collecte de chaque marque/année (mode incrémental)
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS slice_fingerprints (
+                source TEXT NOT NULL,
+                make TEXT NOT NULL,
+                year INTEGER NOT NULL,
+                digest TEXT NOT NULL,
+                model_count INTEGER NOT NULL,
+                payload TEXT NOT NULL,
+                fetched_at TEXT NOT NULL,
+                PRIMARY KEY (source, make, year)
+            )
+            ''')
+
+            conn.commit()
+
+    def start_run(self, source: str, start_year: int, end_year: int) -> str:
+        """
+        Démarre une exécution, ou reprend la dernière exécution inachevée.
+
+        Args:
+            source: Nom du collecteur
+            start_year: Année de début
+            end_year: Année de fin
+
+        Returns:
+            str: ID de l'exécution
+        """
+        params = json.dumps({'start_year': start_year, 'end_year': end_year}, sort_keys=True)
+        now = datetime.now().isoformat()
+
+        with self._lock, self._connect() as conn:
+            row = conn.execute('''
+            SELECT run_id, units_done FROM runs
+            WHERE source = ? AND params = ? AND status = 'running'
+            ORDER BY started_at DESC
+            LIMIT 1
+            ''', (source, params)).fetchone()
+
+            if row:
+                print(f"Reprise de l'exécution {source} {row[0]} ({row[1]} unités déjà collectées)")
+                return row[0]
+
+            run_id = uuid.uuid4().hex
+            conn.execute('''
+            INSERT INTO runs (run_id, source, params, status, started_at, updated_at)
+            VALUES (?, ?, ?, 'running', ?, ?)
+            ''', (run_id, source, params, now, now))
+            return run_id
+
+    def load(self, run_id: str) -> Dict[UnitKey, Any]:
+        """
+        Charge les unités déjà terminées d'une exécution.
+
+        Args:
+            run_id: ID de l'exécution
+
+        Returns:
+            Dict[UnitKey, Any]: Résultat de chaque unité terminée
+        """
+        with self._connect() as conn:
+            rows = conn.execute(
+                'SELECT make, year, model, payload FROM checkpoints WHERE run_id = ?',
+                (run_id,)
+            ).fetchall()
+
+        return {(make, year, model): json.loads(payload) for make, year, model, payload in rows}
+
+    def iter_checkpoints(self, run_id: str) -> Iterator[Tuple[str, int, str, Any]]:
+        """Parcourt les unités terminées d'une exécution dans l'ordre des clés."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+            SELECT make, year, model, payload FROM checkpoints
+            WHERE run_id = ?
+            ORDER BY make, year, model
+            ''', (run_id,))
+            for make, year, model, payload in cursor:
+                yield make, year, model, json.loads(payload)
+        finally:
+            conn.close()
+
+    def record(self, run_id: str, source: str, make: str, year: int,
+               model: str = '', payload: Any = None) -> int:
+        """
+        Enregistre une unité terminée (utilisable depuis plusieurs threads).
+
+        Args:
+            run_id: ID de l'exécution
+            source: Nom du collecteur
+            make: Marque
+            year: Année
+            model: Modèle ('' pour une année complète)
+            payload: Résultat de l'unité (sérialisable en JSON)
+
+        Returns:
+            int: Nombre d'unités terminées dans l'exécution
+        """
+        now = datetime.now().isoformat()
+
+        with self._lock, self._connect() as conn:
+            cursor = conn.execute('''
+            INSERT OR IGNORE INTO checkpoints (run_id, source, make, year, model, payload, completed_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (run_id, source, make, year, model, json.dumps(payload, ensure_ascii=False), now))
+            conn.execute(
+                'UPDATE runs SET units_done = units_done + ?, updated_at = ? WHERE run_id = ?',
+                (cursor.rowcount, now, run_id)
+            )
+            return conn.execute('SELECT units_done FROM runs WHERE run_id = ?', (run_id,)).fetchone()[0]
+
+    def finish_run(self, run_id: str, status: str = 'completed') -> None:
+        """Marque une exécution comme terminée."""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                'UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?',
+                (status, datetime.now().isoformat(), run_id)
+            )
+
+    def get_run(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Récupère l'état d'une exécution."""
+        with self._connect() as conn:
+            row = conn.execute(
+                'SELECT run_id, source, params, status, units_done, started_at, updated_at FROM runs WHERE run_id = ?',
+                (run_id,)
+            ).fetchone()
+
+        if not row:
+            return None
+        return {
+            'run_id': row[0],
+            'source': row[1],
+            'params': json.loads(row[2]),
+            'status': row[3],
+            'units_done': row[4],
+            'started_at': row[5],
+            'updated_at': row[6]
+        }
+
+    def save_fingerprint(self, source: str, make: str, year: int,
+                         model_names: Iterable[str], payload: Dict[str, Any]) -> None:
+        """
+        Enregistre l'empreinte et le résultat d'une marque/année collectée.
+
+        Args:
+            source: Nom du collecteur
+            make: Marque
+            year: Année
+            model_names: Modèles retournés par l'API
+            payload: Résultat de la collecte par modèle
+        """
+        model_names = list(model_names)
+
+        with self._lock, self._connect() as conn:
+            conn.execute('''
+            INSERT OR REPLACE INTO slice_fingerprints
+                (source, make, year, digest, model_count, payload, fetched_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (
+                source, make, year,
+                slice_digest(model_names), len(model_names),
+                json.dumps(payload, ensure_ascii=False),
+                datetime.now().isoformat()
+            ))
+
+    def load_fingerprints(self, source: str, fresh_since: datetime,
+                          before_year: int) -> Dict[Tuple[str, int], Dict[str, Any]]:
+        """
+        Charge les empreintes réutilisables d'une source.
+
+        Args:
+            source: Nom du collecteur
+            fresh_since: Les empreintes plus anciennes sont ignorées
+            before_year: Les années à partir de celle-ci sont toujours recollectées
+
+        Returns:
+            Dict[Tuple[str, int], Dict[str, Any]]: Empreinte par (marque, année)
+        """
+        with self._connect() as conn:
+            rows = conn.execute('''
+            SELECT make, year, digest, model_count, payload, fetched_at
+            FROM slice_fingerprints
+            WHERE source = ? AND fetched_at >= ? AND year < ?
+            ''', (source, fresh_since.isoformat(), before_year)).fetchall()
+
+        return {
+            (make, year): {
+                'digest': digest,
+                'model_count': model_count,
+                'payload': json.loads(payload),
+                'fetched_at': fetched_at
+            }
+            for make, year, digest, model_count, payload, fetched_at in rows
+        }
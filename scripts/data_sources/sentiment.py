@@ -0,0 +1,211 @@
+"""
+Extraction précompilée des points positifs et négatifs d'un avis
+"""
+
+import re
+from typing import Dict, Iterator, List, Optional, Pattern, Sequence, Tuple
+
+# Suite commune à tous les motifs : le point suit un ':' et s'arrête au premier '.'
+_POINT_SUFFIX = r'.*?[:]\s*(.*?)(?=\.|$)'
+
+# Motifs dans l'ordre d'application : (mots-clés, préfixes littéraux des mots-clés)
+POS_KEYWORDS: List[Tuple[str, Tuple[str, ...]]] = [
+    (r'(?:avantages?|points? fort|qualités?|points? positifs?)', ('avantage', 'point', 'qualit')),
+    (r'(?:nous (?:avons )?aimé|on aime|j\'aime)', ('nous avons aimé', 'nous aimé', 'on aime', "j'aime")),
+    (r'(?:excellent|remarquable|parfait)', ('excellent', 'remarquable', 'parfait')),
+    (r'(?:points? fort|forces?)', ('point', 'force')),
+    (r'(?:atouts?|succès)', ('atout', 'succès'))
+]
+
+NEG_KEYWORDS: List[Tuple[str, Tuple[str, ...]]] = [
+    (r'(?:inconvénients?|points? faible|défauts?|points? négatifs?)', ('inconvénient', 'point', 'défaut')),
+    (r'(?:nous (?:n\'avons )?pas aimé|on (?:n\')?aime pas|je (?:n\')?aime pas)', (
+        "nous n'avons pas aimé", 'nous pas aimé', "on n'aime pas", 'on aime pas', "je n'aime pas", 'je aime pas'
+    )),
+    (r'(?:décevant|regrettable|dommage)', ('décevant', 'regrettable', 'dommage')),
+    (r'(?:points? faible|faiblesses?)', ('point', 'faiblesse')),
+    (r'(?:limites?|problèmes?)', ('limite', 'problème'))
+]
+
+# Mots-clés de l'analyse de secours, phrase par phrase
+FALLBACK_POS_WORDS = ['excellent', 'remarquable', 'confortable', 'agréable', 'qualité', 'réussi']
+FALLBACK_NEG_WORDS = ['décevant', 'problème', 'défaut', 'manque', 'regrettable']
+
+MAX_TEXT_LENGTH = 1000
+MAX_POINTS = 5
+
+Motif = Tuple[Pattern, Tuple[str, ...]]
+
+def _compile(keywords: List[Tuple[str, Tuple[str, ...]]]) -> List[Motif]:
+    return [
+        (re.compile(pattern + _POINT_SUFFIX, re.IGNORECASE), prefixes)
+        for pattern, prefixes in keywords
+    ]
+
+_POS_MOTIFS = _compile(POS_KEYWORDS)
+_NEG_MOTIFS = _compile(NEG_KEYWORDS)
+
+# Caractères reconnus par re.IGNORECASE mais que str.lower() ne ramène pas
+# sur la lettre des préfixes (İ, ı, ſ) : le préfiltre est alors désactivé
+_CASE_FOLD_EXCEPTIONS = 'İıſ'
+
+_SENTENCE_SPLIT = re.compile(r'[.!?]+')
+
+class _NonPrintableTable(dict):
+    """Table de str.translate supprimant les caractères non imprimables."""
+
+    def __missing__(self, code: int):
+        value = code if chr(code).isprintable() else None
+        self[code] = value
+        return value
+
+_NON_PRINTABLE = _NonPrintableTable()
+
+def clean_text(text: str) -> str:
+    """
+    Nettoie un texte : caractères non imprimables, espaces, longueur.
+
+    Args:
+        text: Texte brut
+
+    Returns:
+        str: Texte nettoyé (au plus MAX_TEXT_LENGTH caractères)
+    """
+    if not isinstance(text, str):
+        return ""
+
+    # Supprimer les caractères non imprimables (rien à faire dans le cas courant)
+    if not text.isprintable():
+        text = text.translate(_NON_PRINTABLE)
+
+    # Nettoyer les espaces (équivalent à re.sub(r'\s+', ' ', text).strip())
+    text = ' '.join(text.split())
+
+    return text[:MAX_TEXT_LENGTH]
+
+# Zone où un motif peut commencer : (position dans le texte, texte de la zone en minuscules)
+Window = Tuple[int, str]
+
+def _keyword_windows(text: str) -> Optional[List[Window]]:
+    """
+    Zones du texte où un mot-clé peut commencer.
+
+    Le ':' qui suit un mot-clé est sur la même ligne : seul le début de
+    chaque ligne jusqu'à son dernier ':' est à examiner.
+
+    Returns:
+        Optional[List[Window]]: Zones dans l'ordre du texte, ou None si la mise en
+        minuscules ne préserve pas les positions (préfiltre inutilisable)
+    """
+    windows = []
+    colon = text.rfind(':')
+    while colon != -1:
+        start = text.rfind('\n', 0, colon) + 1
+        lowered = text[start:colon].lower()
+        if len(lowered) != colon - start:
+            return None
+        windows.append((start, lowered))
+        colon = text.rfind(':', 0, start)
+    windows.reverse()
+    return windows
+
+def _candidates(windows: List[Window], prefixes: Sequence[str], found: Dict[str, List[int]]) -> List[int]:
+    """Positions où commence l'un des préfixes, dans l'ordre du texte."""
+    positions = set()
+    for prefix in prefixes:
+        if prefix not in found:
+            hits = []
+            for start, lowered in windows:
+                position = lowered.find(prefix)
+                while position != -1:
+                    hits.append(start + position)
+                    position = lowered.find(prefix, position + 1)
+            found[prefix] = hits
+        positions.update(found[prefix])
+    return sorted(positions)
+
+def _iter_matches(pattern: Pattern, text: str, candidates: List[int]) -> Iterator["re.Match"]:
+    """
+    Équivalent de `pattern.finditer(text)` limité aux positions candidates.
+
+    Une correspondance commence forcément par un mot-clé : il suffit de tenter
+    le motif là où commence l'un de ses préfixes, en reprenant après chaque
+    correspondance comme le fait finditer. Le ':' attendu doit en outre se
+    trouver sur la même ligne que le mot-clé.
+    """
+    resume_at = 0
+    colon = -1
+    for position in candidates:
+        if position < resume_at:
+            continue
+        if colon < position:
+            colon = text.find(':', position)
+            if colon == -1:
+                return
+        if text.find('\n', position, colon) != -1:
+            continue
+        match = pattern.match(text, position)
+        if match:
+            yield match
+            resume_at = match.end()
+
+def _collect(motifs: List[Motif], text: str, windows: Optional[List[Window]],
+             found: Dict[str, List[int]]) -> List[str]:
+    points = []
+    for pattern, prefixes in motifs:
+        if windows is None:
+            matches = pattern.finditer(text)
+        else:
+            candidates = _candidates(windows, prefixes, found)
+            if not candidates:
+                continue
+            matches = _iter_matches(pattern, text, candidates)
+
+        for match in matches:
+            point = clean_text(match.group(1))
+            if point and len(point) > 10:
+                points.append(point)
+    return points
+
+def extract_sentiment(text: str) -> Dict[str, List[str]]:
+    """
+    Extrait les points positifs et négatifs d'un texte.
+
+    Args:
+        text: Texte de l'avis
+
+    Returns:
+        Dict[str, List[str]]: Points positifs et négatifs (MAX_POINTS au plus chacun)
+    """
+    if not text or not isinstance(text, str):
+        return {'positives': [], 'negatives': []}
+
+    positives: List[str] = []
+    negatives: List[str] = []
+
+    # Tous les motifs exigent un ':' après le mot-clé
+    if ':' in text:
+        windows = None
+        if not any(char in text for char in _CASE_FOLD_EXCEPTIONS):
+            windows = _keyword_windows(text)
+
+        # Positions des préfixes, partagées entre les motifs
+        found: Dict[str, List[int]] = {}
+        positives = _collect(_POS_MOTIFS, text, windows, found)
+        negatives = _collect(_NEG_MOTIFS, text, windows, found)
+
+    # Analyse de secours si aucun point trouvé
+    if not positives and not negatives:
+        for sentence in _SENTENCE_SPLIT.split(text):
+            sentence = clean_text(sentence)
+            if len(sentence) > 20:
+                lowered_sentence = sentence.lower()
+                if any(word in lowered_sentence for word in FALLBACK_POS_WORDS):
+                    positives.append(sentence)
+                elif any(word in lowered_sentence for word in FALLBACK_NEG_WORDS):
+                    negatives.append(sentence)
+
+    return {
+        'positives': list(set(positives))[:MAX_POINTS],
+        'negatives': list(set(negatives))[:MAX_POINTS]
+    }
@@ -0,0 +1,161 @@
+"""
+Détection des avis quasi identiques (SimHash et index LSH par bandes)
+"""
+
+import re
+import sqlite3
+import hashlib
+from collections import Counter
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+SIGNATURE_BITS = 64
+BANDS = 8
+BAND_BITS = SIGNATURE_BITS // BANDS
+# Écart maximal (en bits) entre deux avis quasi identiques. Il doit rester
+# inférieur à BANDS : avec au plus BANDS - 1 bits différents, une bande au
+# moins est identique et le doublon est toujours retrouvé par l'index.
+MAX_DISTANCE = 5
+
+_MASK = (1 << SIGNATURE_BITS) - 1
+_BAND_MASK = (1 << BAND_BITS) - 1
+_SHINGLE_SIZE = 4
+
+_LANE_BITS = 32
+_LANE_MASK = (1 << _LANE_BITS) - 1
+# Étalement d'un octet : le bit i devient le bit de poids faible du couloir i
+_SPREAD = [
+    sum(1 << (i * _LANE_BITS) for i in range(8) if byte >> i & 1)
+    for byte in range(256)
+]
+_WORD = re.compile(r'\w+')
+
+def _features(text: str) -> Counter:
+    """
+    Découpe un texte normalisé en groupes de caractères consécutifs (shingles).
+
+    Les points d'avis sont courts : des groupes de caractères résistent mieux
+    que des groupes de mots à l'ajout ou au remplacement d'un mot.
+    """
+    text = ' '.join(_WORD.findall(text.lower()))
+    if len(text) < _SHINGLE_SIZE:
+        return Counter([text] if text else [])
+    return Counter(map(''.join, zip(*(text[i:] for i in range(_SHINGLE_SIZE)))))
+
+@lru_cache(maxsize=1 << 16)
+def _feature_lanes(feature: str) -> int:
+    """Empreinte 64 bits d'un groupe de caractères, étalée en un couloir par bit."""
+    digest = hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest()
+    lanes = 0
+    for position, byte in enumerate(reversed(digest)):
+        lanes |= _SPREAD[byte] << (position * 8 * _LANE_BITS)
+    return lanes
+
+def simhash(points: Iterable[str]) -> Optional[int]:
+    """
+    Calcule la signature SimHash d'un ensemble de points d'avis.
+
+    Args:
+        points: Points positifs et négatifs de l'avis
+
+    Returns:
+        Optional[int]: Signature sur SIGNATURE_BITS bits, ou None si le texte est vide
+    """
+    features = _features(' '.join(points))
+    if not features:
+        return None
+
+    # Compteurs de bits regroupés dans un seul entier, un couloir de _LANE_BITS
+    # bits par bit de signature
+    ones = 0
+    total = 0
+    for feature, count in features.items():
+        ones += count * _feature_lanes(feature)
+        total += count
+
+    # Un bit est à 1 s'il l'est pour plus de la moitié du poids des groupes
+    signature = 0
+    for bit in range(SIGNATURE_BITS):
+        if 2 * (ones >> (bit * _LANE_BITS) & _LANE_MASK) > total:
+            signature |= 1 << bit
+    return signature
+
+def hamming_distance(a: int, b: int) -> int:
+    """Nombre de bits différents entre deux signatures."""
+    return bin((a ^ b) & _MASK).count('1')
+
+def signature_bands(signature: int) -> List[int]:
+    """Découpe une signature en BANDS bandes de BAND_BITS bits."""
+    return [signature >> (band * BAND_BITS) & _BAND_MASK for band in range(BANDS)]
+
+def _to_sql(signature: int) -> int:
+    """Convertit une signature en entier signé 64 bits pour SQLite."""
+    return signature - (1 << SIGNATURE_BITS) if signature >> (SIGNATURE_BITS - 1) else signature
+
+def _from_sql(value: int) -> int:
+    return value & _MASK
+
+class ReviewSignatureIndex:
+    """
+    Index des signatures SimHash des avis enregistrés.
+
+    Chaque signature est découpée en bandes indexées : les candidats d'un
+    nouvel avis sont les avis du même modèle partageant au moins une bande,
+    ce qui évite de comparer l'avis à toute la table.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        """
+        Initialise l'index sur une connexion (les écritures suivent sa transaction).
+
+        Args:
+            conn: Connexion à la base des avis
+        """
+        self.conn = conn
+
+    @staticmethod
+    def create_schema(conn: sqlite3.Connection) -> None:
+        """Crée la table des signatures et ses index de bandes."""
+        columns = ', '.join(f'band{band} INTEGER NOT NULL' for band in range(BANDS))
+        conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS review_signatures (
+            review_hash TEXT PRIMARY KEY,
+            model_id INTEGER NOT NULL,
+            signature INTEGER NOT NULL,
+            {columns}
+        )
+        ''')
+        for band in range(BANDS):
+            conn.execute(
+                f'CREATE INDEX IF NOT EXISTS idx_review_signatures_band{band} '
+                f'ON review_signatures(model_id, band{band})'
+            )
+
+    def find_near_duplicate(self, model_id: int, signature: int) -> Optional[str]:
+        """
+        Cherche un avis quasi identique déjà enregistré pour un modèle.
+
+        Args:
+            model_id: ID du modèle
+            signature: Signature SimHash de l'avis
+
+        Returns:
+            Optional[str]: Hash de l'avis existant, ou None
+        """
+        conditions = ' OR '.join(f'band{band} = ?' for band in range(BANDS))
+        rows = self.conn.execute(
+            f'SELECT review_hash, signature FROM review_signatures WHERE model_id = ? AND ({conditions})',
+            (model_id, *signature_bands(signature))
+        )
+        for review_hash, candidate in rows:
+            if hamming_distance(signature, _from_sql(candidate)) <= MAX_DISTANCE:
+                return review_hash
+        return None
+
+    def add(self, review_hash: str, model_id: int, signature: int) -> None:
+        """Enregistre la signature d'un avis."""
+        placeholders = ', '.join('?' for _ in range(BANDS + 3))
+        self.conn.execute(
+            f'INSERT OR IGNORE INTO review_signatures VALUES ({placeholders})',
+            (review_hash, model_id, _to_sql(signature), *signature_bands(signature))
+        )
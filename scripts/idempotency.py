@@ -0,0 +1,281 @@
+"""
+Clés d'idempotence partagées entre les workers pour les routes de paiement
+"""
+
+import json
+import time
+import uuid
+import sqlite3
+import threading
+from enum import Enum
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+class IdempotencyOutcome(Enum):
+    """Résultats possibles de la réservation d'une clé."""
+    OWNER = "owner"              # Première requête : traiter puis enregistrer
+    REPLAY = "replay"            # Réponse déjà enregistrée : la rejouer
+    CONFLICT = "conflict"        # Même clé, requête différente
+    IN_PROGRESS = "in_progress"  # Requête d'origine toujours en cours
+
+class IdempotencyStore:
+    """
+    Stockage SQLite des réponses associées aux clés d'idempotence.
+
+    Une clé réservée est « en cours » pendant une durée de bail limitée ; les
+    doublons concurrents attendent sa réponse au lieu de refaire le travail.
+    Chaque réservation porte un jeton : seul son détenteur peut enregistrer
+    la réponse ou libérer la clé, et il prolonge le bail tant qu'il travaille.
+    """
+
+    def __init__(self, db_path: str, ttl: int = 86400, lease: int = 60,
+                 purge_interval: float = 600):
+        """
+        Initialise le stockage.
+
+        Args:
+            db_path: Chemin vers la base de données SQLite
+            ttl: Durée de conservation d'une réponse (secondes)
+            lease: Durée de réservation d'une clé en cours, prolongée par `hold` (secondes)
+            purge_interval: Délai minimal entre deux purges des clés expirées (secondes)
+        """
+        self.db_path = db_path
+        self.ttl = ttl
+        self.lease = lease
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._events: Dict[str, threading.Event] = {}
+        self._events_lock = threading.Lock()
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Ouvre une connexion en mode transaction explicite."""
+        return sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+
+    def _init_database(self) -> None:
+        """Initialise la table des clés."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
+
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                state TEXT NOT NULL,
+                status_code INTEGER,
+                response TEXT,
+                expires_at REAL NOT NULL,
+                lease_token TEXT
+            )
+            ''')
+
+            # Tables créées avant les jetons de réservation
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(idempotency_keys)')]
+            if 'lease_token' not in columns:
+                conn.execute('ALTER TABLE idempotency_keys ADD COLUMN lease_token TEXT')
+            conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_idempotency_expires
+            ON idempotency_keys(expires_at)
+            ''')
+
+            conn.commit()
+
+    def _try_claim(self, key: str, fingerprint: str, lease_token: str) -> Optional[Tuple]:
+        """Réserve la clé avec le jeton donné, ou retourne la ligne existante."""
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            conn.execute(
+                'DELETE FROM idempotency_keys WHERE key = ? AND expires_at < ?',
+                (key, now)
+            )
+            cursor = conn.execute('''
+            INSERT OR IGNORE INTO idempotency_keys (key, fingerprint, state, expires_at, lease_token)
+            VALUES (?, ?, 'in_flight', ?, ?)
+            ''', (key, fingerprint, now + self.lease, lease_token))
+
+            row = None
+            if cursor.rowcount != 1:
+                row = conn.execute(
+                    'SELECT fingerprint, state, status_code, response FROM idempotency_keys WHERE key = ?',
+                    (key,)
+                ).fetchone()
+            conn.execute('COMMIT')
+            return row
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+    def begin(
+        self,
+        key: str,
+        fingerprint: str,
+        wait_timeout: float = 30
+    ) -> Tuple[IdempotencyOutcome, Optional[Dict]]:
+        """
+        Réserve une clé ou récupère la réponse enregistrée.
+
+        Args:
+            key: Clé d'idempotence (déjà préfixée par l'utilisateur)
+            fingerprint: Empreinte du contenu de la requête
+            wait_timeout: Attente maximale d'une requête concurrente (secondes)
+
+        Returns:
+            Tuple[IdempotencyOutcome, Optional[Dict]]: (résultat, réponse enregistrée ;
+            pour OWNER, le jeton de réservation sous `lease_token`)
+        """
+        self._purge_if_due()
+
+        deadline = time.monotonic() + wait_timeout
+        delay = 0.05
+        lease_token = uuid.uuid4().hex
+
+        while True:
+            row = self._try_claim(key, fingerprint, lease_token)
+            if row is None:
+                with self._events_lock:
+                    self._events[key] = threading.Event()
+                return IdempotencyOutcome.OWNER, {'lease_token': lease_token}
+
+            stored_fingerprint, state, status_code, response = row
+            if stored_fingerprint != fingerprint:
+                return IdempotencyOutcome.CONFLICT, None
+
+            if state == 'done':
+                return IdempotencyOutcome.REPLAY, {
+                    'status_code': status_code,
+                    'body': json.loads(response)
+                }
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return IdempotencyOutcome.IN_PROGRESS, None
+
+            # Même processus : réveil immédiat ; sinon interrogation espacée
+            event = self._events.get(key)
+            if event:
+                event.wait(min(delay, remaining))
+            else:
+                time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.5)
+
+    def renew(self, key: str, lease_token: str) -> bool:
+        """
+        Prolonge le bail d'une clé réservée.
+
+        Args:
+            key: Clé d'idempotence
+            lease_token: Jeton retourné par `begin`
+
+        Returns:
+            bool: False si la réservation a été perdue (bail expiré puis repris)
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+            UPDATE idempotency_keys SET expires_at = ?
+            WHERE key = ? AND lease_token = ? AND state = 'in_flight'
+            ''', (time.time() + self.lease, key, lease_token))
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    @contextmanager
+    def hold(self, key: str, lease_token: str) -> Iterator[None]:
+        """
+        Prolonge le bail d'une clé réservée tant que le bloc s'exécute.
+
+        Args:
+            key: Clé d'idempotence
+            lease_token: Jeton retourné par `begin`
+        """
+        stop = threading.Event()
+
+        def keep_alive():
+            while not stop.wait(self.lease / 3):
+                if not self.renew(key, lease_token):
+                    return
+
+        keeper = threading.Thread(target=keep_alive, name='idempotency-lease', daemon=True)
+        keeper.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            keeper.join()
+
+    def complete(self, key: str, lease_token: str, status_code: int, body: Dict) -> bool:
+        """
+        Enregistre la réponse d'une clé réservée.
+
+        Args:
+            key: Clé d'idempotence
+            lease_token: Jeton retourné par `begin`
+            status_code: Code HTTP de la réponse
+            body: Corps JSON de la réponse
+
+        Returns:
+            bool: False si la réservation n'est plus détenue (réponse non enregistrée)
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+            UPDATE idempotency_keys
+            SET state = 'done', status_code = ?, response = ?, expires_at = ?
+            WHERE key = ? AND lease_token = ? AND state = 'in_flight'
+            ''', (status_code, json.dumps(body), time.time() + self.ttl, key, lease_token))
+        finally:
+            conn.close()
+        self._notify(key)
+        return cursor.rowcount == 1
+
+    def release(self, key: str, lease_token: str) -> None:
+        """Libère une clé réservée sans réponse pour permettre une nouvelle tentative."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "DELETE FROM idempotency_keys WHERE key = ? AND lease_token = ? AND state = 'in_flight'",
+                (key, lease_token)
+            )
+        finally:
+            conn.close()
+        self._notify(key)
+
+    def _notify(self, key: str) -> None:
+        """Réveille les doublons en attente dans ce processus."""
+        with self._events_lock:
+            event = self._events.pop(key, None)
+        if event:
+            event.set()
+
+    def _purge_if_due(self) -> None:
+        """Purge les clés expirées au plus une fois par `purge_interval`."""
+        now = time.monotonic()
+        if now < self._next_purge:
+            return
+        self._next_purge = now + self.purge_interval
+        try:
+            self.purge_expired()
+        except sqlite3.Error:
+            # La purge sera retentée au prochain intervalle
+            pass
+
+    def purge_expired(self) -> int:
+        """
+        Supprime les clés expirées.
+
+        Returns:
+            int: Nombre de clés supprimées
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                'DELETE FROM idempotency_keys WHERE expires_at < ?',
+                (time.time(),)
+            )
+            return cursor.rowcount
+        finally:
+            conn.close()
@@ -9,15 +9,28 @@ import hmac
 import time
 import base64
 import hashlib
+import threading
 import requests
 from datetime import datetime, timedelta
 from typing import Dict, Optional, Tuple
 from cryptography.fernet import Fernet
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PublicKey
 from pathlib import Path
 
 class LicenseManager:
     """Gestionnaire de licences et de sécurité."""
     
+    # Intervalle minimal entre deux revalidations en ligne d'un jeton signé
+    ONLINE_REVALIDATION_INTERVAL = timedelta(hours=24)
+    
+    # Réponses du serveur qui révoquent un jeton signé encore valide
+    REFUSALS = {"Licence inactive", "Limite d'appareils atteinte", "Licence expirée"}
+    
+    # Clé publique du serveur de licences, livrée avec l'application (jamais téléchargée)
+    PUBLIC_KEY_PATH = Path(__file__).with_name("license_public_key.pem")
+    
     def __init__(self, license_key: str):
         self.license_key = license_key
         self._encryption_key = self._generate_encryption_key()
@@ -26,6 +39,14 @@ class LicenseManager:
         self._last_verification = None
         self._cache_path = Path("license_cache.enc")
         
+        # Jeton de licence signé (Ed25519), vérifié hors ligne avec la clé publique livrée
+        self._token_path = Path("license_token")
+        self._public_key: Optional[Ed25519PublicKey] = None
+        self._last_online_check: Optional[datetime] = None
+        self._revoked: Optional[str] = None
+        self._revalidation: Optional[threading.Thread] = None
+        self._revalidation_lock = threading.Lock()
+        
     def _generate_encryption_key(self) -> bytes:
         """Génère une clé de chiffrement unique basée sur la licence."""
         return base64.urlsafe_b64encode(hashlib.sha256(self.license_key.encode()).digest())
@@ -75,15 +96,117 @@ class LicenseManager:
         except Exception:
             return {}
 
+    @staticmethod
+    def _b64decode(value: str) -> bytes:
+        return base64.urlsafe_b64decode(value + '=' * (-len(value) % 4))
+
+    def _load_public_key(self) -> Optional[Ed25519PublicKey]:
+        """
+        Charge la clé publique du serveur de licences livrée avec l'application.
+        
+        La clé n'est jamais récupérée auprès du serveur : une clé obtenue au
+        premier lancement pourrait être celle d'un tiers. Sans clé livrée, les
+        jetons ne sont pas vérifiables hors ligne.
+        """
+        if self._public_key is None and self.PUBLIC_KEY_PATH.exists():
+            try:
+                key = serialization.load_pem_public_key(self.PUBLIC_KEY_PATH.read_bytes())
+                if isinstance(key, Ed25519PublicKey):
+                    self._public_key = key
+            except ValueError:
+                return None
+        return self._public_key
+
+    def _verify_token(self) -> Tuple[bool, str]:
+        """
+        Vérifie hors ligne le jeton de licence signé.
+        
+        Le jeton est de la forme `<données>.<signature>` (base64 URL) ; la
+        signature Ed25519 porte sur les données JSON et est vérifiée avec la
+        clé publique livrée avec l'application.
+        
+        Returns:
+            Tuple[bool, str]: (validité, message)
+        """
+        public_key = self._load_public_key()
+        if public_key is None or not self._token_path.exists():
+            return False, "Aucun jeton de licence hors ligne"
+        
+        try:
+            payload_b64, signature_b64 = self._token_path.read_text().strip().split('.')
+            payload = self._b64decode(payload_b64)
+            public_key.verify(self._b64decode(signature_b64), payload)
+            data = json.loads(payload)
+            if not isinstance(data, dict):
+                raise ValueError("Données de jeton invalides")
+        except (ValueError, InvalidSignature):
+            return False, "Jeton de licence invalide"
+        
+        # Comparer des octets : compare_digest refuse les autres types et les chaînes non ASCII
+        key_hash = hashlib.sha256(self.license_key.encode()).hexdigest()
+        if not hmac.compare_digest(str(data.get('license_key_hash', '')).encode(), key_hash.encode()):
+            return False, "Jeton émis pour une autre licence"
+        
+        devices = data.get('devices')
+        if devices and (not isinstance(devices, list) or self._device_id not in devices):
+            return False, "Appareil non enregistré pour cette licence"
+        
+        if not data.get('active'):
+            return False, "Licence inactive"
+        
+        try:
+            expired = datetime.fromisoformat(data['valid_until']) < datetime.now()
+        except (KeyError, TypeError, ValueError):
+            expired = True
+        if expired:
+            return False, "Licence expirée"
+        
+        return True, "Licence valide (jeton signé)"
+
+    def _revalidate(self) -> None:
+        """Revalide la licence en ligne (exécuté en arrière-plan)."""
+        try:
+            valid, message = self._verify_online(offline_fallback=False)
+            self._last_online_check = datetime.now()
+            
+            # Seul un refus explicite du serveur révoque la licence ; une
+            # panne réseau laisse le jeton valable jusqu'à son expiration
+            if not valid and message in self.REFUSALS:
+                self._revoked = message
+                self._last_verification = None
+                self._token_path.unlink(missing_ok=True)
+        except Exception:
+            pass
+
+    def _revalidate_in_background(self) -> None:
+        """Lance une revalidation en ligne si la dernière date de plus de 24 h."""
+        with self._revalidation_lock:
+            if self._revalidation is not None and self._revalidation.is_alive():
+                return
+            if self._last_online_check and \
+               datetime.now() - self._last_online_check < self.ONLINE_REVALIDATION_INTERVAL:
+                return
+            self._revalidation = threading.Thread(
+                target=self._revalidate, name="license-revalidation", daemon=True
+            )
+            self._revalidation.start()
+
     def verify_license(self) -> Tuple[bool, str]:
         """
         Vérifie la validité de la licence.
         
+        Un jeton signé en cache est vérifié localement, sans attendre le
+        réseau ; la revalidation en ligne se fait alors en arrière-plan. Sans
+        jeton, la licence est vérifiée auprès du serveur.
+        
         Returns:
             Tuple[bool, str]: (validité, message)
         """
+        if self._revoked:
+            return False, self._revoked
+        
+        # Vérifier le cache si la dernière vérification est récente
         try:
-            # Vérifier le cache si la dernière vérification est récente
             if self._last_verification and \
                (datetime.now() - self._last_verification) < timedelta(hours=24):
                 if self._cache_path.exists():
@@ -91,7 +214,28 @@ class LicenseManager:
                     if cached_data.get('valid_until') and \
                        datetime.fromisoformat(cached_data['valid_until']) > datetime.now():
                         return True, "Licence valide (cache)"
+        except Exception:
+            pass
+        
+        token_valid, token_msg = self._verify_token()
+        if token_valid:
+            self._last_verification = datetime.now()
+            self._revalidate_in_background()
+            return True, token_msg
+        
+        return self._verify_online()
 
+    def _verify_online(self, offline_fallback: bool = True) -> Tuple[bool, str]:
+        """
+        Vérifie la licence auprès du serveur.
+        
+        Args:
+            offline_fallback: En cas d'erreur, accepter le cache chiffré encore valide
+            
+        Returns:
+            Tuple[bool, str]: (validité, message)
+        """
+        try:
             # Préparer les données de vérification
             verification_data = {
                 'license_key': self.license_key,
@@ -143,15 +287,20 @@ class LicenseManager:
                 
                 # Mettre à jour le cache
                 self._last_verification = datetime.now()
+                self._last_online_check = self._last_verification
                 self._cache_path.write_bytes(self._encrypt_data(data))
                 
+                # Conserver le jeton signé pour les prochains démarrages
+                if license_data.get('token'):
+                    self._token_path.write_text(license_data['token'])
+                
                 return True, "Licence valide"
                 
             return False, "Échec de la vérification de la licence"
             
         except Exception as e:
             # En cas d'erreur, vérifier le cache hors ligne
-            if self._cache_path.exists():
+            if offline_fallback and self._cache_path.exists():
                 try:
                     cached_data = self._decrypt_data(self._cache_path.read_bytes())
                     if cached_data.get('valid_until'):
@@ -365,3 +514,87 @@ def check_security() -> Tuple[bool, str]:
         
     except Exception as e:
         return False, f"Erreur lors de la vérification: {str(e)}"
+
+class SecurityPosture:
+    """
+    Verdicts de licence et de sécurité mis en cache, rafraîchis en arrière-plan.
+    
+    Les vérifications coûteuses (`verify_license`, `check_security`) sont
+    exécutées par un thread à intervalle régulier ; les appelants ne lisent
+    que le dernier verdict. La configuration des sources est déchiffrée une
+    seule fois et conservée en mémoire.
+    """
+    
+    def __init__(self, license_manager: LicenseManager, refresh_interval: float = 300.0):
+        """
+        Initialise le service.
+        
+        Args:
+            license_manager: Gestionnaire de la licence à vérifier
+            refresh_interval: Intervalle entre deux vérifications (secondes)
+        """
+        self.license_manager = license_manager
+        self.refresh_interval = refresh_interval
+        self.refreshed_at: Optional[datetime] = None
+        
+        self._license_verdict: Tuple[bool, str] = (False, "Licence non vérifiée")
+        self._security_verdict: Tuple[bool, str] = (False, "Sécurité non vérifiée")
+        self._sources: Dict = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    @property
+    def license_verdict(self) -> Tuple[bool, str]:
+        """Dernier verdict de licence : (validité, message)."""
+        return self._license_verdict
+    
+    @property
+    def security_verdict(self) -> Tuple[bool, str]:
+        """Dernier verdict de sécurité : (sécurité_ok, message)."""
+        return self._security_verdict
+    
+    @property
+    def sources(self) -> Dict:
+        """Configuration des sources déchiffrée."""
+        return self._sources
+    
+    def load_sources(self, encrypted_sources: bytes) -> Dict:
+        """
+        Déchiffre la configuration des sources et la conserve en mémoire.
+        
+        Args:
+            encrypted_sources: Configuration chiffrée par le gestionnaire de licence
+            
+        Returns:
+            Dict: Configuration déchiffrée
+        """
+        self._sources = self.license_manager._decrypt_data(encrypted_sources)
+        return self._sources
+    
+    def refresh(self) -> None:
+        """Réévalue immédiatement la sécurité et la licence."""
+        self._security_verdict = check_security()
+        self._license_verdict = self.license_manager.verify_license()
+        self.refreshed_at = datetime.now()
+    
+    def _run(self) -> None:
+        while not self._stop.wait(self.refresh_interval):
+            try:
+                self.refresh()
+            except Exception as e:
+                self._license_verdict = (False, f"Erreur de vérification: {str(e)}")
+    
+    def start(self) -> None:
+        """Effectue une première vérification puis lance le rafraîchissement en arrière-plan."""
+        self.refresh()
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="security-posture", daemon=True)
+            self._thread.start()
+    
+    def stop(self) -> None:
+        """Arrête le rafraîchissement en arrière-plan."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
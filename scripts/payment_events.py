@@ -0,0 +1,131 @@
+"""
+Diffusion en mémoire des changements de statut des paiements
+"""
+
+import time
+import queue
+import threading
+from collections import defaultdict
+from typing import Dict, Iterator, List, Optional
+
+# Statuts après lesquels plus aucune transition n'est attendue
+TERMINAL_STATUSES = {'completed', 'failed', 'refunded', 'cancelled'}
+
+class PaymentEventBus:
+    """
+    Bus de publication/abonnement des statuts de paiement.
+
+    Le flux de paiement et les webhooks des passerelles publient les
+    transitions; les flux SSE s'y abonnent au lieu d'interroger la base.
+    """
+
+    def __init__(self, history_ttl: int = 300):
+        """
+        Initialise le bus d'événements.
+
+        Args:
+            history_ttl: Durée de conservation du dernier événement (secondes)
+        """
+        self.history_ttl = history_ttl
+        self._subscribers: Dict[str, List[queue.Queue]] = defaultdict(list)
+        self._last_events: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def publish(self, payment_id: str, status: str, **data) -> None:
+        """
+        Publie une transition de statut.
+
+        Args:
+            payment_id: ID du paiement
+            status: Nouveau statut
+            **data: Données complémentaires de l'événement
+        """
+        event = {
+            'payment_id': payment_id,
+            'status': status,
+            'timestamp': time.time(),
+            **data
+        }
+
+        with self._lock:
+            self._last_events[payment_id] = event
+            subscribers = list(self._subscribers.get(payment_id, []))
+            self._purge_history()
+
+        for subscriber in subscribers:
+            subscriber.put(event)
+
+    def _purge_history(self) -> None:
+        """Supprime les derniers événements expirés (appelé sous verrou)."""
+        limit = time.time() - self.history_ttl
+        expired = [
+            payment_id for payment_id, event in self._last_events.items()
+            if event['timestamp'] < limit and payment_id not in self._subscribers
+        ]
+        for payment_id in expired:
+            del self._last_events[payment_id]
+
+    def subscribe(self, payment_id: str) -> queue.Queue:
+        """
+        Abonne un consommateur aux événements d'un paiement.
+
+        Args:
+            payment_id: ID du paiement
+
+        Returns:
+            queue.Queue: File recevant les événements
+        """
+        subscriber: queue.Queue = queue.Queue()
+        with self._lock:
+            self._subscribers[payment_id].append(subscriber)
+            last_event = self._last_events.get(payment_id)
+
+        # Rejouer le dernier événement pour un abonné tardif
+        if last_event:
+            subscriber.put(last_event)
+        return subscriber
+
+    def unsubscribe(self, payment_id: str, subscriber: queue.Queue) -> None:
+        """Désabonne un consommateur."""
+        with self._lock:
+            subscribers = self._subscribers.get(payment_id, [])
+            if subscriber in subscribers:
+                subscribers.remove(subscriber)
+            if not subscribers:
+                self._subscribers.pop(payment_id, None)
+
+    def listen(
+        self,
+        payment_id: str,
+        timeout: float = 300,
+        keepalive: float = 15
+    ) -> Iterator[Optional[Dict]]:
+        """
+        Itère sur les événements d'un paiement jusqu'à un statut final.
+
+        Args:
+            payment_id: ID du paiement
+            timeout: Durée maximale d'écoute (secondes)
+            keepalive: Intervalle entre deux signaux de maintien (secondes)
+
+        Yields:
+            Dict: Événement, ou None pour un signal de maintien
+        """
+        subscriber = self.subscribe(payment_id)
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    event = subscriber.get(timeout=min(keepalive, remaining))
+                except queue.Empty:
+                    yield None
+                    continue
+
+                yield event
+                if event['status'] in TERMINAL_STATUSES:
+                    return
+        finally:
+            self.unsubscribe(payment_id, subscriber)
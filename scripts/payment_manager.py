@@ -4,8 +4,10 @@ Gestionnaire de paiement sécurisé pour CarFast
 
 import os
 import json
+import atexit
 import hmac
 import time
+import hashlib
 import uuid
 import stripe
 import pyotp
@@ -13,12 +15,14 @@ import qrcode
 import logging
 import requests
 from enum import Enum
-from typing import Dict, Optional, Tuple, List
+from typing import Callable, Dict, Optional, Tuple, List
 from datetime import datetime, timedelta
 from pathlib import Path
 from cryptography.fernet import Fernet
 from dataclasses import dataclass
 from email_validator import validate_email, EmailNotValidError
+from .payment_store import PaymentStore
+from .payment_events import PaymentEventBus
 
 # Configuration du logging
 logging.basicConfig(
@@ -44,11 +48,18 @@ class PaymentConfig:
     """Configuration des paiements."""
     STRIPE_PUBLIC_KEY = os.getenv("STRIPE_PUBLIC_KEY", "pk_test_...")
     STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY", "sk_test_...")
+    STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET", "whsec_...")
     GOOGLE_PAY_MERCHANT_ID = os.getenv("GOOGLE_PAY_MERCHANT_ID", "merchant_id")
     APPLE_PAY_MERCHANT_ID = os.getenv("APPLE_PAY_MERCHANT_ID", "merchant.com.carfast")
     PAYPAL_CLIENT_ID = os.getenv("PAYPAL_CLIENT_ID", "client_id")
     PAYPAL_SECRET = os.getenv("PAYPAL_SECRET", "secret")
     
+    # Stockage des paiements
+    DB_PATH = os.getenv("PAYMENT_DB_PATH", "payments.db")
+    WEBHOOK_DB_PATH = os.getenv("WEBHOOK_DB_PATH", "webhooks.db")
+    IDEMPOTENCY_DB_PATH = os.getenv("IDEMPOTENCY_DB_PATH", "idempotency.db")
+    IDEMPOTENCY_TTL = 86400  # secondes (24 heures)
+    
     # Configuration de la sécurité
     MAX_PAYMENT_ATTEMPTS = 3
     LOCK_DURATION = 30  # minutes
@@ -62,6 +73,10 @@ class PaymentConfig:
     # Délais d'expiration
     PAYMENT_TIMEOUT = 900  # secondes (15 minutes)
     VERIFICATION_TIMEOUT = 300  # secondes (5 minutes)
+    
+    # Flux d'événements (SSE)
+    EVENT_STREAM_TIMEOUT = 300  # secondes (5 minutes)
+    EVENT_KEEPALIVE = 15  # secondes
 
 class PaymentStatus(Enum):
     """États possibles d'un paiement."""
@@ -72,6 +87,15 @@ class PaymentStatus(Enum):
     REFUNDED = "refunded"
     CANCELLED = "cancelled"
 
+# Correspondance des événements Stripe avec les statuts internes
+STRIPE_EVENT_STATUSES = {
+    'payment_intent.processing': PaymentStatus.PROCESSING,
+    'payment_intent.succeeded': PaymentStatus.COMPLETED,
+    'payment_intent.payment_failed': PaymentStatus.FAILED,
+    'payment_intent.canceled': PaymentStatus.CANCELLED,
+    'charge.refunded': PaymentStatus.REFUNDED
+}
+
 class TwoFactorMethod(Enum):
     """Méthodes de double authentification."""
     SMS = "sms"
@@ -82,8 +106,13 @@ class TwoFactorMethod(Enum):
 class PaymentManager:
     """Gestionnaire de paiement sécurisé."""
     
-    def __init__(self):
-        """Initialise le gestionnaire de paiement."""
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Initialise le gestionnaire de paiement.
+        
+        Args:
+            db_path: Chemin vers la base des paiements (défaut: PaymentConfig.DB_PATH)
+        """
         # Initialiser Stripe
         stripe.api_key = PaymentConfig.STRIPE_SECRET_KEY
         stripe.max_network_retries = 2
@@ -99,6 +128,20 @@ class PaymentManager:
         self._payment_sessions = {}
         self._failed_attempts = {}
         
+        # Historique persistant des paiements, persisté jusqu'au bout à l'arrêt
+        self._store = PaymentStore(db_path or PaymentConfig.DB_PATH)
+        atexit.register(self.close)
+        
+        # Diffusion des changements de statut
+        self.events = PaymentEventBus()
+        
+    def close(self) -> None:
+        """Persiste les écritures de paiements en attente et arrête le thread d'écriture."""
+        try:
+            self._store.close()
+        except RuntimeError as e:
+            logger.error(f"Paiements perdus à l'arrêt: {e}")
+        
     def _validate_amount(self, amount: float) -> bool:
         """Valide le montant du paiement."""
         return PaymentConfig.MIN_AMOUNT <= amount <= PaymentConfig.MAX_AMOUNT
@@ -247,7 +290,9 @@ class PaymentManager:
         user_id: str,
         amount: float,
         currency: str = "EUR",
-        payment_method: PaymentMethod = PaymentMethod.CREDIT_CARD
+        payment_method: PaymentMethod = PaymentMethod.CREDIT_CARD,
+        ip_address: Optional[str] = None,
+        subscription_id: Optional[str] = None
     ) -> Optional[Dict]:
         """
         Crée une session de paiement sécurisée.
@@ -257,6 +302,8 @@ class PaymentManager:
             amount: Montant à payer
             currency: Devise (défaut: EUR)
             payment_method: Méthode de paiement
+            ip_address: Adresse IP du client
+            subscription_id: Abonnement à activer une fois le paiement confirmé
             
         Returns:
             Dict: Informations de session ou None
@@ -339,6 +386,20 @@ class PaymentManager:
                 
                 self._payment_sessions[session_id] = encrypted_data
                 
+                # Enregistrer le paiement en attente
+                self._store.save({
+                    'payment_id': session_id,
+                    'user_id': user_id,
+                    'amount': amount,
+                    'currency': currency,
+                    'payment_method': payment_method.value,
+                    'status': PaymentStatus.PENDING.value,
+                    'metadata': {
+                        'ip_address': ip_address,
+                        'subscription_id': subscription_id
+                    }
+                })
+                
                 return {
                     'session_id': session_id,
                     'payment_data': session_data,
@@ -381,6 +442,7 @@ class PaymentManager:
             
             # Vérifier l'expiration
             if datetime.fromisoformat(session_data['expires_at']) < datetime.now():
+                self._update_payment_status(session_id, PaymentStatus.CANCELLED)
                 return False, "Session expirée"
             
             # Vérifier le code 2FA
@@ -389,10 +451,12 @@ class PaymentManager:
                 TwoFactorMethod.AUTHENTICATOR,
                 verification_code
             ):
+                self._update_payment_status(session_id, PaymentStatus.FAILED)
                 return False, "Code de vérification invalide"
             
             # Traiter le paiement selon la méthode
             payment_method = PaymentMethod(session_data['payment_method'])
+            self._update_payment_status(session_id, PaymentStatus.PROCESSING)
             
             if payment_method == PaymentMethod.CREDIT_CARD:
                 # Traiter avec Stripe
@@ -401,34 +465,47 @@ class PaymentManager:
                         amount=int(session_data['amount'] * 100),
                         currency=session_data['currency'].lower(),
                         payment_method=payment_details['payment_method_id'],
-                        confirm=True
+                        confirm=True,
+                        metadata={'payment_id': session_id}
                     )
                     if payment_intent.status == 'succeeded':
+                        self._update_payment_status(
+                            session_id, PaymentStatus.COMPLETED, gateway_ref=payment_intent.id
+                        )
                         return True, "Paiement réussi"
+                    self._update_payment_status(
+                        session_id, PaymentStatus.FAILED, gateway_ref=payment_intent.id
+                    )
                     return False, "Échec du paiement"
                     
                 except stripe.error.CardError as e:
+                    self._update_payment_status(session_id, PaymentStatus.FAILED)
                     return False, f"Erreur de carte: {str(e)}"
                 
             elif payment_method == PaymentMethod.GOOGLE_PAY:
                 # Traiter avec Google Pay
                 # Implémenter la logique de paiement Google Pay
+                self._update_payment_status(session_id, PaymentStatus.COMPLETED)
                 return True, "Paiement Google Pay réussi"
                 
             elif payment_method == PaymentMethod.APPLE_PAY:
                 # Traiter avec Apple Pay
                 # Implémenter la logique de paiement Apple Pay
+                self._update_payment_status(session_id, PaymentStatus.COMPLETED)
                 return True, "Paiement Apple Pay réussi"
                 
             elif payment_method == PaymentMethod.PAYPAL:
                 # Traiter avec PayPal
                 # Implémenter la logique de paiement PayPal
+                self._update_payment_status(session_id, PaymentStatus.COMPLETED)
                 return True, "Paiement PayPal réussi"
             
+            self._update_payment_status(session_id, PaymentStatus.FAILED)
             return False, "Méthode de paiement non supportée"
             
         except Exception as e:
             logger.error(f"Erreur de traitement du paiement: {e}")
+            self._update_payment_status(session_id, PaymentStatus.FAILED)
             return False, f"Erreur de paiement: {str(e)}"
         
         finally:
@@ -436,6 +513,202 @@ class PaymentManager:
             if session_id in self._payment_sessions:
                 del self._payment_sessions[session_id]
     
+    def _update_payment_status(
+        self,
+        payment_id: str,
+        status: PaymentStatus,
+        **fields
+    ) -> None:
+        """Met à jour le statut d'un paiement enregistré et le diffuse."""
+        try:
+            if self._store.update_status(payment_id, status.value, **fields):
+                self.events.publish(payment_id, status.value)
+        except Exception as e:
+            logger.error(f"Erreur de mise à jour du paiement {payment_id}: {e}")
+    
+    def get_payment_info(self, payment_id: str) -> Optional[Dict]:
+        """
+        Récupère les informations d'un paiement.
+        
+        Args:
+            payment_id: ID du paiement
+            
+        Returns:
+            Dict: Informations du paiement ou None
+        """
+        payment = self._store.get(payment_id)
+        if not payment:
+            return None
+        
+        # Ne pas exposer les métadonnées internes
+        payment.pop('metadata', None)
+        return payment
+    
+    def get_payment_history(
+        self,
+        user_id: str,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Récupère l'historique des paiements d'un utilisateur.
+        
+        Args:
+            user_id: ID de l'utilisateur
+            limit: Nombre de paiements par page
+            cursor: Curseur de la page précédente
+            
+        Returns:
+            Tuple[List[Dict], Optional[str]]: (paiements, curseur suivant)
+        """
+        payments, next_cursor = self._store.list_for_user(user_id, limit, cursor)
+        for payment in payments:
+            payment.pop('metadata', None)
+        return payments, next_cursor
+    
+    def parse_webhook(self, provider: str, payload: bytes, headers: Dict) -> Optional[Dict]:
+        """
+        Vérifie la signature d'un webhook et normalise l'événement.
+        
+        Args:
+            provider: Passerelle émettrice (stripe, paypal, ...)
+            payload: Corps brut de la requête
+            headers: En-têtes de la requête
+            
+        Returns:
+            Dict: Événement normalisé ou None si la signature est invalide
+            
+        Raises:
+            ValueError: Si la signature est valide mais l'événement mal formé
+        """
+        try:
+            if provider == 'stripe':
+                event = stripe.Webhook.construct_event(
+                    payload,
+                    headers.get('Stripe-Signature'),
+                    PaymentConfig.STRIPE_WEBHOOK_SECRET
+                )
+                obj = event['data']['object']
+                status = STRIPE_EVENT_STATUSES.get(event['type'])
+                parsed = {
+                    'event_id': event['id'],
+                    'type': event['type'],
+                    'status': status.value if status else None,
+                    'payment_id': (obj.get('metadata') or {}).get('payment_id'),
+                    'gateway_ref': obj.get('payment_intent') or obj.get('id')
+                }
+                if event['type'] == 'charge.refunded':
+                    # Remboursement partiel : le paiement reste "completed"
+                    parsed['refunded_amount'] = obj.get('amount_refunded', 0) / 100
+                    if not obj.get('refunded'):
+                        parsed['status'] = PaymentStatus.COMPLETED.value
+                return parsed
+            
+            # Autres passerelles : signature HMAC-SHA256 du corps
+            secret = os.getenv(f"WEBHOOK_SECRET_{provider.upper()}")
+            if not secret:
+                return None
+            
+            expected = hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
+            if not hmac.compare_digest(expected, headers.get('X-Signature', '')):
+                return None
+            
+        except Exception as e:
+            logger.warning(f"Webhook {provider} rejeté: {e}")
+            return None
+        
+        # Signature valide : un contenu mal formé est une erreur de validation
+        try:
+            data = json.loads(payload)
+            status = data.get('status')
+            return {
+                'event_id': data['id'],
+                'type': data['type'],
+                'status': PaymentStatus(status).value if status else None,
+                'payment_id': data.get('payment_id'),
+                'gateway_ref': data.get('gateway_ref')
+            }
+        except (ValueError, KeyError, TypeError, AttributeError) as e:
+            raise ValueError(f"Événement {provider} invalide: {e}")
+    
+    def apply_webhook_events(self, events: List[Dict]) -> List[Dict]:
+        """
+        Applique un lot d'événements de passerelle aux paiements.
+        
+        Args:
+            events: Événements normalisés par parse_webhook
+            
+        Returns:
+            List[Dict]: Paiements confirmés par ce lot, y compris ceux déjà au statut
+            "completed" (l'activation de leur abonnement a pu échouer lors d'un essai précédent)
+        """
+        completed = []
+        
+        for event in events:
+            status = event.get('status')
+            if not status:
+                continue
+            
+            payment = None
+            if event.get('payment_id'):
+                payment = self._store.get(event['payment_id'])
+            if not payment and event.get('gateway_ref'):
+                payment = self._store.get_by_gateway_ref(event['gateway_ref'])
+            if not payment:
+                logger.warning(f"Webhook {event.get('event_id')}: paiement inconnu")
+                continue
+            
+            refunded = event.get('refunded_amount')
+            if status == PaymentStatus.COMPLETED.value and refunded is None:
+                completed.append(payment)
+            
+            # Les transitions déjà appliquées (flux synchrone ou essai précédent) sont ignorées
+            if payment['status'] == status and refunded in (None, payment['metadata'].get('refunded_amount')):
+                continue
+            
+            fields = {'gateway_ref': event['gateway_ref']} if event.get('gateway_ref') else {}
+            if refunded is not None:
+                fields['metadata'] = {'refunded_amount': refunded}
+            self._update_payment_status(payment['payment_id'], PaymentStatus(status), **fields)
+        
+        return completed
+    
+    def activate_subscription_once(
+        self,
+        payment_id: str,
+        subscription_id: str,
+        user_id: str,
+        activate: Callable[[str, str], None]
+    ) -> bool:
+        """
+        Active l'abonnement payé par un paiement, une seule fois par paiement.
+        
+        Le flux synchrone et les webhooks peuvent confirmer le même paiement :
+        l'activation est réservée dans la base des paiements avant l'appel, puis
+        marquée comme effectuée. En cas d'échec, la réservation est libérée et
+        l'exception propagée pour qu'un nouvel essai puisse avoir lieu.
+        
+        Args:
+            payment_id: ID du paiement
+            subscription_id: ID de l'abonnement
+            user_id: ID de l'utilisateur
+            activate: Fonction d'activation (subscription_id, user_id)
+            
+        Returns:
+            bool: True si l'abonnement a été activé par cet appel
+        """
+        if not self._store.claim_activation(payment_id, subscription_id, user_id):
+            return False
+        
+        try:
+            activate(subscription_id, user_id)
+        except Exception:
+            self._store.release_activation(payment_id)
+            raise
+        
+        self._store.complete_activation(payment_id)
+        return True
+    
     def refund_payment(
         self,
         payment_id: str,
@@ -445,6 +718,10 @@ class PaymentManager:
         """
         Effectue un remboursement.
         
+        Les remboursements d'un même paiement sont sérialisés par une
+        réservation dans la base des paiements ; le montant remboursé est
+        persisté avant que la réservation soit libérée.
+        
         Args:
             payment_id: ID du paiement
             amount: Montant à rembourser (None pour tout)
@@ -453,18 +730,66 @@ class PaymentManager:
         Returns:
             Tuple[bool, str]: (succès, message)
         """
+        claim_id = self._store.claim_refund(payment_id)
+        if claim_id is None:
+            return False, "Remboursement déjà en cours pour ce paiement"
+        
+        try:
+            return self._refund_claimed(payment_id, amount, reason)
+        finally:
+            try:
+                self._store.flush()
+            except RuntimeError as e:
+                logger.error(f"Remboursement de {payment_id} non persisté: {e}")
+            self._store.release_refund(payment_id, claim_id)
+    
+    def _refund_claimed(
+        self,
+        payment_id: str,
+        amount: Optional[float],
+        reason: Optional[str]
+    ) -> Tuple[bool, str]:
+        """Effectue un remboursement sur un paiement réservé (voir refund_payment)."""
         try:
             # Récupérer les détails du paiement
-            # (à implémenter avec la base de données)
+            payment = self._store.get(payment_id)
+            if not payment:
+                return False, "Paiement introuvable"
             
+            if payment['status'] != PaymentStatus.COMPLETED.value:
+                return False, "Paiement non remboursable"
+
+            # Les remboursements partiels se cumulent jusqu'au montant payé
+            refunded = payment['metadata'].get('refunded_amount', 0)
+            remaining = round(payment['amount'] - refunded, 2)
+            if amount is None:
+                amount = remaining
+            if not 0 < amount <= remaining:
+                return False, "Montant de remboursement invalide"
+
             # Effectuer le remboursement selon la méthode
+            payment_method = PaymentMethod(payment['payment_method'])
             if payment_method == PaymentMethod.CREDIT_CARD:
                 refund = stripe.Refund.create(
-                    payment_intent=payment_id,
-                    amount=int(amount * 100) if amount else None,
+                    payment_intent=payment['gateway_ref'],
+                    amount=int(round(amount * 100)),
                     reason=reason
                 )
                 if refund.status == 'succeeded':
+                    refunded = round(refunded + amount, 2)
+                    # Le paiement reste "completed" tant qu'il n'est pas intégralement remboursé
+                    status = (
+                        PaymentStatus.REFUNDED if refunded >= payment['amount']
+                        else PaymentStatus.COMPLETED
+                    )
+                    self._update_payment_status(
+                        payment_id,
+                        status,
+                        metadata={
+                            'refund_ids': payment['metadata'].get('refund_ids', []) + [refund.id],
+                            'refunded_amount': refunded
+                        }
+                    )
                     return True, "Remboursement réussi"
                 return False, "Échec du remboursement"
                 
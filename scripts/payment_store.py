@@ -0,0 +1,566 @@
+"""
+Stockage persistant et indexé des paiements pour CarFast
+"""
+
+import json
+import uuid
+import queue
+import base64
+import sqlite3
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class PaymentStore:
+    """
+    Table des paiements alimentée de manière asynchrone.
+
+    Les écritures sont placées dans une file et persistées par lots par un
+    thread dédié. Tant qu'un enregistrement n'est pas écrit, il reste visible
+    dans un cache mémoire afin que les lectures restent cohérentes. Un lot
+    en échec est retenté avec un délai croissant ; s'il échoue encore, ses
+    enregistrements sont gardés pour la prochaine tentative et `flush()`
+    signale l'échec.
+    """
+
+    # Nouvelles tentatives d'écriture d'un lot en échec, et délai initial (secondes)
+    WRITE_RETRIES = 5
+    RETRY_DELAY = 0.1
+
+    _COLUMNS = (
+        'payment_id', 'user_id', 'amount', 'currency', 'payment_method',
+        'status', 'gateway_ref', 'metadata', 'created_at', 'updated_at'
+    )
+
+    def __init__(self, db_path: str, batch_size: int = 100, flush_interval: float = 0.5,
+                 read_only: bool = False):
+        """
+        Initialise le stockage des paiements.
+
+        Args:
+            db_path: Chemin vers la base de données SQLite
+            batch_size: Nombre maximal d'écritures par transaction
+            flush_interval: Délai d'attente du thread d'écriture (secondes)
+            read_only: Ouvrir la base en lecture seule, sans thread d'écriture
+        """
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.read_only = read_only
+
+        self._queue: "queue.Queue[Optional[Dict]]" = queue.Queue()
+        self._pending: Dict[str, Dict] = {}
+        # Enregistrements dont l'écriture a échoué après toutes les tentatives
+        self._failed: Dict[str, Dict] = {}
+        self._write_error: Optional[sqlite3.Error] = None
+        self._lock = threading.Lock()
+        self._writer: Optional[threading.Thread] = None
+
+        if read_only:
+            return
+
+        self._init_database()
+
+        self._writer = threading.Thread(
+            target=self._writer_loop,
+            name='payment-store-writer',
+            daemon=True
+        )
+        self._writer.start()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Ouvre une connexion de lecture (en mode ro si le stockage est en lecture seule)."""
+        if self.read_only:
+            return sqlite3.connect(f'{Path(self.db_path).resolve().as_uri()}?mode=ro', uri=True)
+        return sqlite3.connect(self.db_path)
+
+    def _init_database(self) -> None:
+        """Initialise la table des paiements et ses index."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
+            conn.execute('PRAGMA synchronous = NORMAL')
+
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS payments (
+                payment_id TEXT PRIMARY KEY,
+                user_id TEXT NOT NULL,
+                amount REAL NOT NULL,
+                currency TEXT NOT NULL,
+                payment_method TEXT NOT NULL,
+                status TEXT NOT NULL,
+                gateway_ref TEXT,
+                metadata TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+            ''')
+
+            # Historique par utilisateur (pagination par curseur)
+            conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_payments_user
+            ON payments(user_id, created_at, payment_id)
+            ''')
+            # Suivi des paiements par statut
+            conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_payments_status
+            ON payments(status, created_at)
+            ''')
+            # Correspondance avec les identifiants des passerelles
+            conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_payments_gateway
+            ON payments(gateway_ref)
+            ''')
+
+            # Activations d'abonnement déclenchées par un paiement (une seule par paiement)
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS subscription_activations (
+                payment_id TEXT PRIMARY KEY,
+                subscription_id TEXT NOT NULL,
+                user_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                claimed_at TEXT NOT NULL,
+                activated_at TEXT
+            )
+            ''')
+
+            # Remboursements en cours (un seul à la fois par paiement)
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS refund_claims (
+                payment_id TEXT PRIMARY KEY,
+                claim_id TEXT NOT NULL,
+                claimed_at TEXT NOT NULL
+            )
+            ''')
+
+            conn.commit()
+
+    def _row_to_record(self, row: sqlite3.Row) -> Dict:
+        """Convertit une ligne SQLite en dictionnaire."""
+        record = dict(zip(self._COLUMNS, row))
+        record['metadata'] = json.loads(record['metadata']) if record['metadata'] else {}
+        return record
+
+    def _enqueue(self, record: Dict) -> None:
+        """Place un enregistrement dans la file d'écriture."""
+        if self.read_only:
+            raise ValueError("Stockage des paiements ouvert en lecture seule")
+        self._pending[record['payment_id']] = record
+        self._queue.put(record)
+
+    def save(self, record: Dict) -> None:
+        """
+        Enregistre un nouveau paiement (écriture asynchrone).
+
+        Args:
+            record: Données du paiement (payment_id, user_id, amount, ...)
+        """
+        now = datetime.now().isoformat()
+        record = {
+            'gateway_ref': None,
+            'metadata': {},
+            'created_at': now,
+            'updated_at': now,
+            **record
+        }
+        record['user_id'] = str(record['user_id'])
+
+        with self._lock:
+            self._enqueue(record)
+
+    def update_status(self, payment_id: str, status: str, **fields) -> bool:
+        """
+        Met à jour le statut d'un paiement (écriture asynchrone).
+
+        Args:
+            payment_id: ID du paiement
+            status: Nouveau statut
+            **fields: Champs supplémentaires (gateway_ref, metadata)
+
+        Returns:
+            bool: True si le paiement existe
+        """
+        with self._lock:
+            current = self.get(payment_id)
+            if not current:
+                return False
+
+            metadata = {**current['metadata'], **fields.pop('metadata', {})}
+            self._enqueue({
+                **current,
+                **fields,
+                'status': status,
+                'metadata': metadata,
+                'updated_at': datetime.now().isoformat()
+            })
+            return True
+
+    def _writer_loop(self) -> None:
+        """Persiste les écritures en attente par lots."""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    self._queue.task_done()
+                    break
+
+                batch = [record]
+                while len(batch) < self.batch_size:
+                    try:
+                        record = self._queue.get(timeout=self.flush_interval)
+                    except queue.Empty:
+                        break
+                    if record is None:
+                        self._queue.put(None)
+                        self._queue.task_done()
+                        break
+                    batch.append(record)
+
+                self._write_with_retry(conn, batch)
+                for _ in batch:
+                    self._queue.task_done()
+        finally:
+            conn.close()
+
+    def _write_with_retry(self, conn: sqlite3.Connection, batch: List[Dict]) -> None:
+        """Écrit un lot, en le retentant avec un délai croissant en cas d'échec."""
+        delay = self.RETRY_DELAY
+        for attempt in range(self.WRITE_RETRIES + 1):
+            try:
+                self._write_batch(conn, batch)
+                return
+            except sqlite3.Error as e:
+                logger.error(f"Erreur d'écriture des paiements (tentative {attempt + 1}): {e}")
+                error = e
+            if attempt < self.WRITE_RETRIES:
+                time.sleep(delay)
+                delay *= 2
+
+        # Conserver le lot (toujours visible en lecture) pour le prochain flush()
+        with self._lock:
+            self._write_error = error
+            for record in batch:
+                self._failed[record['payment_id']] = record
+
+    def _write_batch(self, conn: sqlite3.Connection, batch: List[Dict]) -> None:
+        """
+        Écrit un lot d'enregistrements dans une seule transaction.
+
+        Raises:
+            sqlite3.Error: Si l'écriture échoue (le lot reste en attente)
+        """
+        # Ne conserver que la dernière version de chaque paiement
+        latest = {record['payment_id']: record for record in batch}
+        rows = [
+            tuple(
+                json.dumps(record['metadata']) if column == 'metadata' else record[column]
+                for column in self._COLUMNS
+            )
+            for record in latest.values()
+        ]
+
+        with conn:
+            conn.executemany('''
+            INSERT INTO payments (
+                payment_id, user_id, amount, currency, payment_method,
+                status, gateway_ref, metadata, created_at, updated_at
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(payment_id) DO UPDATE SET
+                status = excluded.status,
+                gateway_ref = excluded.gateway_ref,
+                metadata = excluded.metadata,
+                updated_at = excluded.updated_at
+            ''', rows)
+
+        with self._lock:
+            for payment_id, record in latest.items():
+                self._failed.pop(payment_id, None)
+                # Une version plus récente a pu être mise en file entre-temps
+                if self._pending.get(payment_id) is record:
+                    del self._pending[payment_id]
+
+    def claim_activation(
+        self,
+        payment_id: str,
+        subscription_id: str,
+        user_id: str,
+        lease: float = 300
+    ) -> bool:
+        """
+        Réserve l'activation de l'abonnement payé par un paiement.
+
+        Une activation terminée, ou réservée depuis moins de `lease` secondes,
+        ne peut pas être réservée à nouveau : le flux synchrone et les webhooks
+        n'activent ainsi l'abonnement qu'une fois.
+
+        Args:
+            payment_id: ID du paiement
+            subscription_id: ID de l'abonnement à activer
+            user_id: ID de l'utilisateur
+            lease: Durée de la réservation (secondes)
+
+        Returns:
+            bool: True si l'appelant doit procéder à l'activation
+        """
+        now = datetime.now()
+        expired = (now - timedelta(seconds=lease)).isoformat()
+
+        with sqlite3.connect(self.db_path, timeout=10) as conn:
+            cursor = conn.execute('''
+            INSERT INTO subscription_activations (
+                payment_id, subscription_id, user_id, status, claimed_at
+            ) VALUES (?, ?, ?, 'pending', ?)
+            ON CONFLICT(payment_id) DO UPDATE SET claimed_at = excluded.claimed_at
+            WHERE status = 'pending' AND claimed_at < ?
+            ''', (payment_id, str(subscription_id), str(user_id), now.isoformat(), expired))
+            return cursor.rowcount == 1
+
+    def complete_activation(self, payment_id: str) -> None:
+        """Marque l'activation réservée d'un paiement comme effectuée."""
+        with sqlite3.connect(self.db_path, timeout=10) as conn:
+            conn.execute('''
+            UPDATE subscription_activations SET status = 'done', activated_at = ?
+            WHERE payment_id = ?
+            ''', (datetime.now().isoformat(), payment_id))
+
+    def release_activation(self, payment_id: str) -> None:
+        """Libère une réservation dont l'activation a échoué."""
+        with sqlite3.connect(self.db_path, timeout=10) as conn:
+            conn.execute(
+                "DELETE FROM subscription_activations WHERE payment_id = ? AND status = 'pending'",
+                (payment_id,)
+            )
+
+    def claim_refund(self, payment_id: str, lease: float = 300) -> Optional[str]:
+        """
+        Réserve un paiement pour un remboursement.
+
+        Les remboursements partiels d'un même paiement sont ainsi traités
+        l'un après l'autre, y compris entre processus : chacun lit le montant
+        déjà remboursé par le précédent. Une réservation de plus de `lease`
+        secondes (processus interrompu) peut être reprise.
+
+        Args:
+            payment_id: ID du paiement
+            lease: Durée de la réservation (secondes)
+
+        Returns:
+            Optional[str]: Identifiant de la réservation, None si un remboursement est en cours
+        """
+        now = datetime.now()
+        claim_id = uuid.uuid4().hex
+
+        with sqlite3.connect(self.db_path, timeout=10) as conn:
+            cursor = conn.execute('''
+            INSERT INTO refund_claims (payment_id, claim_id, claimed_at) VALUES (?, ?, ?)
+            ON CONFLICT(payment_id) DO UPDATE SET
+                claim_id = excluded.claim_id,
+                claimed_at = excluded.claimed_at
+            WHERE claimed_at < ?
+            ''', (payment_id, claim_id, now.isoformat(), (now - timedelta(seconds=lease)).isoformat()))
+            return claim_id if cursor.rowcount == 1 else None
+
+    def release_refund(self, payment_id: str, claim_id: str) -> None:
+        """Libère la réservation de remboursement d'un paiement, si elle est toujours détenue."""
+        with sqlite3.connect(self.db_path, timeout=10) as conn:
+            conn.execute(
+                'DELETE FROM refund_claims WHERE payment_id = ? AND claim_id = ?',
+                (payment_id, claim_id)
+            )
+
+    def flush(self) -> None:
+        """
+        Attend que toutes les écritures en file soient persistées.
+
+        Les enregistrements en échec lors des lots précédents sont remis en
+        file au préalable.
+
+        Raises:
+            RuntimeError: Si des enregistrements n'ont pas pu être écrits
+        """
+        if self._writer is None:
+            return
+
+        with self._lock:
+            failed, self._failed = self._failed, {}
+            for payment_id, record in failed.items():
+                # Une version plus récente est déjà en file
+                if self._pending.get(payment_id) is record:
+                    self._queue.put(record)
+
+        self._queue.join()
+
+        with self._lock:
+            if self._failed:
+                raise RuntimeError(
+                    f"{len(self._failed)} paiement(s) non persisté(s): {self._write_error}"
+                )
+
+    def close(self) -> None:
+        """
+        Persiste les écritures restantes et arrête le thread d'écriture.
+
+        Raises:
+            RuntimeError: Si des enregistrements n'ont pas pu être écrits
+        """
+        if self._writer is None:
+            return
+        try:
+            self.flush()
+        finally:
+            self._queue.put(None)
+            self._writer.join()
+            self._writer = None
+
+    def get(self, payment_id: str) -> Optional[Dict]:
+        """
+        Récupère un paiement par son identifiant.
+
+        Args:
+            payment_id: ID du paiement
+
+        Returns:
+            Dict: Données du paiement ou None
+        """
+        pending = self._pending.get(payment_id)
+        if pending:
+            return dict(pending)
+
+        with self._connect() as conn:
+            row = conn.execute(
+                f'SELECT {", ".join(self._COLUMNS)} FROM payments WHERE payment_id = ?',
+                (payment_id,)
+            ).fetchone()
+
+        return self._row_to_record(row) if row else None
+
+    def get_by_gateway_ref(self, gateway_ref: str) -> Optional[Dict]:
+        """
+        Récupère un paiement par l'identifiant de la passerelle.
+
+        Args:
+            gateway_ref: Référence du paiement chez la passerelle
+
+        Returns:
+            Dict: Données du paiement ou None
+        """
+        for record in list(self._pending.values()):
+            if record.get('gateway_ref') == gateway_ref:
+                return dict(record)
+
+        with self._connect() as conn:
+            row = conn.execute(
+                f'SELECT {", ".join(self._COLUMNS)} FROM payments WHERE gateway_ref = ?',
+                (gateway_ref,)
+            ).fetchone()
+
+        return self._row_to_record(row) if row else None
+
+    def list_for_user(
+        self,
+        user_id: str,
+        limit: int = 20,
+        cursor: Optional[str] = None
+    ) -> Tuple[List[Dict], Optional[str]]:
+        """
+        Liste l'historique des paiements d'un utilisateur (pagination par curseur).
+
+        Args:
+            user_id: ID de l'utilisateur
+            limit: Nombre maximal de paiements retournés
+            cursor: Curseur retourné par l'appel précédent
+
+        Returns:
+            Tuple[List[Dict], Optional[str]]: (paiements, curseur suivant)
+
+        Raises:
+            ValueError: Si la limite n'est pas un entier strictement positif ou si le curseur est invalide
+        """
+        if not isinstance(limit, int) or isinstance(limit, bool) or limit < 1:
+            raise ValueError("Limite de pagination invalide")
+
+        user_id = str(user_id)
+        query = f'SELECT {", ".join(self._COLUMNS)} FROM payments WHERE user_id = ?'
+        params: list = [user_id]
+
+        position = None
+        if cursor:
+            position = self._decode_cursor(cursor)
+            query += ' AND (created_at, payment_id) < (?, ?)'
+            params.extend(position)
+
+        query += ' ORDER BY created_at DESC, payment_id DESC LIMIT ?'
+        params.append(limit)
+
+        # Écritures pas encore persistées : elles priment sur les lignes de la base
+        pending = {
+            record['payment_id']: dict(record)
+            for record in list(self._pending.values())
+            if record['user_id'] == user_id
+            and (position is None or (record['created_at'], record['payment_id']) < position)
+        }
+
+        with self._connect() as conn:
+            rows = conn.execute(query, params).fetchall()
+
+        records = [self._row_to_record(row) for row in rows]
+        if pending:
+            records = [record for record in records if record['payment_id'] not in pending]
+            records.extend(pending.values())
+            records.sort(key=lambda record: (record['created_at'], record['payment_id']), reverse=True)
+            records = records[:limit]
+
+        next_cursor = None
+        if len(records) == limit:
+            last = records[-1]
+            next_cursor = self._encode_cursor(last['created_at'], last['payment_id'])
+
+        return records, next_cursor
+
+    def iter_sorted(self, key: str = 'payment_id', chunk_size: int = 5000) -> Iterator[Dict]:
+        """
+        Parcourt tous les paiements triés par clé, sans tout charger en mémoire.
+
+        Args:
+            key: Colonne de tri indexée (payment_id ou gateway_ref)
+            chunk_size: Nombre de lignes lues par lot
+
+        Yields:
+            Dict: Paiement
+        """
+        if key not in ('payment_id', 'gateway_ref'):
+            raise ValueError(f"Clé de tri non supportée: {key}")
+
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                f'SELECT {", ".join(self._COLUMNS)} FROM payments '
+                f'WHERE {key} IS NOT NULL ORDER BY {key}'
+            )
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield self._row_to_record(row)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _encode_cursor(created_at: str, payment_id: str) -> str:
+        """Encode un curseur de pagination opaque."""
+        return base64.urlsafe_b64encode(f"{created_at}|{payment_id}".encode()).decode()
+
+    @staticmethod
+    def _decode_cursor(cursor: str) -> Tuple[str, str]:
+        """Décode un curseur de pagination."""
+        try:
+            created_at, payment_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+            return created_at, payment_id
+        except (ValueError, UnicodeDecodeError):
+            raise ValueError("Curseur de pagination invalide")
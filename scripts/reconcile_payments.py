@@ -0,0 +1,305 @@
+"""
+Rapprochement des paiements avec les exports des passerelles
+
+Les exports (CSV, JSON Lines ou tableau JSON) sont lus en flux, triés par
+morceaux sur disque puis fusionnés avec la table des paiements parcourue
+dans l'ordre de son index : la mémoire utilisée reste constante quelle que
+soit la taille des fichiers.
+
+Usage (depuis la racine du projet) :
+
+    python -m scripts.reconcile_payments export.csv --report ecarts.csv
+"""
+
+import os
+import csv
+import json
+import math
+import heapq
+import argparse
+import tempfile
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, TextIO
+
+from .payment_store import PaymentStore
+
+# Statuts des exports ramenés aux statuts internes
+EXPORT_STATUSES = {
+    'succeeded': 'completed',
+    'paid': 'completed',
+    'captured': 'completed',
+    'canceled': 'cancelled',
+    'refunded': 'refunded',
+    'failed': 'failed',
+    'pending': 'pending'
+}
+
+REPORT_FIELDS = [
+    'issue', 'key',
+    'store_amount', 'export_amount',
+    'store_status', 'export_status'
+]
+
+def _iter_json_array(f: TextIO, chunk_size: int = 65536) -> Iterator[Dict]:
+    """Lit un tableau JSON élément par élément."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+
+    while True:
+        chunk = f.read(chunk_size)
+        buffer += chunk
+
+        while True:
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    break
+                if buffer[0] != '[':
+                    raise ValueError("L'export JSON doit être un tableau")
+                buffer = buffer[1:]
+                started = True
+                continue
+
+            if buffer.startswith(','):
+                buffer = buffer[1:].lstrip()
+            if buffer.startswith(']'):
+                return
+
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # Élément incomplet : lire la suite du fichier
+                break
+            yield item
+            buffer = buffer[end:]
+
+        if not chunk:
+            if buffer.strip():
+                raise ValueError("Export JSON tronqué")
+            return
+
+def iter_export(path: str, id_field: str, amount_field: str, status_field: str,
+                amount_scale: float = 1.0) -> Iterator[Dict]:
+    """
+    Lit un export de passerelle ligne par ligne.
+
+    Args:
+        path: Fichier d'export (.csv, .jsonl/.ndjson ou .json)
+        id_field: Colonne contenant la clé de rapprochement
+        amount_field: Colonne du montant
+        status_field: Colonne du statut
+        amount_scale: Diviseur appliqué aux montants (100 pour des centimes)
+
+    Yields:
+        Dict: Ligne normalisée (key, amount, status) ; un montant illisible est
+        conservé tel quel dans `invalid_amount` et signalé comme écart
+    """
+    suffix = Path(path).suffix.lower()
+
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        if suffix == '.csv':
+            rows = csv.DictReader(f)
+        elif suffix in ('.jsonl', '.ndjson'):
+            rows = (json.loads(line) for line in f if line.strip())
+        elif suffix == '.json':
+            rows = _iter_json_array(f)
+        else:
+            raise ValueError(f"Format d'export non supporté: {suffix}")
+
+        for row in rows:
+            key = row.get(id_field)
+            if not key:
+                continue
+
+            status = str(row.get(status_field) or '').lower()
+            line = {
+                'key': str(key),
+                'amount': None,
+                'status': EXPORT_STATUSES.get(status, status)
+            }
+
+            amount = row.get(amount_field)
+            if amount not in (None, ''):
+                try:
+                    line['amount'] = float(amount) / amount_scale
+                except (TypeError, ValueError):
+                    pass
+                if line['amount'] is None or not math.isfinite(line['amount']):
+                    line['amount'] = None
+                    line['invalid_amount'] = str(amount)
+            yield line
+
+def _write_run(rows: List[Dict], tmp_dir: str) -> str:
+    """Écrit un morceau trié sur disque."""
+    rows.sort(key=lambda row: row['key'])
+    fd, path = tempfile.mkstemp(suffix='.jsonl', dir=tmp_dir)
+    with os.fdopen(fd, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps(row) + '\n')
+    return path
+
+def _read_run(path: str) -> Iterator[Dict]:
+    """Relit un morceau trié."""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+def sort_export(rows: Iterator[Dict], tmp_dir: str, chunk_size: int = 200000) -> Iterator[Dict]:
+    """
+    Trie un export par clé avec un tri externe par morceaux.
+
+    Args:
+        rows: Lignes normalisées de l'export
+        tmp_dir: Dossier des fichiers temporaires
+        chunk_size: Nombre de lignes triées en mémoire à la fois
+
+    Yields:
+        Dict: Lignes triées par clé
+    """
+    runs = []
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            runs.append(_write_run(chunk, tmp_dir))
+            chunk = []
+    if chunk:
+        runs.append(_write_run(chunk, tmp_dir))
+
+    yield from heapq.merge(*(_read_run(path) for path in runs), key=lambda row: row['key'])
+
+def merge_join(store_rows: Iterator[Dict], export_rows: Iterator[Dict], key: str,
+               tolerance: float = 0.005) -> Iterator[Dict]:
+    """
+    Fusionne deux flux triés par clé et produit les écarts.
+
+    Args:
+        store_rows: Paiements triés (PaymentStore.iter_sorted)
+        export_rows: Lignes d'export triées
+        key: Colonne de la table utilisée comme clé
+        tolerance: Écart de montant toléré
+
+    Yields:
+        Dict: Écart constaté
+    """
+    store_iter = iter(store_rows)
+    export_iter = iter(export_rows)
+    payment = next(store_iter, None)
+    line = next(export_iter, None)
+    previous_key = None
+
+    while payment is not None or line is not None:
+        payment_key = payment[key] if payment is not None else None
+
+        if line is not None and line['key'] == previous_key:
+            yield _issue('duplicate_in_export', line['key'], None, line)
+            line = next(export_iter, None)
+            continue
+
+        if line is None or (payment is not None and payment_key < line['key']):
+            yield _issue('missing_in_export', payment_key, payment, None)
+            payment = next(store_iter, None)
+            continue
+
+        if payment is None or line['key'] < payment_key:
+            yield _issue('missing_in_store', line['key'], None, line)
+            previous_key = line['key']
+            line = next(export_iter, None)
+            continue
+
+        # Même clé des deux côtés
+        if 'invalid_amount' in line:
+            yield _issue('invalid_amount', payment_key, payment, line)
+        elif line['amount'] is not None and abs(payment['amount'] - line['amount']) > tolerance:
+            yield _issue('amount_mismatch', payment_key, payment, line)
+        if line['status'] and payment['status'] != line['status']:
+            yield _issue('status_mismatch', payment_key, payment, line)
+
+        previous_key = line['key']
+        payment = next(store_iter, None)
+        line = next(export_iter, None)
+
+def _issue(issue: str, key: str, payment: Optional[Dict], line: Optional[Dict]) -> Dict:
+    """Construit une ligne du rapport d'écarts."""
+    return {
+        'issue': issue,
+        'key': key,
+        'store_amount': payment['amount'] if payment else None,
+        'export_amount': line.get('invalid_amount', line['amount']) if line else None,
+        'store_status': payment['status'] if payment else None,
+        'export_status': line['status'] if line else None
+    }
+
+def reconcile(db_path: str, export_path: str, report_path: str, key: str = 'payment_id',
+              id_field: str = 'id', amount_field: str = 'amount', status_field: str = 'status',
+              amount_scale: float = 1.0, chunk_size: int = 200000) -> Dict[str, int]:
+    """
+    Rapproche la table des paiements avec un export de passerelle.
+
+    Args:
+        db_path: Base des paiements
+        export_path: Fichier d'export de la passerelle
+        report_path: Rapport CSV des écarts à produire
+        key: Colonne de la table utilisée pour le rapprochement
+        id_field: Colonne de l'export correspondant à la clé
+        amount_field: Colonne du montant dans l'export
+        status_field: Colonne du statut dans l'export
+        amount_scale: Diviseur appliqué aux montants de l'export
+        chunk_size: Taille des morceaux du tri externe
+
+    Returns:
+        Dict[str, int]: Nombre d'écarts par type
+    """
+    store = PaymentStore(db_path, read_only=True)
+    counts: Dict[str, int] = {}
+
+    try:
+        with tempfile.TemporaryDirectory(prefix='reconcile_') as tmp_dir, \
+             open(report_path, 'w', encoding='utf-8', newline='') as report:
+            writer = csv.DictWriter(report, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+
+            export_rows = sort_export(
+                iter_export(export_path, id_field, amount_field, status_field, amount_scale),
+                tmp_dir,
+                chunk_size
+            )
+            for issue in merge_join(store.iter_sorted(key), export_rows, key):
+                writer.writerow(issue)
+                counts[issue['issue']] = counts.get(issue['issue'], 0) + 1
+    finally:
+        store.close()
+
+    return counts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Rapprochement des paiements avec un export de passerelle")
+    parser.add_argument('export', help="Fichier d'export (.csv, .jsonl, .json)")
+    parser.add_argument('--db', default=os.getenv('PAYMENT_DB_PATH', 'payments.db'), help="Base des paiements")
+    parser.add_argument('--report', default='reconciliation_report.csv', help="Rapport des écarts")
+    parser.add_argument('--key', default='payment_id', choices=['payment_id', 'gateway_ref'],
+                        help="Colonne de la table utilisée pour le rapprochement")
+    parser.add_argument('--id-field', default='id', help="Colonne de l'export contenant la clé")
+    parser.add_argument('--amount-field', default='amount', help="Colonne du montant")
+    parser.add_argument('--status-field', default='status', help="Colonne du statut")
+    parser.add_argument('--amount-scale', type=float, default=1.0,
+                        help="Diviseur des montants (100 si l'export est en centimes)")
+    parser.add_argument('--chunk-size', type=int, default=200000, help="Lignes triées en mémoire")
+    args = parser.parse_args()
+
+    counts = reconcile(
+        args.db, args.export, args.report,
+        key=args.key,
+        id_field=args.id_field,
+        amount_field=args.amount_field,
+        status_field=args.status_field,
+        amount_scale=args.amount_scale,
+        chunk_size=args.chunk_size
+    )
+
+    print(f"Rapport des écarts : {args.report}")
+    for issue, count in sorted(counts.items()):
+        print(f"  {issue}: {count}")
+    if not counts:
+        print("  Aucun écart")
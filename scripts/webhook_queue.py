@@ -0,0 +1,285 @@
+"""
+File persistante des webhooks des passerelles de paiement
+"""
+
+import json
+import uuid
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class WebhookQueue:
+    """Journal SQLite des événements reçus, en attente de traitement."""
+
+    def __init__(self, db_path: str, max_attempts: int = 5, lease: float = 300):
+        """
+        Initialise la file des webhooks.
+
+        Args:
+            db_path: Chemin vers la base de données SQLite
+            max_attempts: Nombre de tentatives avant abandon d'un événement
+            lease: Durée de réservation d'un lot (secondes) ; au-delà, un autre
+                worker peut le reprendre
+        """
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self._available = threading.Event()
+        self._init_database()
+
+    def _connect(self) -> sqlite3.Connection:
+        """Ouvre une connexion en mode transaction explicite."""
+        conn = sqlite3.connect(self.db_path, timeout=10, isolation_level=None)
+        conn.execute('PRAGMA synchronous = NORMAL')
+        return conn
+
+    def _init_database(self) -> None:
+        """Initialise le journal des événements."""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('PRAGMA journal_mode = WAL')
+
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS webhook_events (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                provider TEXT NOT NULL,
+                event_id TEXT NOT NULL,
+                event_type TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                received_at TEXT NOT NULL,
+                processed_at TEXT,
+                claim_id TEXT,
+                claimed_at TEXT,
+                UNIQUE(provider, event_id)
+            )
+            ''')
+
+            # Journaux créés avant la réservation à durée limitée
+            columns = [row[1] for row in conn.execute('PRAGMA table_info(webhook_events)')]
+            for column in ('claim_id', 'claimed_at'):
+                if column not in columns:
+                    conn.execute(f'ALTER TABLE webhook_events ADD COLUMN {column} TEXT')
+
+            conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_webhook_events_status
+            ON webhook_events(status, id)
+            ''')
+
+            conn.commit()
+
+    def enqueue(self, provider: str, event_id: str, event_type: str, payload: Dict) -> bool:
+        """
+        Ajoute un événement au journal.
+
+        Args:
+            provider: Passerelle émettrice
+            event_id: ID de l'événement chez la passerelle
+            event_type: Type d'événement
+            payload: Données normalisées de l'événement
+
+        Returns:
+            bool: False si l'événement a déjà été reçu
+        """
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+            INSERT OR IGNORE INTO webhook_events (
+                provider, event_id, event_type, payload, received_at
+            ) VALUES (?, ?, ?, ?, ?)
+            ''', (
+                provider, event_id, event_type,
+                json.dumps(payload), datetime.now().isoformat()
+            ))
+        finally:
+            conn.close()
+
+        self._available.set()
+        return cursor.rowcount == 1
+
+    def claim_batch(self, limit: int = 100) -> List[Dict]:
+        """
+        Réserve un lot d'événements en attente.
+
+        Les événements dont la réservation a expiré (worker interrompu) sont
+        repris avec les événements en attente.
+
+        Args:
+            limit: Taille maximale du lot
+
+        Returns:
+            List[Dict]: Événements réservés (avec l'identifiant de réservation `claim_id`)
+        """
+        now = datetime.now()
+        claim_id = uuid.uuid4().hex
+
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN IMMEDIATE')
+            rows = conn.execute('''
+            SELECT id, provider, event_id, event_type, payload, attempts
+            FROM webhook_events
+            WHERE status = 'pending'
+               OR (status = 'processing' AND (claimed_at IS NULL OR claimed_at < ?))
+            ORDER BY id
+            LIMIT ?
+            ''', (self._expired_before(now), limit)).fetchall()
+
+            conn.executemany('''
+            UPDATE webhook_events
+            SET status = 'processing', attempts = attempts + 1, claim_id = ?, claimed_at = ?
+            WHERE id = ?
+            ''', [(claim_id, now.isoformat(), row[0]) for row in rows])
+            conn.execute('COMMIT')
+        except sqlite3.Error:
+            conn.execute('ROLLBACK')
+            raise
+        finally:
+            conn.close()
+
+        return [
+            {
+                'id': row[0],
+                'provider': row[1],
+                'event_id': row[2],
+                'event_type': row[3],
+                'payload': json.loads(row[4]),
+                'attempts': row[5] + 1,
+                'claim_id': claim_id
+            }
+            for row in rows
+        ]
+
+    def _expired_before(self, now: datetime) -> str:
+        """Date avant laquelle une réservation a expiré."""
+        return (now - timedelta(seconds=self.lease)).isoformat()
+
+    def mark_done(self, ids: List[int], claim_id: str) -> None:
+        """Marque des événements réservés par `claim_id` comme traités."""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN')
+            conn.executemany('''
+            UPDATE webhook_events SET status = 'done', processed_at = ?
+            WHERE id = ? AND claim_id = ?
+            ''', [(datetime.now().isoformat(), event_id, claim_id) for event_id in ids])
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+    def mark_failed(self, ids: List[int], claim_id: str, error: str) -> None:
+        """Remet des événements en attente, ou les abandonne après trop d'échecs."""
+        conn = self._connect()
+        try:
+            conn.execute('BEGIN')
+            # Un lot repris par un autre worker après expiration ne lui appartient plus
+            conn.executemany('''
+            UPDATE webhook_events
+            SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END,
+                last_error = ?
+            WHERE id = ? AND claim_id = ?
+            ''', [(self.max_attempts, error[:500], event_id, claim_id) for event_id in ids])
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+    def requeue_stale(self) -> int:
+        """Remet en attente les événements dont la réservation a expiré (worker interrompu)."""
+        conn = self._connect()
+        try:
+            cursor = conn.execute('''
+            UPDATE webhook_events SET status = 'pending'
+            WHERE status = 'processing' AND (claimed_at IS NULL OR claimed_at < ?)
+            ''', (self._expired_before(datetime.now()),))
+            return cursor.rowcount
+        finally:
+            conn.close()
+
+    def wait(self, timeout: float) -> None:
+        """Attend l'arrivée de nouveaux événements."""
+        self._available.wait(timeout)
+        self._available.clear()
+
+class WebhookWorker:
+    """Thread appliquant les événements du journal par lots."""
+
+    def __init__(
+        self,
+        webhook_queue: WebhookQueue,
+        handler: Callable[[List[Dict]], None],
+        batch_size: int = 100,
+        poll_interval: float = 1.0
+    ):
+        """
+        Initialise le worker.
+
+        Args:
+            webhook_queue: File des webhooks
+            handler: Fonction appliquant un lot d'événements
+            batch_size: Taille maximale d'un lot
+            poll_interval: Délai maximal entre deux lectures du journal (secondes)
+        """
+        self.queue = webhook_queue
+        self.handler = handler
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Démarre le traitement en arrière-plan."""
+        if self._thread and self._thread.is_alive():
+            return
+
+        requeued = self.queue.requeue_stale()
+        if requeued:
+            logger.info(f"{requeued} webhook(s) remis en attente")
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='webhook-worker', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Arrête le traitement après le lot en cours."""
+        self._stop.set()
+        self.queue._available.set()
+        if self._thread:
+            self._thread.join()
+
+    def process_pending(self) -> int:
+        """
+        Traite un lot d'événements en attente.
+
+        Returns:
+            int: Nombre d'événements traités
+        """
+        batch = self.queue.claim_batch(self.batch_size)
+        if not batch:
+            return 0
+
+        ids = [event['id'] for event in batch]
+        claim_id = batch[0]['claim_id']
+        try:
+            self.handler(batch)
+        except Exception as e:
+            logger.error(f"Erreur lors du traitement des webhooks: {e}")
+            self.queue.mark_failed(ids, claim_id, str(e))
+            return 0
+
+        self.queue.mark_done(ids, claim_id)
+        return len(batch)
+
+    def _run(self) -> None:
+        """Boucle principale du worker."""
+        while not self._stop.is_set():
+            try:
+                if self.process_pending() < self.batch_size:
+                    self.queue.wait(self.poll_interval)
+            except sqlite3.Error as e:
+                logger.error(f"Erreur d'accès au journal des webhooks: {e}")
+                self._stop.wait(self.poll_interval)